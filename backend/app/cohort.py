@@ -0,0 +1,138 @@
+# backend/app/cohort.py
+from __future__ import annotations
+
+import codecs
+import csv
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from .schema import ReportRequest
+
+# Non-lab columns of a cohort CSV (header names are matched case-insensitively);
+# every other column is read as a lab marker.
+PATIENT_COLUMNS = ("age", "sex", "country", "pregnant", "population", "notes")
+DIET_COLUMN = "diet_filter"
+
+_TRUE = {"1", "true", "yes", "y", "t"}
+_FALSE = {"0", "false", "no", "n", "f"}
+
+
+class CohortHeader:
+    """Column layout of a cohort CSV, resolved once from its header row."""
+
+    def __init__(self, header: List[str]):
+        names = [h.strip() for h in header]
+        lowered = [n.lower() for n in names]
+        if "age" not in lowered or "sex" not in lowered:
+            raise ValueError("cohort CSV needs at least 'age' and 'sex' columns")
+
+        self.width = len(names)
+        self.patient_idx: Dict[str, int] = {
+            col: lowered.index(col) for col in PATIENT_COLUMNS if col in lowered
+        }
+        self.diet_idx: Optional[int] = lowered.index(DIET_COLUMN) if DIET_COLUMN in lowered else None
+        reserved = set(self.patient_idx.values())
+        if self.diet_idx is not None:
+            reserved.add(self.diet_idx)
+        self.lab_idx: List[Tuple[str, int]] = [
+            (name, i) for i, name in enumerate(names) if i not in reserved and name
+        ]
+
+    def to_request(self, values: List[str]) -> ReportRequest:
+        """
+        One CSV row -> ReportRequest. Blank lab cells are treated as
+        not measured. Raises ValueError with a readable message.
+        """
+        if len(values) != self.width:
+            raise ValueError(f"expected {self.width} columns, got {len(values)}")
+
+        labs: Dict[str, float] = {}
+        for name, i in self.lab_idx:
+            cell = values[i].strip()
+            if not cell:
+                continue
+            try:
+                labs[name] = float(cell)
+            except ValueError:
+                raise ValueError(f"lab '{name}' is not a number: {cell!r}") from None
+
+        patient: Dict[str, object] = {}
+        for col, i in self.patient_idx.items():
+            cell = values[i].strip()
+            if not cell:
+                continue
+            if col == "sex":
+                cell = cell.lower()
+            elif col == "pregnant":
+                low = cell.lower()
+                if low in _TRUE:
+                    cell = True
+                elif low in _FALSE:
+                    cell = False
+                else:
+                    raise ValueError(f"pregnant must be true/false, got {cell!r}")
+            patient[col] = cell
+
+        diet = values[self.diet_idx].strip() if self.diet_idx is not None else ""
+
+        try:
+            return ReportRequest(labs=labs, patient=patient, diet_filter=diet or None)
+        except ValidationError as e:
+            msgs = [
+                f"{'.'.join(str(p) for p in err['loc'][1:]) or err['loc'][0]}: {err['msg']}"
+                for err in e.errors()
+            ]
+            raise ValueError("; ".join(msgs)) from None
+
+
+# (row number, request) or (row number, error message); rows count from 1
+# after the header, like a spreadsheet minus the header line.
+CohortRow = Tuple[int, Union[ReportRequest, str]]
+
+
+def _rows_from_lines(header_holder: List[CohortHeader], lines: List[str], start: int) -> Iterator[CohortRow]:
+    row_no = start
+    for values in csv.reader(lines):
+        if not header_holder:
+            header_holder.append(CohortHeader(values))
+            continue
+        if not any(v.strip() for v in values):
+            continue  # blank line
+        row_no += 1
+        try:
+            yield row_no, header_holder[0].to_request(values)
+        except ValueError as e:
+            yield row_no, str(e)
+
+
+async def iter_cohort_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[CohortRow]:
+    """
+    Parse a cohort CSV incrementally from raw body chunks.
+
+    Only the current partial line is buffered, so memory stays flat no
+    matter how large the upload is. Quoted cells must not contain line
+    breaks. A bad header raises ValueError; bad rows are yielded as
+    (row, error message) so the caller can report them and keep going.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header: List[CohortHeader] = []
+    pending = ""
+    row_no = 0
+
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        if "\n" not in pending:
+            continue
+        complete, pending = pending.rsplit("\n", 1)
+        for row in _rows_from_lines(header, complete.split("\n"), row_no):
+            row_no = row[0]
+            yield row
+
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        for row in _rows_from_lines(header, [pending], row_no):
+            yield row
+
+    if not header:
+        raise ValueError("empty cohort CSV (no header row)")
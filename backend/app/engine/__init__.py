@@ -6,6 +6,22 @@ from .core import (
     suggest_foods,
     generate_report,
     FOOD_CSV_DEFAULT,
-    build_network_notes_for_plan
+    build_network_notes_for_plan,
+    LABEL_NAMES,
+    classify_matrix,
+    classify_panels,
+    cutoff_vectors,
+    marker_cutoffs,
+    labels_from_matrix,
+    panels_to_matrix,
 ) 
-
+from .types import ReferenceSnapshot
+from .scheduler import ConflictScheduler
+from .cutoff_index import CutoffIndex
+from .food_index import FoodIndex
+from .food_rank import FoodRanker
+from .data_loader import load_reference_snapshot, get_reference_snapshot, publish_snapshot
+from .batch import BatchReport, generate_reports_batch
+from .pipeline import ReportPipeline, ReportResult, server_timing_header
+from .render import REPORT_FORMATS, ReportRenderer, get_renderer
+from .reload import SnapshotReloader, data_signature
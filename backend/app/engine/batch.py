@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from .core import (
+    PatientInfo,
+    _resolve_snapshot,
+    build_network_notes_for_plan,
+    build_supplement_plan,
+    classify_panels,
+    food_bundles_needed,
+    low_items,
+    network_chains,
+    suggest_foods_for_bundles,
+)
+from .render import get_renderer
+from .types import ReferenceSnapshot
+
+
+FoodSuggestions = Dict[str, List[Tuple[str, float, str]]]
+
+
+@dataclass
+class BatchReport:
+    """Engine output for one panel of a batch (same pieces as /api/report)."""
+    labels: Dict[str, str]
+    supplement_plan: Dict[str, List[str]]
+    foods: FoodSuggestions
+    network_notes: List[str]
+    report_text: str
+    risk: Optional[Any] = None   # whatever risk_fn returned for this panel
+
+
+def _risk_key(profile: Dict[str, Any]) -> Tuple:
+    return (
+        profile.get("country"),
+        profile.get("population"),
+        profile.get("gender"),
+        profile.get("age"),
+    )
+
+
+def generate_reports_batch(
+    panels: Sequence[Dict[str, float]],
+    patients: Sequence[PatientInfo],
+    diet_filters: Optional[Sequence[Optional[str]]] = None,
+    risk_profiles: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    risk_fn: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    top_n: int = 5,
+    snapshot: Optional[ReferenceSnapshot] = None,
+    report_format: str = "text",
+) -> List[BatchReport]:
+    """
+    Score a whole cohort in one call.
+
+    Every stage after classification depends only on a small key (the
+    ordered low markers, the food bundles + diet filter, the plan, the
+    demographic profile), and cohorts repeat those keys constantly. Each
+    distinct key is computed once for the batch and shared by every panel
+    that has it, instead of re-running the full single-patient path.
+
+    panels:        lab dicts {marker: value}
+    patients:      PatientInfo per panel (demographic cutoffs and the
+                   narrative header)
+    diet_filters:  optional diet filter per panel (structured food picks)
+    risk_profiles: optional risk-model input per panel
+                   (see risk.risk_input_for_patient); needs risk_fn
+    risk_fn:       callable scoring one profile, e.g.
+                   risk.get_micronutrient_risk_profile
+    report_format: narrative format, one of render.REPORT_FORMATS
+    """
+    if len(patients) != len(panels):
+        raise ValueError("panels and patients must have the same length")
+    if diet_filters is None:
+        diet_filters = [None] * len(panels)
+    if risk_profiles is None or risk_fn is None:
+        risk_profiles = [None] * len(panels)
+
+    snapshot = _resolve_snapshot(snapshot)
+    food_df = snapshot.food_index or snapshot.foods
+    renderer = get_renderer(report_format)
+
+    plans: Dict[Tuple[str, ...], Dict[str, List[str]]] = {}
+    notes: Dict[Tuple, List[str]] = {}
+    foods: Dict[Tuple, FoodSuggestions] = {}
+    chains_for: Dict[Tuple[str, ...], Any] = {}
+    risks: Dict[Tuple, Optional[Dict[str, Any]]] = {}
+
+    def foods_for(bundles: Tuple[str, ...], diet_filter: Optional[str]) -> FoodSuggestions:
+        key = (bundles, diet_filter)
+        if key not in foods:
+            foods[key] = (
+                suggest_foods_for_bundles(list(bundles), food_df, top_n=top_n, diet_filter=diet_filter)
+                if food_df is not None else {}
+            )
+        return foods[key]
+
+    # 1) Classification: one vectorized pass over the whole cohort, each
+    #    panel against its patient's age / sex / pregnancy cutoffs
+    all_labels = classify_panels(panels, snapshot, patients)
+
+    out: List[BatchReport] = []
+    for labs, labels, patient, diet_filter, profile in zip(
+        panels, all_labels, patients, diet_filters, risk_profiles
+    ):
+        # 2) Supplement plan (only the ordered low markers matter)
+        low_set = tuple(low_items(labels))
+        plan = plans.get(low_set)
+        if plan is None:
+            plan = plans[low_set] = build_supplement_plan(labels, snapshot)
+
+        # 3) Network notes for that plan
+        plan_key = tuple((slot, tuple(items)) for slot, items in plan.items())
+        plan_notes = notes.get(plan_key)
+        if plan_notes is None:
+            plan_notes = notes[plan_key] = build_network_notes_for_plan(plan, snapshot)
+
+        # 4) Foods: structured picks honour the diet filter, the narrative
+        #    lists the unfiltered picks (same as generate_report)
+        bundles = tuple(food_bundles_needed(labels))
+        picked = foods_for(bundles, diet_filter)
+        narrative_foods = foods_for(bundles, None) if food_df is not None else {}
+
+        # 5) Narrative text
+        chains = chains_for.get(low_set)
+        if chains is None:
+            chains = chains_for[low_set] = network_chains(list(low_set), snapshot)
+        report_text = renderer.render(labs, patient, labels, plan, narrative_foods, chains)
+
+        # 6) Risk profile (one model call per distinct demographic profile)
+        raw_risk = None
+        if profile is not None:
+            rkey = _risk_key(profile)
+            if rkey not in risks:
+                try:
+                    risks[rkey] = risk_fn(profile)
+                except Exception as e:
+                    print("Risk model failed:", e)
+                    risks[rkey] = None
+            raw_risk = risks[rkey]
+
+        out.append(BatchReport(
+            labels=labels,
+            supplement_plan=plan,
+            foods=picked,
+            network_notes=plan_notes,
+            report_text=report_text,
+            risk=raw_risk,
+        ))
+
+    return out
+
+
+# -------------------------------------------------------------------
+# Cohort file scoring (command line: python -m app.engine.cohort_cli)
+# -------------------------------------------------------------------
+
+# Sex codes seen in lab exports; anemia.csv (paper reproduction) uses
+# Gender 0 = male, 1 = female.
+_SEX_CODES = {
+    "0": "male", "m": "male", "male": "male",
+    "1": "female", "f": "female", "female": "female",
+}
+_TRUE = {"1", "true", "yes", "y", "t"}
+
+
+def _column_lookup(columns: Sequence[str]) -> Dict[str, str]:
+    """lower-cased column name -> actual column name."""
+    return {str(c).strip().lower(): c for c in columns}
+
+
+def _cell(row: Dict[str, Any], col: Optional[str]) -> Optional[str]:
+    if col is None:
+        return None
+    v = row.get(col)
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    text = str(v).strip()
+    return text or None
+
+
+def score_frame(frame: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Score one chunk of a cohort file and return the result columns.
+
+    Lab columns are the ones whose (case-insensitive) name is a marker of
+    the reference cutoffs; sex comes from a Sex or Gender column, and
+    age / country / pregnant / population / diet_filter are used when
+    present, otherwise the CLI defaults apply. Every input column is kept.
+    """
+    from .. import risk  # heavy (loads the bandit); only needed here
+    from .data_loader import get_reference_snapshot
+
+    snapshot = get_reference_snapshot()
+    cols = _column_lookup(frame.columns)
+    ref_markers = {m.lower(): m for m in snapshot.ref}
+    lab_cols = [(ref_markers[k], c) for k, c in cols.items() if k in ref_markers]
+    sex_col = cols.get("sex") or cols.get("gender")
+
+    panels: List[Dict[str, float]] = []
+    patients: List[PatientInfo] = []
+    diets: List[Optional[str]] = []
+    profiles: List[Dict[str, Any]] = []
+    for row in frame.to_dict("records"):
+        labs = {}
+        for marker, col in lab_cols:
+            value = pd.to_numeric(row.get(col), errors="coerce")
+            if pd.notna(value):
+                labs[marker] = float(value)
+
+        sex = _SEX_CODES.get((_cell(row, sex_col) or "").lower().removesuffix(".0"), options["sex"])
+        # a malformed age cell falls back to the default like a missing one
+        age = pd.to_numeric(_cell(row, cols.get("age")), errors="coerce")
+        age = float(age) if pd.notna(age) else options["age"]
+        pregnant_text = _cell(row, cols.get("pregnant"))
+        pregnant = None if pregnant_text is None else pregnant_text.lower() in _TRUE
+        country = _cell(row, cols.get("country")) or options["country"]
+        population = _cell(row, cols.get("population"))
+
+        panels.append(labs)
+        patients.append(PatientInfo(age=age, sex=sex, pregnant=pregnant, country=country))
+        diets.append(_cell(row, cols.get("diet_filter")) or options["diet_filter"])
+        profiles.append(risk.risk_input_for_patient(
+            sex=sex, pregnant=pregnant, country=country, age=age, population=population,
+        ))
+
+    def risk_fn(profile: Dict[str, Any]) -> Dict[str, Any]:
+        return risk.report_risk_fields(risk.get_micronutrient_risk_profile(profile))
+
+    results = generate_reports_batch(
+        panels,
+        patients,
+        diet_filters=diets,
+        risk_profiles=None if options["no_risk"] else profiles,
+        risk_fn=None if options["no_risk"] else risk_fn,
+        top_n=options["top_n"],
+        snapshot=snapshot,
+        report_format=options.get("text_format", "text"),
+    )
+
+    out = frame.copy()
+    out["labels"] = [json.dumps(r.labels) for r in results]
+    out["low_markers"] = [";".join(low_items(r.labels)) for r in results]
+    out["supplement_plan"] = [json.dumps(r.supplement_plan) for r in results]
+    out["foods"] = [
+        json.dumps({k: [name for name, _, _ in picks] for k, picks in r.foods.items()})
+        for r in results
+    ]
+    out["overall_risk"] = [
+        r.risk["risk_profile"]["overall_risk"] if r.risk else None for r in results
+    ]
+    out["risk_bucket"] = [
+        r.risk["risk_profile"]["risk_bucket"] if r.risk else None for r in results
+    ]
+    out["micronutrient_risks"] = [
+        json.dumps(r.risk["micronutrient_risks"]) if r.risk else None for r in results
+    ]
+    if options["with_text"]:
+        out["report_text"] = [r.report_text for r in results]
+    return out
+
+
+def _score_chunk(args: Tuple[pd.DataFrame, Dict[str, Any]]) -> pd.DataFrame:
+    """Pool task for cohort_cli (lives here so workers import it by name)."""
+    frame, options = args
+    return score_frame(frame, options)
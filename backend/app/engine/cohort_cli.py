@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+import pandas as pd
+
+from .batch import _score_chunk
+from .render import REPORT_FORMATS
+
+# Offline cohort scoring CLI:  python -m app.engine.cohort_cli IN.csv -o OUT
+#
+# Kept out of app.engine's imports so running it as __main__ does not load
+# the module a second time; the per-chunk work (batch.score_frame) is
+# imported from batch, so pool workers find it under its package name.
+
+
+class _OutputWriter:
+    """Append scored chunks to a CSV or Parquet file, in input order."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.parquet = path.suffix.lower() in (".parquet", ".pq")
+        self._writer = None
+        self.rows = 0
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow (pip install pyarrow), or write .csv")
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            chunk.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(chunk)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _read_chunks(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def run_cli(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.engine.cohort_cli",
+        description="Score a cohort CSV offline (labels, supplement plan, foods, risk).",
+    )
+    parser.add_argument("input", type=Path, help="cohort CSV (anemia.csv layout or a lab export)")
+    parser.add_argument("-o", "--output", type=Path, required=True,
+                        help="output file; .csv, or .parquet (needs pyarrow)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="rows per work unit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--age", type=float, default=30.0, help="age when the file has none")
+    parser.add_argument("--sex", choices=("female", "male"), default=None,
+                        help="sex when the file has none")
+    parser.add_argument("--country", default=None, help="country when the file has none")
+    parser.add_argument("--diet-filter", default=None, help="diet filter for food picks")
+    parser.add_argument("--top-n", type=int, default=5, help="foods per bundle")
+    parser.add_argument("--no-risk", action="store_true", help="skip the demographic risk model")
+    parser.add_argument("--with-text", action="store_true", help="include the narrative report text")
+    parser.add_argument("--text-format", choices=REPORT_FORMATS, default="text",
+                        help="format of the report text column")
+    args = parser.parse_args(argv)
+
+    options = {
+        "age": args.age,
+        "sex": args.sex,
+        "country": args.country,
+        "diet_filter": args.diet_filter,
+        "top_n": args.top_n,
+        "no_risk": args.no_risk,
+        "with_text": args.with_text,
+        "text_format": args.text_format,
+    }
+    writer = _OutputWriter(args.output)
+    chunks = ((frame, options) for frame in _read_chunks(args.input, args.chunk_size))
+
+    try:
+        if args.workers <= 1:
+            for item in chunks:
+                writer.write(_score_chunk(item))
+        else:
+            # Keep a bounded window of chunks in flight so a huge input is
+            # never read (or its results held) all at once.
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                window: deque = deque()
+                for item in chunks:
+                    window.append(pool.submit(_score_chunk, item))
+                    if len(window) >= 2 * args.workers:
+                        writer.write(window.popleft().result())
+                while window:
+                    writer.write(window.popleft().result())
+    finally:
+        writer.close()
+
+    print(f"scored {writer.rows} rows -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -2,12 +2,17 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Set, List, Tuple, Optional
+from typing import Dict, Mapping, Set, List, Sequence, Tuple, Optional, Union
 
 import numpy as np
 import pandas as pd
 import math
 
+from .food_index import FoodIndex
+from .food_rank import FoodRanker
+from .scheduler import ConflictScheduler
+from .types import ReferenceSnapshot
+
 
 SCRIPT_DIR = Path(__file__).resolve().parent          # backend/app/engine
 DATA_DIR = SCRIPT_DIR.parent.parent / "data"          # backend/data
@@ -19,32 +24,29 @@ EDGES = DATA_DIR / "network_relationships.csv"
 # -------------------------------------------------------------------
 # 0. Nutrient interaction network (Graph)
 # -------------------------------------------------------------------
-try:
+
+def build_graph_from_edges(df: pd.DataFrame):
+    """Build the nutrient DiGraph from a network_relationships.csv frame."""
     import networkx as nx
 
-    if EDGES.exists():
-        edges_df = pd.read_csv(EDGES)
-
-        def build_graph_from_edges(df: pd.DataFrame):
-            G = nx.DiGraph()
-            for _, r in df.iterrows():
-                G.add_edge(
-                    str(r["source"]).strip(),
-                    str(r["target"]).strip(),
-                    effect=str(r.get("effect", "")).strip(),
-                    confidence=str(r.get("confidence", "")).strip(),
-                    notes=str(r.get("notes", "")).strip(),
-                )
-            return G
+    G = nx.DiGraph()
+    for _, r in df.iterrows():
+        G.add_edge(
+            str(r["source"]).strip(),
+            str(r["target"]).strip(),
+            effect=str(r.get("effect", "")).strip(),
+            confidence=str(r.get("confidence", "")).strip(),
+            notes=str(r.get("notes", "")).strip(),
+        )
+    return G
 
-        G_NETWORK = build_graph_from_edges(edges_df)
-    else:
-        edges_df = None
-        G_NETWORK = None
 
-except ImportError:
-    edges_df = None
-    G_NETWORK = None
+def _resolve_snapshot(snapshot: Optional[ReferenceSnapshot]) -> ReferenceSnapshot:
+    """Use the given snapshot, or the shared one built at startup."""
+    if snapshot is not None:
+        return snapshot
+    from .data_loader import get_reference_snapshot  # avoid circular import
+    return get_reference_snapshot()
 
 
 def low_items(labels: Dict[str, str]) -> List[str]:
@@ -52,15 +54,67 @@ def low_items(labels: Dict[str, str]) -> List[str]:
     return [k for k, v in labels.items() if v == "low"]
 
 
+# Hop limits precomputed by build_multihop_index (1..MULTIHOP_MAX_HOPS)
+MULTIHOP_MAX_HOPS = 3
+
+MultihopIndex = Mapping[int, Mapping[str, Tuple[str, ...]]]
+
+
+def _format_chain(G: "nx.DiGraph", p: List[str]) -> str:
+    effs = []
+    for u, v in zip(p[:-1], p[1:]):
+        e = G[u][v]
+        effs.append(f"{u} —{e.get('effect', '')}→ {v}")
+    return " → ".join(p) + "   [" + "; ".join(effs) + "]"
+
+
+def build_multihop_index(
+    G: "nx.DiGraph",
+    max_hops: int = MULTIHOP_MAX_HOPS,
+) -> Dict[int, Dict[str, Tuple[str, ...]]]:
+    """
+    Precompute multihop_explanations for every node of the (static) graph.
+
+    Returns {hop_limit: {target: sorted formatted chains}} for hop limits
+    1..max_hops; targets without any chain are left out, exactly like
+    multihop_explanations. Paths are enumerated once with the largest
+    cutoff and bucketed by length.
+    """
+    import networkx as nx  # local import to avoid issues if not installed
+
+    by_hops: Dict[int, Dict[str, Set[str]]] = {h: {} for h in range(1, max_hops + 1)}
+    for T in G.nodes:
+        for S in G.nodes:
+            if S == T:
+                continue
+            for p in nx.all_simple_paths(G, S, T, cutoff=max_hops):
+                chain = _format_chain(G, p)
+                for h in range(len(p) - 1, max_hops + 1):
+                    by_hops[h].setdefault(T, set()).add(chain)
+
+    return {
+        h: {T: tuple(sorted(chains)) for T, chains in targets.items()}
+        for h, targets in by_hops.items()
+    }
+
+
 def multihop_explanations(
     G: "nx.DiGraph",
     low_targets: List[str],
     max_hops: int = 2,
+    index: Optional[MultihopIndex] = None,
 ) -> Dict[str, List[str]]:
     """
     For each low target node, find all simple paths of length <= max_hops
     from any source node to that target, and format them as readable strings.
+
+    index: optional build_multihop_index(G) result; when it covers max_hops
+           the chains are looked up instead of searched for.
     """
+    if index is not None and max_hops in index:
+        by_target = index[max_hops]
+        return {T: list(by_target[T]) for T in low_targets if T in by_target}
+
     import networkx as nx  # local import to avoid issues if not installed
 
     out: Dict[str, List[str]] = {}
@@ -76,11 +130,7 @@ def multihop_explanations(
                 continue
 
             for p in nx.all_simple_paths(G, S, T, cutoff=max_hops):
-                effs = []
-                for u, v in zip(p[:-1], p[1:]):
-                    e = G[u][v]
-                    effs.append(f"{u} —{e.get('effect', '')}→ {v}")
-                paths.append(" → ".join(p) + "   [" + "; ".join(effs) + "]")
+                paths.append(_format_chain(G, p))
 
         if paths:
             out[T] = sorted(set(paths))
@@ -101,8 +151,6 @@ class PatientInfo:
 # 1. Load structured cutoffs & build REF / REF_TIERS
 # -------------------------------------------------------------------
 
-cutoffs = pd.read_csv(CUTOFF_CSV)
-
 # Marker names here should match keys you use in the labs dict
 # (e.g., labs["Hemoglobin"], labs["ferritin"], labs["vitamin_B12"], ...)
 MARKER_MAP = {
@@ -223,23 +271,30 @@ MARKER_MAP = {
 }
 
 
-def _select_rows_for_marker(marker_name: str) -> pd.DataFrame:
+def _select_rows_for_marker(
+    marker_name: str,
+    cutoffs_df: Optional[pd.DataFrame] = None,
+    all_populations: bool = False,
+) -> pd.DataFrame:
     """
-    Return subset of the cutoffs table relevant for this marker.
+    Return subset of the cutoffs table relevant for this marker
+    (every population group's rows with all_populations=True).
     """
+    table = _legacy_global("cutoffs") if cutoffs_df is None else cutoffs_df
+
     spec = MARKER_MAP.get(marker_name, {})
     micronutrient = spec.get("micronutrient")
     biomarker = spec.get("biomarker")
     if not micronutrient or not biomarker:
-        return cutoffs.iloc[0:0]
+        return table.iloc[0:0]
 
-    df = cutoffs[
-        (cutoffs["micronutrient"] == micronutrient)
-        & (cutoffs["biomarker"] == biomarker)
+    df = table[
+        (table["micronutrient"] == micronutrient)
+        & (table["biomarker"] == biomarker)
     ].copy()
 
     pg = spec.get("population_group")
-    if pg is not None:
+    if pg is not None and not all_populations:
         df = df[df["population_group"] == pg]
 
     unit = spec.get("unit")
@@ -249,101 +304,147 @@ def _select_rows_for_marker(marker_name: str) -> pd.DataFrame:
     return df
 
 
-def build_ref_from_cutoffs() -> Tuple[Dict[str, Dict[str, float]], Dict[str, Dict[str, float]]]:
+def build_ref_from_cutoffs(
+    cutoffs_df: Optional[pd.DataFrame] = None,
+) -> Tuple[Dict[str, Dict[str, float]], Dict[str, Dict[str, float]]]:
     """
     Build:
       REF[marker]      = {"low": value?, "high": value?}
       REF_TIERS[marker] = {"deficiency": val, "severe_deficiency": val, ...}
-    from the structured CSV.
+    from the structured CSV (or an already-loaded cutoffs frame).
     """
     REF: Dict[str, Dict[str, float]] = {}
     REF_TIERS: Dict[str, Dict[str, float]] = {}
 
     for marker in MARKER_MAP.keys():
-        df = _select_rows_for_marker(marker)
+        df = _select_rows_for_marker(marker, cutoffs_df)
         if df.empty:
             continue
 
-        tiers: Dict[str, float] = {}
-        for _, row in df.iterrows():
-            ctype = str(row["cutoff_type"])
-            val = float(row["cutoff_value"])
-            tiers[ctype] = val
-
+        tiers = cutoff_tiers(df)
         REF_TIERS[marker] = tiers
 
-        spec = MARKER_MAP.get(marker, {})
-        low_type = spec.get("low_type")
-        high_type = spec.get("high_type")
+        rng = ref_range(marker, tiers)
+        if rng:
+            REF[marker] = rng
 
-        low_val = None
-        high_val = None
+    return REF, REF_TIERS
 
-        # Low
-        if low_type and low_type in tiers:
-            low_val = tiers[low_type]
-        else:
-            for k in tiers.keys():
-                if (
-                    "deficiency" in k
-                    or "anemia" in k
-                    or "micro" in k
-                    or "ntd_insufficient" in k
-                ):
-                    low_val = tiers[k]
-                    break
-
-        # High
-        if high_type and high_type in tiers:
-            high_val = tiers[high_type]
-        else:
-            for k in tiers.keys():
-                if "high" in k or "macro" in k:
-                    high_val = tiers[k]
-                    break
-
-        if low_val is not None or high_val is not None:
-            REF[marker] = {}
-            if low_val is not None:
-                REF[marker]["low"] = low_val
-            if high_val is not None:
-                REF[marker]["high"] = high_val
 
-    return REF, REF_TIERS
+def cutoff_tiers(rows: pd.DataFrame) -> Dict[str, float]:
+    """{cutoff_type: cutoff_value} for one marker's rows (later rows win)."""
+    return dict(zip(rows["cutoff_type"].astype(str), rows["cutoff_value"].astype(float)))
+
+
+def ref_range(marker: str, tiers: Mapping[str, float]) -> Dict[str, float]:
+    """
+    The {"low": value?, "high": value?} thresholds classification uses,
+    picked from a marker's tiers (MARKER_MAP low_type / high_type, else
+    the first deficiency-like / high-like tier).
+    """
+    spec = MARKER_MAP.get(marker, {})
+    low_type = spec.get("low_type")
+    high_type = spec.get("high_type")
+
+    low_val = None
+    high_val = None
+
+    # Low
+    if low_type and low_type in tiers:
+        low_val = tiers[low_type]
+    else:
+        for k in tiers.keys():
+            if (
+                "deficiency" in k
+                or "anemia" in k
+                or "micro" in k
+                or "ntd_insufficient" in k
+            ):
+                low_val = tiers[k]
+                break
+
+    # High
+    if high_type and high_type in tiers:
+        high_val = tiers[high_type]
+    else:
+        for k in tiers.keys():
+            if "high" in k or "macro" in k:
+                high_val = tiers[k]
+                break
 
+    rng: Dict[str, float] = {}
+    if low_val is not None:
+        rng["low"] = low_val
+    if high_val is not None:
+        rng["high"] = high_val
+    return rng
 
-REF, REF_TIERS = build_ref_from_cutoffs()
 
 # -------------------------------------------------------------------
 # 2. Classification helpers
 # -------------------------------------------------------------------
 
-def classify_panel(labs: Dict[str, float]) -> Dict[str, str]:
+def classify_panel(
+    labs: Dict[str, float],
+    snapshot: Optional[ReferenceSnapshot] = None,
+    patient: Optional[PatientInfo] = None,
+) -> Dict[str, str]:
     """
     Given a dict of labs {marker: value}, return {marker: label}
-    using classify_value and the global REF/REF_TIERS.
+    using classify_value and the snapshot's REF/REF_TIERS
+    (or the patient's age / sex / pregnancy cutoffs, see marker_cutoffs).
     """
+    snapshot = _resolve_snapshot(snapshot)
     labels: Dict[str, str] = {}
     for marker, val in labs.items():
-        labels[marker] = classify_value(marker, val)
+        labels[marker] = classify_value(marker, val, snapshot, patient)
     return labels
 
 
-def classify_value(marker: str, value: Optional[float]) -> str:
+def marker_cutoffs(
+    marker: str,
+    snapshot: Optional[ReferenceSnapshot] = None,
+    patient: Optional[PatientInfo] = None,
+) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """
+    (low, high) thresholds for a marker, None when it has no cutoffs.
+
+    With a patient, the snapshot's CutoffIndex picks the cutoff row for
+    their age, sex and pregnancy (e.g. pregnant or pediatric hemoglobin);
+    without one (or when no row fits) the MARKER_MAP population group's
+    REF values apply.
+    """
+    snapshot = _resolve_snapshot(snapshot)
+    index = snapshot.cutoff_index
+    if patient is not None and index is not None:
+        return index.lookup(marker, patient.age, patient.sex, patient.pregnant)
+
+    rng = snapshot.ref.get(marker)
+    if not rng:
+        return None
+    return rng.get("low"), rng.get("high")
+
+
+def classify_value(
+    marker: str,
+    value: Optional[float],
+    snapshot: Optional[ReferenceSnapshot] = None,
+    patient: Optional[PatientInfo] = None,
+) -> str:
     """
     Classify a lab value using REF + REF_TIERS:
     - "low", "high", "normal", "unknown"
     (you can extend with "severe_low", "marginal" if you wire in REF_TIERS details)
+    patient: optional PatientInfo selecting demographic cutoffs (see marker_cutoffs)
     """
     if value is None or (isinstance(value, float) and np.isnan(value)):
         return "unknown"
 
-    rng = REF.get(marker)
-    if not rng:
+    cutoffs = marker_cutoffs(marker, snapshot, patient)
+    if not cutoffs:
         return "unknown"
 
-    low = rng.get("low")
-    high = rng.get("high")
+    low, high = cutoffs
 
     # Low side
     if low is not None and value < low:
@@ -356,6 +457,141 @@ def classify_value(marker: str, value: Optional[float]) -> str:
     return "normal"
 
 
+# Columnar classification (patients x markers) -----------------------
+
+# Integer codes used by classify_matrix; LABEL_NAMES[code] is the label
+LABEL_UNKNOWN, LABEL_LOW, LABEL_NORMAL, LABEL_HIGH = 0, 1, 2, 3
+LABEL_NAMES = ("unknown", "low", "normal", "high")
+
+
+def cutoff_vectors(
+    markers: Sequence[str],
+    snapshot: Optional[ReferenceSnapshot] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (low, high) float arrays aligned with `markers`, taken from REF.
+    Missing cutoffs are NaN (a NaN comparison never flags a value).
+    """
+    ref = _resolve_snapshot(snapshot).ref
+    low = np.full(len(markers), np.nan)
+    high = np.full(len(markers), np.nan)
+    for j, marker in enumerate(markers):
+        rng = ref.get(marker)
+        if not rng:
+            continue
+        if rng.get("low") is not None:
+            low[j] = rng["low"]
+        if rng.get("high") is not None:
+            high[j] = rng["high"]
+    return low, high
+
+
+def classify_matrix(
+    values: np.ndarray,
+    markers: Sequence[str],
+    snapshot: Optional[ReferenceSnapshot] = None,
+    patients: Optional[Sequence[PatientInfo]] = None,
+) -> np.ndarray:
+    """
+    Vectorized classify_value for a whole cohort.
+
+    values:   (n_patients, n_markers) float array, NaN for missing labs
+    markers:  column names (keys of REF)
+    patients: optional PatientInfo per row; each row is then classified
+              against that patient's demographic cutoffs
+
+    Returns an int8 matrix of LABEL_* codes with the same shape, using
+    exactly the classify_value rules (low wins over high; NaN or a marker
+    without cutoffs -> unknown).
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 2 or values.shape[1] != len(markers):
+        raise ValueError("values must be a (n_patients, len(markers)) array")
+
+    snapshot = _resolve_snapshot(snapshot)
+    if patients is not None and snapshot.cutoff_index is not None:
+        if len(patients) != len(values):
+            raise ValueError("patients must have one entry per row of values")
+        low, high = snapshot.cutoff_index.cutoff_matrix(markers, patients)
+    else:
+        low, high = cutoff_vectors(markers, snapshot)
+    known = ~(np.isnan(low) & np.isnan(high))
+
+    codes = np.full(values.shape, LABEL_NORMAL, dtype=np.int8)
+    with np.errstate(invalid="ignore"):
+        codes[values > high] = LABEL_HIGH
+        codes[values < low] = LABEL_LOW
+    codes[np.isnan(values) | ~known] = LABEL_UNKNOWN
+    return codes
+
+
+def panels_to_matrix(
+    panels: Sequence[Dict[str, Optional[float]]],
+    markers: Optional[Sequence[str]] = None,
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Stack lab dicts into a (n_patients, n_markers) float array (NaN = missing).
+    Columns default to every marker seen, in first-seen order.
+    """
+    if markers is None:
+        seen: Dict[str, None] = {}
+        for labs in panels:
+            for marker in labs:
+                seen.setdefault(marker, None)
+        markers = list(seen)
+    markers = list(markers)
+    col = {m: j for j, m in enumerate(markers)}
+
+    values = np.full((len(panels), len(markers)), np.nan)
+    for i, labs in enumerate(panels):
+        for marker, val in labs.items():
+            j = col.get(marker)
+            if j is not None and val is not None:
+                values[i, j] = val
+    return values, markers
+
+
+def labels_from_matrix(
+    codes: np.ndarray,
+    markers: Sequence[str],
+    panels: Optional[Sequence[Dict[str, Optional[float]]]] = None,
+) -> List[Dict[str, str]]:
+    """
+    Convert a classify_matrix result back into {marker: label} dicts.
+
+    With `panels`, each dict has exactly that panel's markers in its own
+    order (the same dict classify_panel would return); otherwise every
+    column is included.
+    """
+    names = LABEL_NAMES
+    rows = np.asarray(codes).tolist()
+    if panels is None:
+        return [
+            {m: names[c] for m, c in zip(markers, row)}
+            for row in rows
+        ]
+
+    col = {m: j for j, m in enumerate(markers)}
+    out: List[Dict[str, str]] = []
+    for row, labs in zip(rows, panels):
+        out.append({
+            m: names[row[col[m]]] if m in col else "unknown"
+            for m in labs
+        })
+    return out
+
+
+def classify_panels(
+    panels: Sequence[Dict[str, Optional[float]]],
+    snapshot: Optional[ReferenceSnapshot] = None,
+    patients: Optional[Sequence[PatientInfo]] = None,
+) -> List[Dict[str, str]]:
+    """classify_panel for many lab dicts at once (one vectorized pass)."""
+    values, markers = panels_to_matrix(panels)
+    codes = classify_matrix(values, markers, snapshot, patients)
+    return labels_from_matrix(codes, markers, panels)
+
+
 # -------------------------------------------------------------------
 # 3. Supplement scheduling (conflict-aware)
 # -------------------------------------------------------------------
@@ -483,17 +719,74 @@ def build_interaction_rules_from_network(edges_df: Optional[pd.DataFrame] = None
     return boosters, antagonists
 
 
-# Instantiate BOOSTERS / ANTAGONISTS using the nutrient network if present
-if "edges_df" in globals():
+# -------------------------------------------------------------------
+# Module-level reference globals (lazy)
+# -------------------------------------------------------------------
+# cutoffs, REF / REF_TIERS, edges_df, G_NETWORK and BOOSTERS / ANTAGONISTS
+# used to be built when this module was imported. The engine now reads
+# everything from the ReferenceSnapshot; these names are still available
+# as core.REF etc., but are only loaded from backend/data on first access.
+
+_LEGACY_GLOBALS = ("cutoffs", "REF", "REF_TIERS", "edges_df", "G_NETWORK", "BOOSTERS", "ANTAGONISTS")
+
+
+def _load_legacy_globals() -> Dict[str, object]:
+    cutoffs = pd.read_csv(CUTOFF_CSV)
+    REF, REF_TIERS = build_ref_from_cutoffs(cutoffs)
+
+    edges_df = None
+    G_NETWORK = None
+    if EDGES.exists():
+        try:
+            edges_df = pd.read_csv(EDGES)
+            G_NETWORK = build_graph_from_edges(edges_df)
+        except ImportError:
+            edges_df = None   # no networkx -> no graph, no rules
     BOOSTERS, ANTAGONISTS = build_interaction_rules_from_network(edges_df)
-else:
-    BOOSTERS, ANTAGONISTS = build_interaction_rules_from_network(None)
 
-print("BOOSTERS:", BOOSTERS)
-print("ANTAGONISTS:", ANTAGONISTS)
+    return {
+        "cutoffs": cutoffs,
+        "REF": REF,
+        "REF_TIERS": REF_TIERS,
+        "edges_df": edges_df,
+        "G_NETWORK": G_NETWORK,
+        "BOOSTERS": BOOSTERS,
+        "ANTAGONISTS": ANTAGONISTS,
+    }
+
+
+def _legacy_global(name: str):
+    if name not in globals():
+        globals().update(_load_legacy_globals())
+    return globals()[name]
+
+
+def reset_legacy_globals() -> None:
+    """Forget loaded legacy globals (the data files changed)."""
+    for name in _LEGACY_GLOBALS:
+        globals().pop(name, None)
+
 
+def __getattr__(name: str):
+    if name in _LEGACY_GLOBALS:
+        return _legacy_global(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def build_supplement_plan(labels: Dict[str, str]) -> Dict[str, List[str]]:
+
+def build_scheduler(
+    antagonists: Dict[str, Dict[str, List[str]]],
+    boosters: Dict[str, Dict[str, List[str]]],
+) -> ConflictScheduler:
+    """Compile ANTAGONISTS / BOOSTERS into a bitmask ConflictScheduler."""
+    return ConflictScheduler(antagonists, boosters, supplement_key=marker_to_supplement)
+
+
+def build_supplement_plan(
+    labels: Dict[str, str],
+    snapshot: Optional[ReferenceSnapshot] = None,
+    slots: Optional[Sequence[str]] = None,
+    min_conflict: bool = False,
+) -> Dict[str, List[str]]:
     """
     Given classification labels, decide which supplements to schedule.
 
@@ -502,7 +795,16 @@ def build_supplement_plan(labels: Dict[str, str]) -> Dict[str, List[str]]:
     - We only schedule markers that are "low".
     - We use ANTAGONISTS / BOOSTERS (derived from the network) to place
       nutrients away from their antagonists and co-dose network boosters.
+
+    slots:        slot names in order (default SLOTS: morning/midday/evening)
+    min_conflict: when no slot is conflict-free, use the slot with the
+                  fewest conflicts instead of the last one
     """
+    snapshot = _resolve_snapshot(snapshot)
+    scheduler = snapshot.scheduler
+    if scheduler is None:
+        scheduler = build_scheduler(snapshot.antagonists, snapshot.boosters)
+
     # 1) Find low markers
     raw_deficient_markers = [m for m, lab in labels.items() if lab == "low"]
 
@@ -513,66 +815,8 @@ def build_supplement_plan(labels: Dict[str, str]) -> Dict[str, List[str]]:
         if supp not in deficient:
             deficient.append(supp)
 
-    # 3) Initialize empty plan
-    plan: Dict[str, List[str]] = {slot: [] for slot in SLOTS}
-
-    def can_place(nutrient: str, slot: str) -> bool:
-        """
-        General conflict logic using ANTAGONISTS from the network:
-
-        For any nutrient already in the slot, if:
-          - nutrient is in ANTAGONISTS[other]["avoid_with"], OR
-          - other is in ANTAGONISTS[nutrient]["avoid_with"]
-        then they should NOT share the slot.
-        """
-        for already in plan[slot]:
-            avoid_for_new = set(ANTAGONISTS.get(nutrient, {}).get("avoid_with", []))
-            avoid_for_already = set(ANTAGONISTS.get(already, {}).get("avoid_with", []))
-
-            if already in avoid_for_new or nutrient in avoid_for_already:
-                return False
-
-        return True
-
-    # 4) First pass: place primary supplements (deficient ones)
-    for nutrient in deficient:
-        placed = False
-        for slot in SLOTS:
-            if can_place(nutrient, slot):
-                plan[slot].append(nutrient)
-                placed = True
-                break
-        if not placed:
-            # If nowhere is conflict-free, just put it in the last slot
-            plan[SLOTS[-1]].append(nutrient)
-
-    # 5) Second pass: align boosters (from the nutrient network)
-    for bundle in BOOSTERS.values():
-        # "targets" are supplement keys (e.g., "iron", "vitamin_D")
-        targets = [t for t in bundle["targets"] if t in deficient]
-
-        # Use ALL known boosters from the network, not only when they are low
-        boosters = bundle["boosters"]
-
-        for t in targets:
-            # Find the slot where the target ended up
-            target_slot = None
-            for slot, nutrients in plan.items():
-                if t in nutrients:
-                    target_slot = slot
-                    break
-            if not target_slot:
-                continue
-
-            # Try to co-locate boosters in the same slot
-            for b in boosters:
-                supp_b = marker_to_supplement(b)
-                # don’t duplicate
-                if supp_b in plan[target_slot]:
-                    continue
-                if can_place(supp_b, target_slot):
-                    plan[target_slot].append(supp_b)
-    return plan
+    # 3) Place them: first conflict-free slot, then co-dose boosters
+    return scheduler.plan(deficient, SLOTS if slots is None else slots, min_conflict=min_conflict)
 
 
 def _pretty_nutrient(key: str) -> str:
@@ -594,9 +838,12 @@ def _slots_to_phrase(slots: Set[str]) -> str:
     return ", ".join(slots[:-1]) + f", and {slots[-1]}"
 
 
-def build_network_notes_for_plan(plan: Dict[str, List[str]]) -> List[str]:
+def build_network_notes_for_plan(
+    plan: Dict[str, List[str]],
+    snapshot: Optional[ReferenceSnapshot] = None,
+) -> List[str]:
     """
-    Use network_relationships.csv to explain:
+    Use network_relationships.csv (via the snapshot's edge table) to explain:
       - why some nutrients are co-dosed (effect == "boosts")
       - why some are separated into different time slots (effect == "inhibits")
 
@@ -608,23 +855,21 @@ def build_network_notes_for_plan(plan: Dict[str, List[str]]) -> List[str]:
           → explain separation using the `notes` column.
     """
     notes: List[str] = []
+    snapshot = _resolve_snapshot(snapshot)
 
-    if not EDGES.exists():
+    if snapshot.edges is None:
         return [
             "Supplement timing uses an internal nutrient interaction network, "
             "but the relationships file (network_relationships.csv) was not found."
         ]
 
-    df = pd.read_csv(EDGES)
-    if df.empty:
+    edges = snapshot.edges
+    if not edges:
         return [
             "Supplement timing uses an internal nutrient interaction network, "
             "but no relationships were found in network_relationships.csv."
         ]
 
-    # Normalize effect strings
-    df["effect_norm"] = df["effect"].astype(str).str.lower().str.strip()
-
     # --- 1) Build slot → nutrients and nutrient → slots maps (from the plan) ---
     slot_to_nutrients: Dict[str, Set[str]] = {}
     nutrient_to_slots: Dict[str, Set[str]] = {}
@@ -647,12 +892,13 @@ def build_network_notes_for_plan(plan: Dict[str, List[str]]) -> List[str]:
     seen_notes = set()
 
     # --- 2) Co-dosed boosters: effect == "boosts", same slot ---
-    mask_boosts = df["effect_norm"] == "boosts"
-    for _, row in df.loc[mask_boosts].iterrows():
-        src_raw = row["source"]
-        tgt_raw = row["target"]
-        edge_notes = str(row.get("notes", "")).strip()
-        confidence = str(row.get("confidence", "")).strip()
+    for edge in edges:
+        if edge.effect != "boosts":
+            continue
+        src_raw = edge.source
+        tgt_raw = edge.target
+        edge_notes = edge.notes
+        confidence = edge.confidence
 
         src_key = _network_node_to_plan_key(src_raw)
         tgt_key = _network_node_to_plan_key(tgt_raw)
@@ -681,12 +927,13 @@ def build_network_notes_for_plan(plan: Dict[str, List[str]]) -> List[str]:
                 )
 
     # --- 3) Separated antagonists: effect == "inhibits", different slots ---
-    mask_inhibits = df["effect_norm"] == "inhibits"
-    for _, row in df.loc[mask_inhibits].iterrows():
-        src_raw = row["source"]
-        tgt_raw = row["target"]
-        edge_notes = str(row.get("notes", "")).strip()
-        confidence = str(row.get("confidence", "")).strip()
+    for edge in edges:
+        if edge.effect != "inhibits":
+            continue
+        src_raw = edge.source
+        tgt_raw = edge.target
+        edge_notes = edge.notes
+        confidence = edge.confidence
 
         src_key = _network_node_to_plan_key(src_raw)
         tgt_key = _network_node_to_plan_key(tgt_raw)
@@ -784,26 +1031,13 @@ FOOD_BASE_MAP = {
 }
 
 
-def suggest_foods(
-    labels: Dict[str, str],
-    food_df: pd.DataFrame,
-    top_n: int = 5,
-    diet_filter: Optional[str] = None,
-) -> Dict[str, List[Tuple[str, float, str]]]:
+def food_bundles_needed(labels: Dict[str, str]) -> List[str]:
     """
-    For each flagged deficiency, return top foods using foods_usda.csv.
+    Decide which base bundles (foods_usda.csv "Bundle") need food recs.
 
     - For most markers, we use "low" as the trigger.
     - For homocysteine, we use "high" as the trigger.
-    - Anemia markers (Hemoglobin, MCV, ferritin, Serum ferritin)
-      are all mapped into a single "iron" bundle → one iron foods tab.
-
-    Returns:
-        base_nutrient -> list of (Food, Typical_serve_g, Category)
     """
-    out: Dict[str, List[Tuple[str, float, str]]] = {}
-
-    # 1) Decide which base bundles we need food recs for
     base_needed: List[str] = []
     for marker, status in labels.items():
         if marker == "homocysteine":
@@ -822,36 +1056,62 @@ def suggest_foods(
         if base not in base_needed:
             base_needed.append(base)
 
-    # 2) For each base bundle, pull top foods from foods_usda.csv
-    for base in base_needed:
-        sub = food_df[food_df["Bundle"] == base]
+    return base_needed
 
-        if diet_filter:
-            sub = sub[sub["Diet_tag"].str.contains(diet_filter, case=False, na=False)]
 
-        if sub.empty:
-            continue
+def suggest_foods(
+    labels: Dict[str, str],
+    food_df: Union[pd.DataFrame, FoodIndex, FoodRanker],
+    top_n: int = 5,
+    diet_filter: Optional[str] = None,
+) -> Dict[str, List[Tuple[str, float, str]]]:
+    """
+    For each flagged deficiency, return top foods using foods_usda.csv.
+
+    - For most markers, we use "low" as the trigger.
+    - For homocysteine, we use "high" as the trigger.
+    - Anemia markers (Hemoglobin, MCV, ferritin, Serum ferritin)
+      are all mapped into a single "iron" bundle → one iron foods tab.
+
+    food_df: the food table, or (faster) its prebuilt FoodIndex /
+             FoodRanker (snapshot.food_index)
+
+    Returns:
+        base_nutrient -> list of (Food, Typical_serve_g, Category)
+    """
+    return suggest_foods_for_bundles(
+        food_bundles_needed(labels),
+        food_df,
+        top_n=top_n,
+        diet_filter=diet_filter,
+    )
 
-        # Avoid repeating the same base food within a bundle
-        # (e.g. multiple rows for "Beef liver" → keep one)
-        sub = sub.drop_duplicates(subset=["Food"])
 
-        # Keep the first top_n as curated in the CSV
-        sub = sub.head(top_n)
+def suggest_foods_for_bundles(
+    base_needed: List[str],
+    food_df: Union[pd.DataFrame, FoodIndex, FoodRanker],
+    top_n: int = 5,
+    diet_filter: Optional[str] = None,
+) -> Dict[str, List[Tuple[str, float, str]]]:
+    """
+    Pull the top foods for each base bundle (see food_bundles_needed).
 
-        # Store: (Food name, typical serving grams, category)
-        foods_list: List[Tuple[str, float, str]] = []
-        for _, row in sub.iterrows():
-            food_name = str(row.get("Food", "")).strip()
-            category = str(row.get("Category", "")).strip()
-            try:
-                serving = float(row.get("Typical_serve_g", float("nan")))
-            except Exception:
-                serving = float("nan")
-            foods_list.append((food_name, serving, category))
+    Foods keep their curated CSV order, repeats of the same food within a
+    bundle are dropped, and the diet filter matches Diet_tag
+    (case-insensitive). A DataFrame is indexed on the fly; pass the
+    snapshot's FoodIndex to make this a lookup per bundle, or a FoodRanker
+    to rank by nutrient density per serving instead of CSV order.
 
+    Returns:
+        base_nutrient -> list of (Food, Typical_serve_g, Category)
+    """
+    index = food_df if isinstance(food_df, (FoodIndex, FoodRanker)) else FoodIndex(food_df)
+
+    out: Dict[str, List[Tuple[str, float, str]]] = {}
+    for base in base_needed:
+        foods_list = index.top(base, top_n, diet_filter)
         if foods_list:
-            out[base] = foods_list
+            out[base] = list(foods_list)
 
     return out
 
@@ -894,8 +1154,7 @@ def _format_lab_block(labs: Dict[str, float], labels: Dict[str, str]) -> str:
 
 def _format_supplement_block(plan: Dict[str, List[str]]) -> str:
     lines = []
-    for slot in SLOTS:
-        nutrients = plan.get(slot, [])
+    for slot, nutrients in plan.items():
         if not nutrients:
             continue
         pretty_nutrients = [HUMAN_LABEL.get(n, n) for n in nutrients]
@@ -935,19 +1194,24 @@ def generate_report(
     labs: Dict[str, float],
     patient: PatientInfo,
     food_path: Optional[Path] = FOOD_CSV_DEFAULT,
+    snapshot: Optional[ReferenceSnapshot] = None,
 ) -> str:
     """
     Main entry point.
 
     labs: dict of marker -> numeric value (e.g., {"Hemoglobin": 11.2, "ferritin": 8.0, ...})
     patient: PatientInfo dataclass
-    food_path: path to food CSV for food suggestions (Path or str or None)
+    food_path: path to food CSV for food suggestions (Path or str or None);
+               the snapshot's already-loaded table is used when it matches
+    snapshot: reference data (defaults to the shared startup snapshot)
     """
+    snapshot = _resolve_snapshot(snapshot)
+
     # 1. Classify labs
-    labels = classify_panel(labs)
+    labels = classify_panel(labs, snapshot, patient)
 
     # 2. Build supplement schedule
-    plan = build_supplement_plan(labels)
+    plan = build_supplement_plan(labels, snapshot)
 
     # 3. Load food data & suggest foods for low markers
     food_df = None
@@ -955,7 +1219,9 @@ def generate_report(
         # allow both str and Path
         if isinstance(food_path, (str, bytes)):
             food_path = Path(food_path)
-        if isinstance(food_path, Path) and food_path.exists():
+        if snapshot.food_path is not None and food_path == snapshot.food_path:
+            food_df = snapshot.food_index or snapshot.foods
+        elif isinstance(food_path, Path) and food_path.exists():
             food_df = load_food_data(food_path)
 
     food_suggestions = {}
@@ -963,65 +1229,68 @@ def generate_report(
         food_suggestions = suggest_foods(labels, food_df)
 
     # 4. Network-based explanations (optional)
-    if G_NETWORK is not None:
-        low_set = low_items(labels)
-        multihop = multihop_explanations(G_NETWORK, low_set, max_hops=2)
-        if multihop:
-            lines = []
-            for tgt, chains in multihop.items():
-                pretty_tgt = HUMAN_LABEL.get(tgt, tgt)
-                lines.append(f"{pretty_tgt}:")
-                for ch in chains[:3]:  # show at most 3 chains per target
-                    lines.append(f"  • {ch}")
-            network_block = "\n".join(lines)
-        else:
-            network_block = "No network-based causal chains found for the flagged deficiencies."
-    else:
-        network_block = "Nutrient interaction network not available (missing file or networkx)."
+    network_block = build_network_block(low_items(labels), snapshot)
 
     # 5. Build narrative report
-    header = [
-        "HemoVita – Personalized Micronutrient Report",
-        "===========================================",
-        "",
-        "Patient summary:",
-        f"- Age: {patient.age if patient.age is not None else 'N/A'}",
-        f"- Sex: {patient.sex or 'N/A'}",
-        f"- Pregnant: {patient.pregnant if patient.pregnant is not None else 'N/A'}",
-        f"- Country: {patient.country or 'N/A'}",
-    ]
-    if patient.notes:
-        header.append(f"- Notes: {patient.notes}")
-
-    labs_block = _format_lab_block(labs, labels)
-    supp_block = _format_supplement_block(plan)
-    food_block = _format_food_block(food_suggestions)
-
-    report_parts = [
-        "\n".join(header),
-        "",
-        "1. Lab overview",
-        "---------------",
-        labs_block or "No labs provided.",
-        "",
-        "2. Supplement plan (prototype)",
-        "------------------------------",
-        supp_block,
-        "",
-        "3. Food suggestions (per 100 g, highest nutrient density first)",
-        "----------------------------------------------------------------",
-        food_block,
-        "",
-        "4. Notes on cutoffs",
-        "--------------------",
-        "All low/normal/high classifications are derived from a unified cutoff table ",
-        "(`micronutrient_cutoffs_structured.csv`) built from WHO guidelines, IZiNCG ",
-        "zinc thresholds, and widely used clinical consensus cutoffs. This table can ",
-        "be updated independently of the code to reflect new evidence.",
-        "",
-        "5. Network-based nutrient interactions",
-        "--------------------------------------",
-        network_block,
-    ]
-
-    return "\n".join(report_parts)
+    return compose_report_text(labs, patient, labels, plan, food_suggestions, network_block)
+
+
+def network_chains(
+    low_set: List[str],
+    snapshot: Optional[ReferenceSnapshot] = None,
+) -> Union[str, Dict[str, List[str]]]:
+    """
+    Content of section 5: {target: up to 3 multi-hop chains} for the low
+    markers, or the message to show instead when there are none.
+    """
+    snapshot = _resolve_snapshot(snapshot)
+    G_NETWORK = snapshot.graph
+    if G_NETWORK is None:
+        return "Nutrient interaction network not available (missing file or networkx)."
+
+    multihop = multihop_explanations(
+        G_NETWORK, low_set, max_hops=2, index=snapshot.multihop_index,
+    )
+    if not multihop:
+        return "No network-based causal chains found for the flagged deficiencies."
+
+    # show at most 3 chains per target
+    return {tgt: chains[:3] for tgt, chains in multihop.items()}
+
+
+def _format_network_block(chains: Mapping[str, Sequence[str]]) -> str:
+    lines = []
+    for tgt, tgt_chains in chains.items():
+        pretty_tgt = HUMAN_LABEL.get(tgt, tgt)
+        lines.append(f"{pretty_tgt}:")
+        for ch in tgt_chains:
+            lines.append(f"  • {ch}")
+    return "\n".join(lines)
+
+
+def build_network_block(
+    low_set: List[str],
+    snapshot: Optional[ReferenceSnapshot] = None,
+) -> str:
+    """
+    Section 5 of the report: multi-hop network chains for the low markers.
+    """
+    chains = network_chains(low_set, snapshot)
+    return chains if isinstance(chains, str) else _format_network_block(chains)
+
+
+def compose_report_text(
+    labs: Dict[str, float],
+    patient: PatientInfo,
+    labels: Dict[str, str],
+    plan: Dict[str, List[str]],
+    food_suggestions: Dict[str, List[Tuple[str, float, str]]],
+    network_block: str,
+) -> str:
+    """
+    Assemble the narrative report from already-computed engine results
+    (the plain-text ReportRenderer; see render.py for Markdown / HTML).
+    """
+    from .render import get_renderer  # render builds on this module
+
+    return get_renderer("text").render(labs, patient, labels, plan, food_suggestions, network_block)
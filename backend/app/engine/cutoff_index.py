@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .core import MARKER_MAP, PatientInfo, _select_rows_for_marker, cutoff_tiers, ref_range
+
+# Patients fall into one of six demographic groups: sex code x pregnant.
+SEX_UNKNOWN, SEX_FEMALE, SEX_MALE = 0, 1, 2
+_SEX_CODES = {"female": SEX_FEMALE, "f": SEX_FEMALE, "male": SEX_MALE, "m": SEX_MALE}
+_SEX_NAMES = {"female": SEX_FEMALE, "male": SEX_MALE}
+N_GROUPS = 6
+
+Cutoffs = Tuple[Optional[float], Optional[float]]   # (low, high)
+
+
+def demographic_group(sex: Optional[str], pregnant: Optional[bool]) -> int:
+    """
+    Group code of a patient (unknown sex / pregnancy count as not
+    specified). A pregnant patient with no or an unknown sex is female, so
+    the pregnancy strata (all female-only) apply.
+    """
+    code = _SEX_CODES.get(str(sex).strip().lower(), SEX_UNKNOWN) if sex else SEX_UNKNOWN
+    if pregnant is True and code == SEX_UNKNOWN:
+        code = SEX_FEMALE
+    return code * 2 + (1 if pregnant is True else 0)
+
+
+def _text(value, default: str) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return default
+    return str(value).strip().lower() or default
+
+
+def _bound(value, default: float) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if math.isnan(value) else value
+
+
+class CutoffStratum(NamedTuple):
+    """One population group's thresholds for a marker."""
+    population_group: str
+    sex: str              # "all" / "female" / "male"
+    pregnancy: str        # "pregnant" / "nonpregnant" / "na"
+    age_min: float        # years, inclusive (-inf when open)
+    age_max: float        # years, exclusive (+inf when open)
+    low: Optional[float]
+    high: Optional[float]
+
+    def covers(self, group: int, age_lo: float, age_hi: float) -> bool:
+        """
+        True when every patient of `group` aged [age_lo, age_hi) falls in
+        this stratum. An unknown age is the segment (inf, inf): only
+        strata without an upper age bound (adults) cover it.
+        """
+        sex, pregnant = divmod(group, 2)
+        if self.sex != "all" and _SEX_NAMES.get(self.sex) != sex:
+            return False
+        if self.pregnancy == "pregnant" and not pregnant:
+            return False
+        if self.pregnancy == "nonpregnant" and pregnant:
+            return False
+        return self.age_min <= age_lo and age_hi <= self.age_max
+
+    def specificity(self) -> Tuple[bool, bool, int, float]:
+        """Sex-specific beats "all", pregnancy-specific beats "na", then
+        the stratum with more age bounds, then the narrower age range."""
+        bounds = math.isfinite(self.age_min) + math.isfinite(self.age_max)
+        return self.sex != "all", self.pregnancy != "na", bounds, -(self.age_max - self.age_min)
+
+
+class _MarkerTable(NamedTuple):
+    breaks: Tuple[float, ...]                      # sorted finite age bounds
+    cutoffs: Tuple[Tuple[Optional[Cutoffs], ...], ...]   # [group][segment]; last = unknown age
+    low: np.ndarray                                # (N_GROUPS, segments + 1), NaN = none
+    high: np.ndarray
+
+
+class CutoffIndex:
+    """
+    micronutrient_cutoffs_structured.csv compiled for per-patient lookups.
+
+    For each marker, every population group's rows (same micronutrient,
+    biomarker and unit as MARKER_MAP) become a CutoffStratum. The age
+    bounds of all strata cut the age axis into segments; for each of the
+    six sex x pregnancy groups and each segment the most specific stratum
+    covering it is resolved up front, falling back to the MARKER_MAP
+    population group's REF values when none does. A lookup is then a dict
+    get plus a bisect over a handful of breakpoints, and cutoff_matrix()
+    does the same for a cohort with searchsorted.
+
+    With no demographics (unknown sex and age, not pregnant) only strata
+    open to everyone apply, which gives the REF values for the shipped table.
+    """
+
+    def __init__(
+        self,
+        strata: Mapping[str, Sequence[CutoffStratum]],
+        default: Mapping[str, Mapping[str, float]],
+    ):
+        self.strata = {m: tuple(s) for m, s in strata.items()}
+        self._tables: Dict[str, _MarkerTable] = {}
+        for marker in dict.fromkeys([*default, *strata]):
+            rng = default.get(marker) or {}
+            fallback = (rng.get("low"), rng.get("high")) if rng else None
+            self._tables[marker] = self._compile(self.strata.get(marker, ()), fallback)
+
+    @classmethod
+    def from_cutoffs(
+        cls,
+        cutoffs_df: pd.DataFrame,
+        default: Mapping[str, Mapping[str, float]],
+    ) -> "CutoffIndex":
+        """default: the REF built from the same table (build_ref_from_cutoffs)."""
+        strata: Dict[str, List[CutoffStratum]] = {}
+        for marker in MARKER_MAP:
+            rows = _select_rows_for_marker(marker, cutoffs_df, all_populations=True)
+            for group, df in rows.groupby("population_group", sort=False):
+                rng = ref_range(marker, cutoff_tiers(df))
+                if not rng:
+                    continue
+                first = df.iloc[0]
+                strata.setdefault(marker, []).append(CutoffStratum(
+                    population_group=str(group),
+                    sex=_text(first.get("sex"), "all"),
+                    pregnancy=_text(first.get("pregnancy"), "na"),
+                    age_min=_bound(first.get("age_min_years"), -math.inf),
+                    age_max=_bound(first.get("age_max_years"), math.inf),
+                    low=rng.get("low"),
+                    high=rng.get("high"),
+                ))
+        return cls(strata, default)
+
+    @staticmethod
+    def _compile(strata: Sequence[CutoffStratum], fallback: Optional[Cutoffs]) -> _MarkerTable:
+        breaks = tuple(sorted({
+            b for s in strata for b in (s.age_min, s.age_max) if math.isfinite(b)
+        }))
+        edges = (-math.inf, *breaks, math.inf)
+        segments = [(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+        segments.append((math.inf, math.inf))   # unknown age
+
+        cutoffs = []
+        for group in range(N_GROUPS):
+            row = []
+            for lo, hi in segments:
+                fits = [s for s in strata if s.covers(group, lo, hi)]
+                if fits:
+                    best = max(fits, key=CutoffStratum.specificity)   # first wins ties
+                    row.append((best.low, best.high))
+                else:
+                    row.append(fallback)
+            cutoffs.append(tuple(row))
+
+        def plane(side: int) -> np.ndarray:
+            return np.array([
+                [np.nan if c is None or c[side] is None else c[side] for c in row]
+                for row in cutoffs
+            ], dtype=float)
+
+        return _MarkerTable(breaks, tuple(cutoffs), plane(0), plane(1))
+
+    def __contains__(self, marker: str) -> bool:
+        return marker in self._tables
+
+    def lookup(
+        self,
+        marker: str,
+        age: Optional[float] = None,
+        sex: Optional[str] = None,
+        pregnant: Optional[bool] = None,
+    ) -> Optional[Cutoffs]:
+        """(low, high) for a patient, None when the marker has no cutoffs."""
+        table = self._tables.get(marker)
+        if table is None:
+            return None
+        row = table.cutoffs[demographic_group(sex, pregnant)]
+        if age is None or age != age:
+            return row[-1]
+        return row[bisect_right(table.breaks, age)]
+
+    def cutoff_matrix(
+        self,
+        markers: Sequence[str],
+        patients: Sequence[PatientInfo],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (low, high) float arrays of shape (len(patients), len(markers)):
+        each patient's thresholds, NaN where there is none.
+        """
+        ages = np.array([np.nan if p.age is None else float(p.age) for p in patients], dtype=float)
+        groups = np.array([demographic_group(p.sex, p.pregnant) for p in patients], dtype=np.intp)
+        unknown_age = np.isnan(ages)
+
+        low = np.full((len(patients), len(markers)), np.nan)
+        high = np.full((len(patients), len(markers)), np.nan)
+        for j, marker in enumerate(markers):
+            table = self._tables.get(marker)
+            if table is None:
+                continue
+            seg = np.searchsorted(np.asarray(table.breaks, dtype=float), ages, side="right")
+            seg[unknown_age] = len(table.breaks) + 1
+            low[:, j] = table.low[groups, seg]
+            high[:, j] = table.high[groups, seg]
+        return low, high
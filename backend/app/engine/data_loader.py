@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from .core import (
+    DATA_DIR,
+    build_graph_from_edges,
+    build_interaction_rules_from_network,
+    build_multihop_index,
+    build_scheduler,
+    build_ref_from_cutoffs,
+    load_food_data,
+    reset_legacy_globals,
+)
+from .cutoff_index import CutoffIndex
+from .food_index import FoodIndex
+from .food_rank import FoodRanker, density_columns
+from .food_store import MANIFEST, FoodStore, find_food_store
+from .types import NetworkEdge, ReferenceSnapshot
+
+# The files under data_dir a snapshot is built from (see reload.py)
+CUTOFFS_FILE = "micronutrient_cutoffs_structured.csv"
+EDGES_FILE = "network_relationships.csv"
+FOODS_FILE = "foods_usda.csv"
+REFERENCE_FILES = (CUTOFFS_FILE, EDGES_FILE, FOODS_FILE)
+
+
+def _freeze(obj: Any) -> Any:
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def _edges_from_frame(df: pd.DataFrame) -> Tuple[NetworkEdge, ...]:
+    """Clean network_relationships.csv rows once into NetworkEdge records."""
+    edges = []
+    for _, row in df.iterrows():
+        edges.append(NetworkEdge(
+            source=str(row["source"]).strip(),
+            target=str(row["target"]).strip(),
+            effect=str(row.get("effect", "")).lower().strip(),
+            confidence=str(row.get("confidence", "")).strip(),
+            notes=str(row.get("notes", "")).strip(),
+        ))
+    return tuple(edges)
+
+
+def data_version(paths: Iterable[Path]) -> str:
+    """Content hash of the given files (missing files count as absent)."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(path.name.encode("utf-8") + b"\0")
+        if path.exists():
+            h.update(path.read_bytes())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def load_reference_snapshot(
+    data_dir: Path = DATA_DIR,
+    timings: Optional[Dict[str, float]] = None,
+) -> ReferenceSnapshot:
+    """
+    Read every reference CSV under `data_dir` once and build all derived
+    structures (REF/REF_TIERS, the demographic CutoffIndex, edge table,
+    BOOSTERS/ANTAGONISTS, graph, multi-hop chain index, foods).
+
+    A columnar FDC food store (data/fdc_store or $HEMOVITA_FOOD_STORE,
+    see fdc_ingest) is memory-mapped and ranked by nutrient density in
+    place of the curated foods_usda.csv picks.
+
+    timings: optional dict that receives seconds per build phase
+             (cutoffs, network, rules, multihop_index, foods[, food_store])
+    """
+    data_dir = Path(data_dir)
+    cutoff_csv = data_dir / CUTOFFS_FILE
+    edges_csv = data_dir / EDGES_FILE
+    food_csv = data_dir / FOODS_FILE
+    timings = {} if timings is None else timings
+    mark = time.perf_counter()
+
+    def phase(name: str) -> None:
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = now - mark
+        mark = now
+
+    cutoffs_df = pd.read_csv(cutoff_csv)
+    ref, ref_tiers = build_ref_from_cutoffs(cutoffs_df)
+    cutoff_index = CutoffIndex.from_cutoffs(cutoffs_df, ref)
+    phase("cutoffs")
+
+    edges_df: Optional[pd.DataFrame] = None
+    edges: Optional[Tuple[NetworkEdge, ...]] = None
+    if edges_csv.exists():
+        edges_df = pd.read_csv(edges_csv)
+        edges = _edges_from_frame(edges_df)
+
+    graph = None
+    if edges_df is not None:
+        try:
+            import networkx as nx
+            graph = nx.freeze(build_graph_from_edges(edges_df))
+        except ImportError:
+            # Same behaviour as core: no networkx -> no graph, no rules
+            edges_df = None
+    phase("network")
+
+    boosters, antagonists = build_interaction_rules_from_network(edges_df)
+    scheduler = build_scheduler(antagonists, boosters)
+    phase("rules")
+
+    multihop_index = _freeze(build_multihop_index(graph)) if graph is not None else None
+    phase("multihop_index")
+
+    foods = load_food_data(food_csv) if food_csv.exists() else None
+    food_index = None
+    if foods is not None:
+        # Rank by nutrient density when the table carries per100g_* columns
+        food_index = FoodRanker(foods) if density_columns(foods) else FoodIndex(foods)
+    phase("foods")
+
+    store_path = find_food_store(data_dir)
+    if store_path is not None:
+        food_index = FoodRanker.from_store(FoodStore.open(store_path))
+        phase("food_store")
+
+    # The store's manifest records when it was written, which is enough
+    # to tell rebuilt stores apart without hashing the columns.
+    sources = [cutoff_csv, edges_csv, food_csv]
+    if store_path is not None:
+        sources.append(store_path / MANIFEST)
+    version = data_version(sources)
+
+    return ReferenceSnapshot(
+        ref=_freeze(ref),
+        ref_tiers=_freeze(ref_tiers),
+        edges=edges,
+        boosters=_freeze(boosters),
+        antagonists=_freeze(antagonists),
+        graph=graph,
+        foods=foods,
+        food_path=food_csv,
+        multihop_index=multihop_index,
+        scheduler=scheduler,
+        food_index=food_index,
+        version=version,
+        cutoff_index=cutoff_index,
+    )
+
+
+_SNAPSHOT: Optional[ReferenceSnapshot] = None
+_SNAPSHOT_LOCK = threading.Lock()
+
+
+def get_reference_snapshot(timings: Optional[Dict[str, float]] = None) -> ReferenceSnapshot:
+    """
+    Return the shared snapshot, building it on first use.
+
+    The FastAPI startup hook calls this (via app.warmup) so the build cost
+    is paid before the first request; afterwards this is a plain attribute
+    read. `timings` receives the build phases if this call builds it.
+    """
+    global _SNAPSHOT
+    snap = _SNAPSHOT
+    if snap is not None:
+        return snap
+    with _SNAPSHOT_LOCK:
+        if _SNAPSHOT is None:
+            _SNAPSHOT = load_reference_snapshot(timings=timings)
+        return _SNAPSHOT
+
+
+def publish_snapshot(snapshot: ReferenceSnapshot) -> Optional[ReferenceSnapshot]:
+    """
+    Make `snapshot` the shared one and return the previous snapshot.
+
+    A single reference swap: callers that already fetched the old
+    snapshot keep using it (it is immutable), later calls get the new one.
+    """
+    global _SNAPSHOT
+    with _SNAPSHOT_LOCK:
+        old, _SNAPSHOT = _SNAPSHOT, snapshot
+    reset_legacy_globals()   # core.REF etc. are re-read on next access
+    return old
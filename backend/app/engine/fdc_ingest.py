@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .core import DATA_DIR
+from .food_rank import DENSITY_PREFIX, SERVING_PREFIX, serving_scores
+from .food_store import categorical, write_food_store
+
+# FoodData Central nutrient ids for the engine's food bundles. Amounts in
+# food_nutrient.csv are per 100 g, in the nutrient's unit (mg / µg).
+FDC_NUTRIENTS: Dict[str, int] = {
+    "iron": 1089,          # Iron, Fe (mg)
+    "folate": 1177,        # Folate, total (µg)
+    "vitamin_A": 1106,     # Vitamin A, RAE (µg)
+    "vitamin_B6": 1175,    # Vitamin B-6 (mg)
+    "vitamin_B12": 1178,   # Vitamin B-12 (µg)
+    "vitamin_C": 1162,     # Vitamin C, total ascorbic acid (mg)
+    "vitamin_D": 1114,     # Vitamin D (D2 + D3) (µg)
+    "vitamin_E": 1109,     # Vitamin E (alpha-tocopherol) (mg)
+    "magnesium": 1090,     # Magnesium, Mg (mg)
+    "calcium": 1087,       # Calcium, Ca (mg)
+    "zinc": 1095,          # Zinc, Zn (mg)
+}
+
+# Adult daily values (same units as above). A food's Bundle is the
+# nutrient it covers the largest share of the daily value for, per 100 g.
+DAILY_VALUES: Dict[str, float] = {
+    "iron": 18.0,
+    "folate": 400.0,
+    "vitamin_A": 900.0,
+    "vitamin_B6": 1.7,
+    "vitamin_B12": 2.4,
+    "vitamin_C": 90.0,
+    "vitamin_D": 20.0,
+    "vitamin_E": 15.0,
+    "magnesium": 420.0,
+    "calcium": 1300.0,
+    "zinc": 11.0,
+}
+
+# FDC has no diet tags: derive one from the food category. Only categories
+# known to hold plant foods (vegan) or plant + dairy / egg foods
+# (vegetarian) are tagged as such, by exact name; a keyword match is not
+# enough ("Fried rice and lo/chow mein" is not vegan because it mentions
+# rice). Categories of mixed dishes, sandwiches and soups are omnivore even
+# if listed, and so is everything else, so a vegan / vegetarian pick is
+# never a meat dish.
+MIXED_DISH = re.compile(r"mixed|dishes|sandwich|soup", re.IGNORECASE)
+
+DIET_CATEGORIES = tuple((tag, frozenset(name.lower() for name in names)) for tag, names in (
+    ("vegan", (
+        # FDC food categories (Foundation / SR Legacy)
+        "Spices and Herbs",
+        "Fruits and Fruit Juices",
+        "Vegetables and Vegetable Products",
+        "Nut and Seed Products",
+        "Legumes and Legume Products",
+        # WWEIA food categories (FNDDS)
+        "Apples", "Bananas", "Grapes", "Peaches and nectarines", "Strawberries",
+        "Blueberries and other berries", "Citrus fruits", "Melons", "Dried fruits",
+        "Pears", "Pineapple", "Mango and papaya", "Other fruits and fruit salads",
+        "Tomatoes", "Carrots", "Other red and orange vegetables", "Dark green vegetables",
+        "Lettuce and lettuce salads", "String beans", "Onions", "Corn",
+        "Other starchy vegetables", "White potatoes, baked or boiled",
+        "Beans, peas, legumes", "Nuts and seeds", "Processed soy products", "Rice",
+        "Citrus juice", "Apple juice", "Other fruit juice", "Vegetable juice",
+    )),
+    ("vegetarian", (
+        "Dairy and Egg Products",
+        "Breakfast Cereals",
+        "Cereal Grains and Pasta",          # egg noodles
+        "Milk, whole", "Milk, reduced fat", "Milk, lowfat", "Milk, nonfat",
+        "Flavored milk, whole", "Flavored milk, reduced fat", "Flavored milk, lowfat",
+        "Flavored milk, nonfat", "Cheese", "Cottage/ricotta cheese",
+        "Yogurt, regular", "Yogurt, Greek",
+        "Cooked cereals", "Ready-to-eat cereals, higher sugar (>21.2g/100g)",
+        "Ready-to-eat cereals, lower sugar (=<21.2g/100g)", "Pasta, noodles, cooked grains",
+    )),
+    ("pescatarian/omnivore", (
+        "Finfish and Shellfish Products",
+        "Fish", "Shellfish",
+    )),
+))
+
+DEFAULT_DATA_TYPES = ("foundation_food", "sr_legacy_food", "survey_fndds_food")
+
+
+def diet_tag_for_category(category: str) -> str:
+    if MIXED_DISH.search(category):
+        return "omnivore"
+    name = category.strip().lower()
+    for tag, names in DIET_CATEGORIES:
+        if name in names:
+            return tag
+    return "omnivore"
+
+
+def _chunks(path: Path, columns: Sequence[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+    yield from pd.read_csv(path, usecols=list(columns), chunksize=chunk_size, low_memory=True)
+
+
+def _read_categories(fdc_dir: Path) -> Dict[int, str]:
+    """food_category_id -> description (FDC categories, then WWEIA for FNDDS)."""
+    out: Dict[int, str] = {}
+    wweia = fdc_dir / "wweia_food_category.csv"
+    if wweia.exists():
+        df = pd.read_csv(wweia)
+        out.update(zip(df["wweia_food_category"].astype(int), df["wweia_food_category_description"].astype(str)))
+    cats = fdc_dir / "food_category.csv"
+    if cats.exists():
+        df = pd.read_csv(cats, usecols=["id", "description"])
+        out.update(zip(df["id"].astype(int), df["description"].astype(str)))
+    return out
+
+
+def ingest_fdc(
+    fdc_dir: Path,
+    out_dir: Path,
+    data_types: Sequence[str] = DEFAULT_DATA_TYPES,
+    chunk_size: int = 500_000,
+    log=None,
+) -> Dict[str, float]:
+    """
+    Stream an FDC CSV export into a columnar food store.
+
+    food.csv, food_nutrient.csv and food_portion.csv are read in chunks of
+    `chunk_size` rows, keeping only the columns and nutrient ids the
+    engine uses, so memory is bounded by the chunk plus the output columns
+    (two float32 per kept food and bundle), not by the export size.
+
+    Returns {"foods": rows written, "nutrient_rows": matched amounts,
+    "seconds": elapsed}.
+    """
+    fdc_dir, out_dir = Path(fdc_dir), Path(out_dir)
+    log = log or (lambda msg: None)
+    start = time.perf_counter()
+    wanted_types = set(data_types)
+
+    # 1) Foods of the wanted data types
+    ids: List[np.ndarray] = []
+    names: List[str] = []
+    category_ids: List[np.ndarray] = []
+    for chunk in _chunks(fdc_dir / "food.csv", ["fdc_id", "data_type", "description", "food_category_id"], chunk_size):
+        chunk = chunk[chunk["data_type"].isin(wanted_types)]
+        ids.append(chunk["fdc_id"].to_numpy(dtype=np.int64))
+        names.extend(chunk["description"].astype(str).str.strip())
+        category_ids.append(pd.to_numeric(chunk["food_category_id"], errors="coerce").fillna(-1).to_numpy(dtype=np.int64))
+    fdc_ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+    cat_ids = np.concatenate(category_ids) if category_ids else np.zeros(0, dtype=np.int64)
+    n = len(fdc_ids)
+    log(f"food.csv: {n} foods of {', '.join(sorted(wanted_types))}")
+
+    # fdc_id -> row via a sorted copy (searchsorted per chunk)
+    order = np.argsort(fdc_ids, kind="stable")
+    sorted_ids = fdc_ids[order]
+
+    def rows_for(chunk_ids: np.ndarray) -> np.ndarray:
+        """Row of each fdc_id, -1 where the food was not kept."""
+        if not n:
+            return np.full(len(chunk_ids), -1)
+        pos = np.clip(np.searchsorted(sorted_ids, chunk_ids), 0, n - 1)
+        return np.where(sorted_ids[pos] == chunk_ids, order[pos], -1)
+
+    # 2) Nutrient amounts per 100 g
+    bundles = list(FDC_NUTRIENTS)
+    nutrient_ids = np.array(list(FDC_NUTRIENTS.values()), dtype=np.int64)
+    column_of = np.full(nutrient_ids.max() + 1, -1, dtype=np.int64)   # nutrient_id -> bundle row
+    column_of[nutrient_ids] = np.arange(len(nutrient_ids))
+    amounts = np.full((len(bundles), n), np.nan, dtype=np.float32)
+    matched = 0
+    for chunk in _chunks(fdc_dir / "food_nutrient.csv", ["fdc_id", "nutrient_id", "amount"], chunk_size):
+        nid = chunk["nutrient_id"].to_numpy(dtype=np.int64)
+        keep = np.isin(nid, nutrient_ids)
+        if not keep.any():
+            continue
+        rows = rows_for(chunk["fdc_id"].to_numpy(dtype=np.int64)[keep])
+        found = rows >= 0
+        values = pd.to_numeric(chunk["amount"][keep][found], errors="coerce").to_numpy()
+        amounts[column_of[nid[keep][found]], rows[found]] = values
+        matched += int(found.sum())
+    log(f"food_nutrient.csv: {matched} amounts for {len(bundles)} nutrients")
+
+    # 3) Typical serving: the first portion (lowest seq_num) with a gram weight
+    servings = np.full(n, np.nan)
+    portions = fdc_dir / "food_portion.csv"
+    if portions.exists():
+        best_seq = np.full(n, np.inf)
+        for chunk in _chunks(portions, ["fdc_id", "seq_num", "gram_weight"], chunk_size):
+            grams = pd.to_numeric(chunk["gram_weight"], errors="coerce").to_numpy(dtype=float)
+            seq = pd.to_numeric(chunk["seq_num"], errors="coerce").fillna(1e18).to_numpy(dtype=float)
+            rows = rows_for(chunk["fdc_id"].to_numpy(dtype=np.int64))
+            ok = (rows >= 0) & (grams > 0)
+            r, s, g = rows[ok], seq[ok], grams[ok]
+            # first portion per food within the chunk, then against earlier chunks
+            o = np.lexsort((s, r))
+            r, s, g = r[o], s[o], g[o]
+            first = np.r_[True, r[1:] != r[:-1]] if len(r) else np.zeros(0, dtype=bool)
+            r, s, g = r[first], s[first], g[first]
+            better = s < best_seq[r]
+            best_seq[r[better]] = s[better]
+            servings[r[better]] = g[better]
+        log(f"food_portion.csv: servings for {int(np.isfinite(servings).sum())} foods")
+
+    # 4) Category, diet tag and bundle
+    category_names = _read_categories(fdc_dir)
+    categories = [category_names.get(int(c), "Other") for c in cat_ids]
+    diet_tags = [diet_tag_for_category(c) for c in categories]
+    dv = np.array([DAILY_VALUES[b] for b in bundles], dtype=np.float32)[:, None]
+    share = np.nan_to_num(amounts / dv, nan=0.0)
+    best = share.argmax(axis=0) if n else np.zeros(0, dtype=np.int64)
+    bundle_col = np.where(share.max(axis=0) > 0, best, len(bundles)) if n else best
+
+    columns = {
+        "fdc_id": fdc_ids,
+        "Food": names,
+        "Category": categorical(categories),
+        "Bundle": (bundle_col.astype(np.int32), bundles + ["none"]),
+        "Typical_serve_g": servings,
+        "Diet_tag": categorical(diet_tags),
+    }
+    for j, bundle in enumerate(bundles):
+        columns[DENSITY_PREFIX + bundle] = np.ascontiguousarray(amounts[j])
+        # ranking scores, so the server maps them instead of computing them at load
+        columns[SERVING_PREFIX + bundle] = serving_scores(servings, amounts[j]).astype(np.float32)
+
+    write_food_store(out_dir, columns, meta={
+        "source": str(fdc_dir),
+        "data_types": sorted(wanted_types),
+        "nutrients": FDC_NUTRIENTS,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    })
+    return {"foods": n, "nutrient_rows": matched, "seconds": time.perf_counter() - start}
+
+
+def run_cli(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.engine.fdc_ingest",
+        description="Build the engine's columnar food store from a FoodData Central CSV export.",
+    )
+    parser.add_argument("fdc_dir", type=Path,
+                        help="unpacked FDC CSV export (food.csv, food_nutrient.csv, ...)")
+    parser.add_argument("-o", "--output", type=Path, default=DATA_DIR / "fdc_store",
+                        help="store path, a symlink to the current build "
+                             "(default: backend/data/fdc_store, loaded at startup)")
+    parser.add_argument("--data-types", default=",".join(DEFAULT_DATA_TYPES),
+                        help="comma-separated FDC data_type values to keep")
+    parser.add_argument("--chunk-size", type=int, default=500_000, help="CSV rows per chunk")
+    args = parser.parse_args(argv)
+
+    stats = ingest_fdc(
+        args.fdc_dir,
+        args.output,
+        data_types=[t.strip() for t in args.data_types.split(",") if t.strip()],
+        chunk_size=args.chunk_size,
+        log=lambda msg: print(msg, file=sys.stderr),
+    )
+    print(f"wrote {stats['foods']} foods -> {args.output} ({stats['seconds']:.1f}s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+FoodRecord = Tuple[str, float, str]   # (Food, Typical_serve_g, Category)
+
+
+def _serving(value) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return float("nan")
+
+
+class FoodIndex:
+    """
+    foods_usda.csv compiled for lookups: (bundle, diet filter) -> ordered,
+    de-duplicated tuple of (Food, Typical_serve_g, Category) records.
+
+    Same semantics as filtering the frame per request: rows keep their CSV
+    order, the diet filter is a case-insensitive regex search over
+    Diet_tag, and duplicates of a Food are dropped after filtering (first
+    one wins). The unfiltered view is built up front; a diet filter is
+    evaluated once per distinct Diet_tag value the first time it is used
+    and then cached, so a request is a dict lookup plus a slice.
+    """
+
+    MAX_CACHED_FILTERS = 256   # diet filters are client input; bound the cache
+
+    def __init__(self, food_df: pd.DataFrame):
+        n = len(food_df)
+
+        def column(name: str, default=""):
+            return food_df[name].tolist() if name in food_df.columns else [default] * n
+
+        foods = [str(v).strip() for v in column("Food")]
+        categories = [str(v).strip() for v in column("Category")]
+        servings = [_serving(v) for v in column("Typical_serve_g", math.nan)]
+        tags = [str(v) for v in column("Diet_tag")]
+
+        # bundle -> [(record, diet tag)] in CSV order
+        rows: Dict[str, List[Tuple[FoodRecord, str]]] = {}
+        for bundle, food, serving, category, tag in zip(
+            column("Bundle"), foods, servings, categories, tags
+        ):
+            rows.setdefault(bundle, []).append(((food, serving, category), tag))
+
+        self._rows = rows
+        self._tags = sorted(set(tags))
+        self._all: Dict[str, Tuple[FoodRecord, ...]] = {
+            bundle: self._dedupe(rec for rec, _ in bundle_rows)
+            for bundle, bundle_rows in rows.items()
+        }
+        self._by_filter: Dict[str, Dict[str, Tuple[FoodRecord, ...]]] = {}
+
+        # Precompile the plain diet words used in the tags ("vegan",
+        # "omnivore", "pescatarian" from "pescatarian/omnivore", ...)
+        for word in sorted({w.strip() for tag in self._tags for w in tag.split("/")}):
+            if word:
+                self._by_filter[word] = self._compile_filter(re.escape(word))
+
+    @staticmethod
+    def _dedupe(records) -> Tuple[FoodRecord, ...]:
+        seen = set()
+        out = []
+        for rec in records:
+            if rec[0] in seen:
+                continue
+            seen.add(rec[0])
+            out.append(rec)
+        return tuple(out)
+
+    def _compile_filter(self, diet_filter: str) -> Dict[str, Tuple[FoodRecord, ...]]:
+        pattern = re.compile(diet_filter, flags=re.IGNORECASE)
+        allowed = {tag for tag in self._tags if pattern.search(tag)}
+        compiled = {}
+        for bundle, bundle_rows in self._rows.items():
+            records = self._dedupe(rec for rec, tag in bundle_rows if tag in allowed)
+            if records:
+                compiled[bundle] = records
+        return compiled
+
+    def lookup(self, bundle: str, diet_filter: Optional[str] = None) -> Tuple[FoodRecord, ...]:
+        """All records for a bundle (optionally diet-filtered), best first."""
+        if not diet_filter:
+            return self._all.get(bundle, ())
+        compiled = self._by_filter.get(diet_filter)
+        if compiled is None:
+            compiled = self._compile_filter(diet_filter)
+            if len(self._by_filter) < self.MAX_CACHED_FILTERS:
+                self._by_filter[diet_filter] = compiled
+        return compiled.get(bundle, ())
+
+    def top(self, bundle: str, k: int, diet_filter: Optional[str] = None) -> Tuple[FoodRecord, ...]:
+        """The first k records of lookup() (same interface as FoodRanker.top)."""
+        return self.lookup(bundle, diet_filter)[:k]
+
+    def bundles(self) -> List[str]:
+        return list(self._all)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .food_index import FoodRecord
+
+if TYPE_CHECKING:
+    from .food_store import FoodStore
+
+# Nutrient density columns: amount of the bundle's nutrient per 100 g
+# (e.g. per100g_iron, per100g_vitamin_B12), in the nutrient's usual unit.
+DENSITY_PREFIX = "per100g_"
+# Precomputed ranking scores of a food store: amount of the bundle's
+# nutrient per typical serving (float32, -inf: not a candidate).
+SERVING_PREFIX = "per_serving_"
+
+
+def density_columns(food_df: pd.DataFrame) -> Dict[str, str]:
+    """{bundle: column} for the per100g_<bundle> columns of a food table."""
+    return {
+        col[len(DENSITY_PREFIX):]: col
+        for col in food_df.columns
+        if isinstance(col, str) and col.startswith(DENSITY_PREFIX) and len(col) > len(DENSITY_PREFIX)
+    }
+
+
+def serving_scores(servings: np.ndarray, per100g: np.ndarray) -> np.ndarray:
+    """Amount per serving for every row (100 g when the serving is unknown; -inf: not a candidate)."""
+    grams = np.where(np.isfinite(servings) & (servings > 0), servings, 100.0)
+    score = np.asarray(per100g, dtype=float) * grams / 100.0
+    score[~(score > 0)] = -np.inf
+    return score
+
+
+class FoodRanker:
+    """
+    Top-k foods per bundle by nutrient density per serving, over columns
+    kept as NumPy arrays.
+
+    With per100g_<bundle> columns a food's score for that bundle is
+    per100g * Typical_serve_g / 100 (100 g when the serving is unknown),
+    and every food with a positive amount is a candidate, whatever its
+    Bundle. Without density columns (the curated foods_usda.csv) the
+    candidates are the rows tagged with the bundle, scored by CSV order,
+    which gives the same picks as FoodIndex.
+
+    Diet filters keep their meaning (case-insensitive regex search over
+    Diet_tag) but are evaluated once per distinct tag and expanded into a
+    row mask. The plain diet words in the table are compiled up front,
+    together with the top PRECOMPUTED_K picks for every (bundle, word), so
+    the usual requests are a dict lookup plus a slice however large the
+    table is. Other filters run an argpartition over the masked scores the
+    first time (then are cached like the plain words); a k above
+    PRECOMPUTED_K always does. Repeats of a Food are dropped (best-scoring
+    row wins).
+
+    FoodRanker.from_store ranks a memory-mapped FoodStore (FDC ingest)
+    in place: names, servings, diet codes and the per_serving_<bundle>
+    scores written by the ingest stay memory-mapped, so loading (or
+    hot-reloading) a store copies no column. Stores written before the
+    score columns existed get their scores computed at load instead.
+    """
+
+    PRECOMPUTED_K = 32
+    MAX_CACHED_FILTERS = 256   # diet filters are client input; bound the cache
+
+    def __init__(self, food_df: pd.DataFrame):
+        n = len(food_df)
+
+        def column(name: str, default=""):
+            return food_df[name].tolist() if name in food_df.columns else [default] * n
+
+        if "Typical_serve_g" in food_df.columns:
+            servings = pd.to_numeric(food_df["Typical_serve_g"], errors="coerce").to_numpy(dtype=float)
+        else:
+            servings = np.full(n, np.nan)
+        codes, tags = pd.factorize(pd.Series(column("Diet_tag")).astype(str))
+
+        columns = density_columns(food_df)
+        if columns:
+            densities = {
+                bundle: pd.to_numeric(food_df[col], errors="coerce").to_numpy(dtype=float)
+                for bundle, col in columns.items()
+            }
+            scores = self._density_scores(servings, densities)
+        else:
+            # CSV order within the rows tagged with each bundle
+            bundles = pd.Series(column("Bundle")).astype(str).str.strip().to_numpy(dtype=object)
+            order = -np.arange(n, dtype=float)
+            scores = {b: np.where(bundles == b, order, -np.inf) for b in pd.unique(bundles)}
+
+        self._setup(
+            names=np.array([str(v).strip() for v in column("Food")], dtype=object),
+            categories=np.array([str(v).strip() for v in column("Category")], dtype=object),
+            servings=servings,
+            tag_codes=codes,
+            tags=[str(t) for t in tags],
+            scores=scores,
+            by_density=bool(columns),
+        )
+
+    @classmethod
+    def from_store(cls, store: "FoodStore") -> "FoodRanker":
+        """Rank a FoodStore by its per_serving_<bundle> (else per100g_<bundle>) columns."""
+        servings = store["Typical_serve_g"]
+        diet = store["Diet_tag"]
+        precomputed = store.serving_columns()
+        scores = {}
+        for bundle, col in store.density_columns().items():
+            if bundle in precomputed:
+                scores[bundle] = store[precomputed[bundle]]
+            else:   # older store: same float32 scores the ingest would have written
+                scores[bundle] = serving_scores(servings, store[col]).astype(np.float32)
+        ranker = cls.__new__(cls)
+        ranker._setup(
+            names=store["Food"],
+            categories=store["Category"],
+            servings=servings,
+            tag_codes=diet.codes,
+            tags=list(diet.categories),
+            scores=scores,
+            by_density=True,
+        )
+        return ranker
+
+    @staticmethod
+    def _density_scores(servings: np.ndarray, densities: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """bundle -> amount per serving for every row (-inf: not a candidate)."""
+        return {bundle: serving_scores(servings, per100g) for bundle, per100g in densities.items()}
+
+    def _setup(
+        self,
+        names: Sequence[str],
+        categories: Sequence[str],
+        servings: np.ndarray,
+        tag_codes: np.ndarray,
+        tags: List[str],
+        scores: Dict[str, np.ndarray],
+        by_density: bool,
+    ) -> None:
+        self._names = names
+        self._categories = categories
+        self._servings = servings
+        self._tag_codes = tag_codes
+        self._tags = tags
+        self._scores = scores
+        self.by_density = by_density
+
+        self._masks: Dict[str, np.ndarray] = {}
+        self._top: Dict[Tuple[str, Optional[str]], Tuple[FoodRecord, ...]] = {}
+        words = sorted({w.strip() for tag in self._tags for w in tag.split("/")} - {""})
+        for word in [None] + words:
+            mask = None if word is None else self._mask(word)
+            for bundle in self._scores:
+                self._top[(bundle, word)] = self._rank(bundle, mask, self.PRECOMPUTED_K)
+
+    def __len__(self) -> int:
+        return len(self._servings)
+
+    def _mask(self, diet_filter: str) -> np.ndarray:
+        mask = self._masks.get(diet_filter)
+        if mask is None:
+            pattern = re.compile(diet_filter, flags=re.IGNORECASE)
+            allowed = np.array([bool(pattern.search(tag)) for tag in self._tags], dtype=bool)
+            mask = allowed[self._tag_codes] if len(allowed) else np.zeros(len(self), dtype=bool)
+            if len(self._masks) < self.MAX_CACHED_FILTERS:
+                self._masks[diet_filter] = mask
+        return mask
+
+    def _record(self, i: int) -> FoodRecord:
+        return (self._names[i], float(self._servings[i]), self._categories[i])
+
+    def _rank(self, bundle: str, mask: Optional[np.ndarray], k: int) -> Tuple[FoodRecord, ...]:
+        scores = self._scores.get(bundle)
+        if scores is None or k <= 0:
+            return ()
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        n_candidates = int(np.count_nonzero(scores > -np.inf))
+        if not n_candidates:
+            return ()
+
+        # Partition for the best m rows, widening m until k distinct foods
+        # are found (repeated names) or the candidates run out.
+        m = min(k, n_candidates)
+        while True:
+            if m < len(scores):
+                kth = np.argpartition(-scores, m - 1)[m - 1]
+                idx = np.flatnonzero(scores >= scores[kth])   # keep ties at the boundary
+            else:
+                idx = np.flatnonzero(scores > -np.inf)
+            idx = idx[np.lexsort((idx, -scores[idx]))]      # best first, then CSV order
+
+            out: List[FoodRecord] = []
+            seen = set()
+            for i in idx:
+                name = self._names[i]
+                if name in seen:
+                    continue
+                seen.add(name)
+                out.append(self._record(i))
+                if len(out) == k:
+                    break
+            if len(out) == k or m >= n_candidates:
+                return tuple(out)
+            m = min(m * 4, n_candidates)
+
+    def top(self, bundle: str, k: int, diet_filter: Optional[str] = None) -> Tuple[FoodRecord, ...]:
+        """The k densest foods for a bundle (optionally diet-filtered), best first."""
+        key = (bundle, diet_filter or None)
+        if k <= self.PRECOMPUTED_K:
+            picks = self._top.get(key)
+            if picks is None:
+                mask = self._mask(diet_filter) if diet_filter else None
+                picks = self._rank(bundle, mask, self.PRECOMPUTED_K)
+                if diet_filter in self._masks:   # keep the picks of cached filters only
+                    self._top[key] = picks
+            return picks[:k]
+        mask = self._mask(diet_filter) if diet_filter else None
+        return self._rank(bundle, mask, k)
+
+    def bundles(self) -> List[str]:
+        return list(self._scores)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .food_rank import DENSITY_PREFIX, SERVING_PREFIX
+
+# Columnar food store written by `python -m app.engine.fdc_ingest`:
+#
+#   <store>/manifest.json              rows, columns, categories, provenance
+#   <store>/<column>.npy               numeric columns (Typical_serve_g,
+#                                      per100g_<bundle>, per_serving_<bundle>,
+#                                      fdc_id)
+#   <store>/<column>.codes.npy         categorical columns (Category, Bundle,
+#                                      Diet_tag): int32 codes, categories in
+#                                      the manifest
+#   <store>/<column>.data.npy          string columns (Food): UTF-8 bytes of
+#   <store>/<column>.offsets.npy       all values + int64 offsets (n + 1)
+#
+# Plain .npy files, so opening the store memory-maps them: no parsing, and
+# pages are only read when a column is touched.
+#
+# <store> itself is a symlink to the build it serves (<store>.v<ns>/).
+# A new build is written next to it and the link is switched with one
+# os.replace, so a reader (or the reloader's poll) sees either the old or
+# the new store, never none. The previous build is kept for readers that
+# were opening it while the link moved.
+
+STORE_FORMAT = "hemovita-food-store"
+STORE_VERSION = 1
+MANIFEST = "manifest.json"
+FOOD_STORE_ENV = "HEMOVITA_FOOD_STORE"
+
+
+class StringColumn:
+    """Read-only string column over memory-mapped UTF-8 data + offsets."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._data[start:end].tobytes().decode("utf-8")
+
+    def tolist(self) -> List[str]:
+        return [self[i] for i in range(len(self))]
+
+
+class CategoricalColumn:
+    """Read-only low-cardinality string column: int32 codes + categories."""
+
+    def __init__(self, codes: np.ndarray, categories: Sequence[str]):
+        self.codes = codes
+        self.categories = list(categories)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int) -> str:
+        return self.categories[self.codes[i]]
+
+    def tolist(self) -> List[str]:
+        return [self.categories[c] for c in self.codes.tolist()]
+
+
+class FoodStore:
+    """A columnar food store opened with memory-mapped columns."""
+
+    def __init__(self, path: Path, manifest: Mapping, columns: Mapping[str, object]):
+        self.path = path
+        self.manifest = manifest
+        self.columns = dict(columns)
+        self.rows = int(manifest["rows"])
+
+    @classmethod
+    def open(cls, path: Path, mmap: bool = True) -> "FoodStore":
+        # read every file from the build the link points at right now
+        path = Path(path).resolve()
+        manifest = json.loads((path / MANIFEST).read_text(encoding="utf-8"))
+        if manifest.get("format") != STORE_FORMAT:
+            raise ValueError(f"{path} is not a food store")
+        if manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"{path}: unsupported food store version {manifest.get('version')}")
+
+        mode = "r" if mmap else None
+
+        def load(name: str) -> np.ndarray:
+            return np.load(path / name, mmap_mode=mode, allow_pickle=False)
+
+        columns: Dict[str, object] = {}
+        for name, spec in manifest["columns"].items():
+            kind = spec["kind"]
+            if kind == "numeric":
+                columns[name] = load(f"{name}.npy")
+            elif kind == "categorical":
+                columns[name] = CategoricalColumn(load(f"{name}.codes.npy"), spec["categories"])
+            elif kind == "string":
+                columns[name] = StringColumn(load(f"{name}.data.npy"), load(f"{name}.offsets.npy"))
+            else:
+                raise ValueError(f"{path}: unknown column kind {kind!r} for {name}")
+        return cls(path, manifest, columns)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def density_columns(self) -> Dict[str, str]:
+        """{bundle: column} for the per100g_<bundle> columns."""
+        return {
+            name[len(DENSITY_PREFIX):]: name
+            for name in self.columns
+            if name.startswith(DENSITY_PREFIX)
+        }
+
+    def serving_columns(self) -> Dict[str, str]:
+        """{bundle: column} for the precomputed per_serving_<bundle> scores."""
+        return {
+            name[len(SERVING_PREFIX):]: name
+            for name in self.columns
+            if name.startswith(SERVING_PREFIX)
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize the store as a DataFrame (load_food_data layout)."""
+        return pd.DataFrame({
+            name: column.tolist() if isinstance(column, (StringColumn, CategoricalColumn)) else np.asarray(column)
+            for name, column in self.columns.items()
+        })
+
+
+def find_food_store(data_dir: Path) -> Optional[Path]:
+    """$HEMOVITA_FOOD_STORE, else <data_dir>/fdc_store, if it holds a store."""
+    env = os.environ.get(FOOD_STORE_ENV)
+    path = Path(env) if env else Path(data_dir) / "fdc_store"
+    return path if (path / MANIFEST).exists() else None
+
+
+def write_food_store(
+    path: Path,
+    columns: Mapping[str, object],
+    meta: Optional[Mapping] = None,
+) -> Path:
+    """
+    Write a store. columns maps a name to either a NumPy numeric array, a
+    (codes, categories) pair for categorical columns, or a list of str.
+    The build goes to a new <path>.v<ns> directory and `path` (a symlink)
+    is switched to it atomically at the end, so readers never see a
+    half-written or missing store.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    build = path.with_name(f"{path.name}.v{time.time_ns()}")
+    tmp = build.with_name(build.name + ".tmp")
+    tmp.mkdir()
+
+    rows = None
+    specs: Dict[str, Dict] = {}
+    for name, column in columns.items():
+        if isinstance(column, tuple):
+            codes, categories = column
+            codes = np.asarray(codes, dtype=np.int32)
+            np.save(tmp / f"{name}.codes.npy", codes)
+            specs[name] = {"kind": "categorical", "categories": list(categories)}
+            n = len(codes)
+        elif isinstance(column, np.ndarray):
+            np.save(tmp / f"{name}.npy", column)
+            specs[name] = {"kind": "numeric", "dtype": column.dtype.str}
+            n = len(column)
+        else:
+            encoded = [str(v).encode("utf-8") for v in column]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            np.save(tmp / f"{name}.data.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            np.save(tmp / f"{name}.offsets.npy", offsets)
+            specs[name] = {"kind": "string"}
+            n = len(encoded)
+        if rows is not None and n != rows:
+            raise ValueError(f"column {name} has {n} rows, expected {rows}")
+        rows = n
+
+    manifest = {
+        "format": STORE_FORMAT,
+        "version": STORE_VERSION,
+        "rows": rows or 0,
+        "columns": specs,
+        **dict(meta or {}),
+    }
+    (tmp / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    tmp.rename(build)
+    _publish(path, build)
+    return path
+
+
+def _builds(path: Path) -> List[Path]:
+    """<path>.v<ns> build directories, oldest first."""
+    prefix = path.name + ".v"
+    found = []
+    for p in path.parent.glob(prefix + "*"):
+        stamp = p.name[len(prefix):]
+        if p.is_dir() and not p.is_symlink() and stamp.isdigit():
+            found.append((int(stamp), p))
+    return [p for _, p in sorted(found)]
+
+
+def _publish(path: Path, build: Path) -> None:
+    """Point the `path` symlink at `build`; drop all but the two newest builds."""
+    if path.is_dir() and not path.is_symlink():
+        # store written before builds were versioned: move it aside once
+        path.rename(path.with_name(f"{path.name}.v0"))
+    link = path.with_name(path.name + ".link.tmp")
+    if link.is_symlink() or link.exists():
+        link.unlink()
+    link.symlink_to(build.name, target_is_directory=True)   # relative: data dir can move
+    os.replace(link, path)
+
+    for old in _builds(path)[:-2]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def categorical(values: Iterable[str]):
+    """(codes, categories) for write_food_store."""
+    codes, categories = pd.factorize(pd.Series(list(values), dtype=object))
+    return codes.astype(np.int32), [str(c) for c in categories]
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .core import (
+    PatientInfo,
+    _resolve_snapshot,
+    build_network_notes_for_plan,
+    build_supplement_plan,
+    classify_panel,
+    food_bundles_needed,
+    low_items,
+    network_chains,
+    suggest_foods_for_bundles,
+)
+from .render import get_renderer
+from .types import ReferenceSnapshot
+
+
+@dataclass
+class ReportResult:
+    """Everything one report needs, each piece computed exactly once."""
+    labels: Dict[str, str]
+    supplement_plan: Dict[str, List[str]]
+    foods: Dict[str, List[Tuple[str, float, str]]]   # diet-filtered picks
+    network_notes: List[str]
+    report_text: str
+    risk: Optional[Any] = None                        # whatever risk_fn returned
+    timings: Dict[str, float] = field(default_factory=dict)  # stage -> seconds
+
+
+class ReportPipeline:
+    """
+    Single-pass report pipeline.
+
+    Runs classify -> plan -> foods -> network_notes -> narrative -> risk once
+    per request and feeds the intermediate results to both the narrative
+    text and the structured response, recording how long each stage took.
+
+    snapshot:      reference data (defaults to the shared startup snapshot)
+    risk_fn:       optional callable scoring the risk profile; errors are
+                   reported and give risk=None, like /api/report always did
+    report_format: narrative format, one of render.REPORT_FORMATS
+    """
+
+    STAGES = ("classify", "plan", "foods", "network_notes", "narrative", "risk")
+
+    def __init__(
+        self,
+        snapshot: Optional[ReferenceSnapshot] = None,
+        risk_fn: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        top_n: int = 5,
+        report_format: str = "text",
+    ):
+        self.snapshot = _resolve_snapshot(snapshot)
+        self.risk_fn = risk_fn
+        self.top_n = top_n
+        self.renderer = get_renderer(report_format)
+
+    @staticmethod
+    @contextmanager
+    def _timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    def run(
+        self,
+        labs: Dict[str, float],
+        patient: PatientInfo,
+        diet_filter: Optional[str] = None,
+        risk_profile: Optional[Dict[str, Any]] = None,
+    ) -> ReportResult:
+        snapshot = self.snapshot
+        timings: Dict[str, float] = {}
+
+        with self._timed(timings, "classify"):
+            labels = classify_panel(labs, snapshot, patient)
+
+        with self._timed(timings, "plan"):
+            plan = build_supplement_plan(labels, snapshot)
+
+        with self._timed(timings, "foods"):
+            # Structured picks honour the diet filter; the narrative has
+            # always listed the unfiltered picks.
+            foods: Dict[str, List[Tuple[str, float, str]]] = {}
+            narrative_foods: Dict[str, List[Tuple[str, float, str]]] = {}
+            food_index = snapshot.food_index or snapshot.foods
+            if food_index is not None:
+                bundles = food_bundles_needed(labels)
+                narrative_foods = suggest_foods_for_bundles(
+                    bundles, food_index, top_n=self.top_n,
+                )
+                foods = narrative_foods if not diet_filter else suggest_foods_for_bundles(
+                    bundles, food_index, top_n=self.top_n, diet_filter=diet_filter,
+                )
+
+        with self._timed(timings, "network_notes"):
+            network_notes = build_network_notes_for_plan(plan, snapshot)
+
+        with self._timed(timings, "narrative"):
+            chains = network_chains(low_items(labels), snapshot)
+            report_text = self.renderer.render(
+                labs, patient, labels, plan, narrative_foods, chains,
+            )
+
+        risk = None
+        if self.risk_fn is not None and risk_profile is not None:
+            with self._timed(timings, "risk"):
+                try:
+                    risk = self.risk_fn(risk_profile)
+                except Exception as e:
+                    print("Risk model failed:", e)
+                    risk = None
+
+        return ReportResult(
+            labels=labels,
+            supplement_plan=plan,
+            foods=foods,
+            network_notes=network_notes,
+            report_text=report_text,
+            risk=risk,
+            timings=timings,
+        )
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format stage timings (seconds) as an HTTP Server-Timing header value."""
+    return ", ".join(f"{stage};dur={secs * 1000:.3f}" for stage, secs in timings.items())
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .core import DATA_DIR
+from .data_loader import (
+    REFERENCE_FILES,
+    get_reference_snapshot,
+    load_reference_snapshot,
+    publish_snapshot,
+)
+from .food_store import MANIFEST, find_food_store
+from .types import ReferenceSnapshot
+
+# Hot reload of backend/data. A daemon thread stats the reference CSVs
+# (and the food store's manifest, which is rewritten last) every
+# `interval` seconds. When something changed and then stayed unchanged
+# for one more poll (so a half-saved file is never read), a complete new
+# ReferenceSnapshot is built off the request path and published with a
+# single reference swap. Requests that already hold the old snapshot
+# finish with it; new ones get the new one. A build that fails (bad CSV,
+# missing column) is logged and the current snapshot stays in service.
+#
+#   HEMOVITA_RELOAD_INTERVAL   seconds between polls (default 2, 0 = off)
+
+RELOAD_INTERVAL_ENV = "HEMOVITA_RELOAD_INTERVAL"
+
+Signature = Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+
+
+def data_signature(data_dir: Path = DATA_DIR) -> Signature:
+    """(path, mtime_ns, size) of every file a snapshot is built from."""
+    data_dir = Path(data_dir)
+    paths = [data_dir / name for name in REFERENCE_FILES]
+    store = find_food_store(data_dir)
+    if store is not None:
+        paths.append(store / MANIFEST)
+    out = []
+    for path in paths:
+        try:
+            st = path.stat()
+            out.append((str(path), st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append((str(path), None, None))
+    return tuple(out)
+
+
+class SnapshotReloader:
+    """
+    Watches the reference data files and swaps in rebuilt snapshots.
+
+    data_dir: directory the snapshot is built from
+    interval: seconds between polls (<= 0 disables the watcher thread;
+              check() still works when called directly)
+    on_swap:  optional callback(old, new) run after a new snapshot is
+              published, e.g. to drop caches keyed on the old version
+    """
+
+    def __init__(
+        self,
+        data_dir: Path = DATA_DIR,
+        interval: float = 2.0,
+        on_swap: Optional[Callable[[ReferenceSnapshot, ReferenceSnapshot], None]] = None,
+        log: Callable[[str], None] = print,
+    ):
+        self.data_dir = Path(data_dir)
+        self.interval = float(interval)
+        self.on_swap = on_swap
+        self._log = log
+        self._lock = threading.Lock()     # one check() at a time
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature: Optional[Signature] = None
+        self._pending: Optional[Signature] = None
+        self.checks = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_reload_at: Optional[float] = None     # unix time
+        self.last_build_seconds: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "SnapshotReloader":
+        return cls(interval=float(os.environ.get(RELOAD_INTERVAL_ENV, "2")), **kwargs)
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self) -> None:
+        """Record the current files as the baseline and start polling."""
+        self._signature = data_signature(self.data_dir)
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:   # keep watching whatever happens
+                self._log("[reload] watcher error:\n" + traceback.format_exc())
+
+    def check(self, settle: bool = True) -> bool:
+        """
+        Poll once; returns True when a new snapshot was published.
+
+        settle: wait for the files to stay unchanged for one more poll
+                before rebuilding (False rebuilds on the first change)
+        """
+        with self._lock:
+            self.checks += 1
+            signature = data_signature(self.data_dir)
+            if self._signature is None:
+                self._signature = signature
+            if signature == self._signature:
+                self._pending = None
+                return False
+            if settle and signature != self._pending:
+                self._pending = signature     # still being written?
+                return False
+            self._pending = None
+            self._signature = signature
+            return self._rebuild()
+
+    def _rebuild(self) -> bool:
+        start = time.perf_counter()
+        try:
+            snapshot = load_reference_snapshot(self.data_dir)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            self._log(f"[reload] rebuild failed, keeping the current snapshot: {self.last_error}")
+            return False
+        self.last_build_seconds = time.perf_counter() - start
+        self.last_error = None
+
+        current = get_reference_snapshot()
+        if snapshot.version == current.version:
+            return False   # touched, but the content is the same
+        old = publish_snapshot(snapshot)
+        self.reloads += 1
+        self.last_reload_at = time.time()
+        self._log(
+            f"[reload] reference data {old.version if old else None} -> {snapshot.version} "
+            f"({self.last_build_seconds * 1000:.0f} ms)"
+        )
+        if self.on_swap is not None and old is not None:
+            self.on_swap(old, snapshot)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled and self._thread is not None,
+            "interval_seconds": self.interval,
+            "version": get_reference_snapshot().version,
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_reload_at": self.last_reload_at,
+            "last_build_seconds": self.last_build_seconds,
+        }
@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import html
+import math
+import re
+from typing import Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .core import (
+    HUMAN_LABEL,
+    PatientInfo,
+    _format_food_block,
+    _format_lab_block,
+    _format_network_block,
+    _format_supplement_block,
+)
+
+REPORT_FORMATS = ("text", "markdown", "html")
+
+Network = Union[str, Mapping[str, Sequence[str]]]   # message, or {target: chains}
+
+NO_LABS = "No labs provided."
+NO_SUPPLEMENTS = "No supplements recommended based on current labs."
+NO_FOODS = "No specific food suggestions (no matching entries for the flagged deficiencies)."
+
+TITLE = "HemoVita – Personalized Micronutrient Report"
+SECTIONS = {
+    "labs": "1. Lab overview",
+    "supplements": "2. Supplement plan (prototype)",
+    "foods": "3. Food suggestions (per 100 g, highest nutrient density first)",
+    "cutoffs": "4. Notes on cutoffs",
+    "network": "5. Network-based nutrient interactions",
+}
+CUTOFF_NOTE = (
+    "All low/normal/high classifications are derived from a unified cutoff table ",
+    "(`micronutrient_cutoffs_structured.csv`) built from WHO guidelines, IZiNCG ",
+    "zinc thresholds, and widely used clinical consensus cutoffs. This table can ",
+    "be updated independently of the code to reflect new evidence.",
+)
+
+
+class ReportData(NamedTuple):
+    """Engine results a report is rendered from."""
+    labs: Dict[str, float]
+    patient: PatientInfo
+    labels: Dict[str, str]
+    plan: Dict[str, List[str]]
+    foods: Dict[str, List[Tuple[str, float, str]]]
+    network: Network
+
+
+# -------------------------------------------------------------------
+# Shared pieces
+# -------------------------------------------------------------------
+
+def _patient_fields(patient: PatientInfo) -> List[Tuple[str, str]]:
+    fields = [
+        ("Age", str(patient.age if patient.age is not None else "N/A")),
+        ("Sex", str(patient.sex or "N/A")),
+        ("Pregnant", str(patient.pregnant if patient.pregnant is not None else "N/A")),
+        ("Country", str(patient.country or "N/A")),
+    ]
+    if patient.notes:
+        fields.append(("Notes", str(patient.notes)))
+    return fields
+
+
+def _plan_rows(plan: Dict[str, List[str]]) -> List[Tuple[str, str]]:
+    return [
+        (slot.capitalize(), ", ".join(HUMAN_LABEL.get(n, n) for n in nutrients))
+        for slot, nutrients in plan.items()
+        if nutrients
+    ]
+
+
+def _food_line_parts(name: str, serving_g: float, cat: str) -> Tuple[str, str, str]:
+    cat_str = f" [{cat}]" if cat else ""
+    if isinstance(serving_g, float) and math.isnan(serving_g):
+        amount_str = ""
+    else:
+        amount_str = f" – typical serving ~{serving_g:g} g"
+    return name, cat_str, amount_str
+
+
+# -------------------------------------------------------------------
+# Plain text (what report_text has always been)
+# -------------------------------------------------------------------
+
+def _text_patient(r: ReportData) -> str:
+    return "\n".join(f"- {k}: {v}" for k, v in _patient_fields(r.patient))
+
+
+def _text_network(r: ReportData) -> str:
+    return r.network if isinstance(r.network, str) else _format_network_block(r.network)
+
+
+_TEXT_TEMPLATE = "\n".join([
+    TITLE,
+    "===========================================",
+    "",
+    "Patient summary:",
+    "{patient}",
+    "",
+    SECTIONS["labs"],
+    "---------------",
+    "{labs}",
+    "",
+    SECTIONS["supplements"],
+    "------------------------------",
+    "{supplements}",
+    "",
+    SECTIONS["foods"],
+    "----------------------------------------------------------------",
+    "{foods}",
+    "",
+    SECTIONS["cutoffs"],
+    "--------------------",
+    *CUTOFF_NOTE,
+    "",
+    SECTIONS["network"],
+    "--------------------------------------",
+    "{network}",
+])
+
+_TEXT_BLOCKS: Dict[str, Callable[[ReportData], str]] = {
+    "patient": _text_patient,
+    "labs": lambda r: _format_lab_block(r.labs, r.labels) or NO_LABS,
+    "supplements": lambda r: _format_supplement_block(r.plan),
+    "foods": lambda r: _format_food_block(r.foods),
+    "network": _text_network,
+}
+
+
+# -------------------------------------------------------------------
+# Markdown
+# -------------------------------------------------------------------
+
+_MD_ESCAPES = str.maketrans({c: "\\" + c for c in "\\`*_|<"})
+
+
+def _md(value) -> str:
+    return str(value).translate(_MD_ESCAPES)
+
+
+def _md_patient(r: ReportData) -> str:
+    return "\n".join(f"- **{k}:** {_md(v)}" for k, v in _patient_fields(r.patient))
+
+
+def _md_labs(r: ReportData) -> str:
+    if not r.labs:
+        return f"_{NO_LABS}_"
+    rows = ["| Marker | Value | Status |", "| --- | --- | --- |"]
+    for marker, val in r.labs.items():
+        rows.append(
+            f"| {_md(HUMAN_LABEL.get(marker, marker))} | {_md(val)} | {_md(r.labels.get(marker, 'unknown'))} |"
+        )
+    return "\n".join(rows)
+
+
+def _md_supplements(r: ReportData) -> str:
+    rows = _plan_rows(r.plan)
+    if not rows:
+        return f"_{NO_SUPPLEMENTS}_"
+    return "\n".join(f"- **{slot}:** {_md(items)}" for slot, items in rows)
+
+
+def _md_foods(r: ReportData) -> str:
+    if not r.foods:
+        return f"_{_md(NO_FOODS)}_"
+    chunks = []
+    for key, foods in r.foods.items():
+        if not foods:
+            continue
+        lines = [f"### {_md(HUMAN_LABEL.get(key, key))} – suggested food sources", ""]
+        for name, cat_str, amount_str in (_food_line_parts(*f) for f in foods):
+            lines.append(f"- {_md(name)}{_md(cat_str)}{amount_str}")
+        chunks.append("\n".join(lines))
+    return "\n\n".join(chunks)
+
+
+def _md_network(r: ReportData) -> str:
+    if isinstance(r.network, str):
+        return f"_{_md(r.network)}_"
+    lines = []
+    for tgt, chains in r.network.items():
+        lines.append(f"- **{_md(HUMAN_LABEL.get(tgt, tgt))}**")
+        lines.extend(f"  - {_md(ch)}" for ch in chains)
+    return "\n".join(lines)
+
+
+_MD_TEMPLATE = "\n".join([
+    f"# {TITLE}",
+    "",
+    "## Patient summary",
+    "",
+    "{patient}",
+    "",
+    f"## {SECTIONS['labs']}",
+    "",
+    "{labs}",
+    "",
+    f"## {SECTIONS['supplements']}",
+    "",
+    "{supplements}",
+    "",
+    f"## {SECTIONS['foods']}",
+    "",
+    "{foods}",
+    "",
+    f"## {SECTIONS['cutoffs']}",
+    "",
+    "".join(CUTOFF_NOTE),
+    "",
+    f"## {SECTIONS['network']}",
+    "",
+    "{network}",
+    "",
+])
+
+_MD_BLOCKS: Dict[str, Callable[[ReportData], str]] = {
+    "patient": _md_patient,
+    "labs": _md_labs,
+    "supplements": _md_supplements,
+    "foods": _md_foods,
+    "network": _md_network,
+}
+
+
+# -------------------------------------------------------------------
+# HTML (a fragment; embed it in a page or an email)
+# -------------------------------------------------------------------
+
+_h = html.escape
+
+
+def _html_patient(r: ReportData) -> str:
+    items = "".join(f"<li><strong>{_h(k)}:</strong> {_h(v)}</li>" for k, v in _patient_fields(r.patient))
+    return f"<ul>{items}</ul>"
+
+
+def _html_labs(r: ReportData) -> str:
+    if not r.labs:
+        return f"<p>{_h(NO_LABS)}</p>"
+    rows = "".join(
+        f"<tr><td>{_h(HUMAN_LABEL.get(marker, marker))}</td><td>{_h(str(val))}</td>"
+        f"<td>{_h(r.labels.get(marker, 'unknown'))}</td></tr>"
+        for marker, val in r.labs.items()
+    )
+    return (
+        "<table><thead><tr><th>Marker</th><th>Value</th><th>Status</th></tr></thead>"
+        f"<tbody>{rows}</tbody></table>"
+    )
+
+
+def _html_supplements(r: ReportData) -> str:
+    rows = _plan_rows(r.plan)
+    if not rows:
+        return f"<p>{_h(NO_SUPPLEMENTS)}</p>"
+    items = "".join(f"<li><strong>{_h(slot)}:</strong> {_h(names)}</li>" for slot, names in rows)
+    return f"<ul>{items}</ul>"
+
+
+def _html_foods(r: ReportData) -> str:
+    if not r.foods:
+        return f"<p>{_h(NO_FOODS)}</p>"
+    chunks = []
+    for key, foods in r.foods.items():
+        if not foods:
+            continue
+        items = "".join(
+            f"<li>{_h(name)}{_h(cat_str)}{_h(amount_str)}</li>"
+            for name, cat_str, amount_str in (_food_line_parts(*f) for f in foods)
+        )
+        chunks.append(f"<h3>{_h(HUMAN_LABEL.get(key, key))} – suggested food sources</h3><ul>{items}</ul>")
+    return "\n".join(chunks)
+
+
+def _html_network(r: ReportData) -> str:
+    if isinstance(r.network, str):
+        return f"<p>{_h(r.network)}</p>"
+    items = "".join(
+        f"<li><strong>{_h(HUMAN_LABEL.get(tgt, tgt))}</strong>"
+        f"<ul>{''.join(f'<li>{_h(ch)}</li>' for ch in chains)}</ul></li>"
+        for tgt, chains in r.network.items()
+    )
+    return f"<ul>{items}</ul>"
+
+
+def _html_section(title: str, body: str) -> str:
+    return f'<section><h2>{_h(title)}</h2>\n{body}\n</section>'
+
+
+_CUTOFF_HTML = _h("".join(CUTOFF_NOTE)).replace(
+    "`micronutrient_cutoffs_structured.csv`", "<code>micronutrient_cutoffs_structured.csv</code>"
+)
+
+_HTML_TEMPLATE = "\n".join([
+    '<article class="hemovita-report">',
+    f"<h1>{_h(TITLE)}</h1>",
+    _html_section("Patient summary", "{patient}"),
+    _html_section(SECTIONS["labs"], "{labs}"),
+    _html_section(SECTIONS["supplements"], "{supplements}"),
+    _html_section(SECTIONS["foods"], "{foods}"),
+    _html_section(SECTIONS["cutoffs"], f"<p>{_CUTOFF_HTML}</p>"),
+    _html_section(SECTIONS["network"], "{network}"),
+    "</article>",
+    "",
+])
+
+_HTML_BLOCKS: Dict[str, Callable[[ReportData], str]] = {
+    "patient": _html_patient,
+    "labs": _html_labs,
+    "supplements": _html_supplements,
+    "foods": _html_foods,
+    "network": _html_network,
+}
+
+
+# -------------------------------------------------------------------
+# Renderer
+# -------------------------------------------------------------------
+
+_TEMPLATES = {
+    "text": (_TEXT_TEMPLATE, _TEXT_BLOCKS),
+    "markdown": (_MD_TEMPLATE, _MD_BLOCKS),
+    "html": (_HTML_TEMPLATE, _HTML_BLOCKS),
+}
+
+_SLOT = re.compile(r"\{(\w+)\}")
+
+
+class ReportRenderer:
+    """
+    Narrative report in one format, from a template compiled once.
+
+    The template is split into (static text, block) steps up front: the
+    title, section headers and the cutoff notes are ready-made strings and
+    only the patient, labs, supplements, foods and network blocks are
+    built per report. iter_render() yields the pieces in order, so a
+    report can be written or streamed as it is produced; render() joins
+    them. The "text" format is byte-for-byte compose_report_text.
+    """
+
+    def __init__(self, fmt: str = "text"):
+        if fmt not in _TEMPLATES:
+            raise ValueError(f"unknown report format {fmt!r} (expected one of {', '.join(REPORT_FORMATS)})")
+        template, blocks = _TEMPLATES[fmt]
+        self.format = fmt
+
+        steps: List[Tuple[str, Optional[Callable[[ReportData], str]]]] = []
+        pos = 0
+        for m in _SLOT.finditer(template):
+            steps.append((template[pos:m.start()], blocks[m.group(1)]))
+            pos = m.end()
+        steps.append((template[pos:], None))
+        self._steps = tuple(steps)
+
+    def iter_render(
+        self,
+        labs: Dict[str, float],
+        patient: PatientInfo,
+        labels: Dict[str, str],
+        plan: Dict[str, List[str]],
+        food_suggestions: Dict[str, List[Tuple[str, float, str]]],
+        network: Network,
+    ) -> Iterator[str]:
+        """
+        network: core.network_chains output (chains per target, or the
+                 message shown instead); a prebuilt text block works for
+                 the text format.
+        """
+        data = ReportData(labs, patient, labels, plan, food_suggestions, network)
+        for static, block in self._steps:
+            if static:
+                yield static
+            if block is not None:
+                yield block(data)
+
+    def render(self, *args, **kwargs) -> str:
+        return "".join(self.iter_render(*args, **kwargs))
+
+
+_RENDERERS: Dict[str, ReportRenderer] = {}
+
+
+def get_renderer(fmt: str = "text") -> ReportRenderer:
+    """Shared, precompiled renderer for a format."""
+    renderer = _RENDERERS.get(fmt)
+    if renderer is None:
+        renderer = _RENDERERS[fmt] = ReportRenderer(fmt)
+    return renderer
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Mapping, Sequence, Tuple
+
+
+class ConflictScheduler:
+    """
+    Supplement timing on a conflict graph compiled into integer bitmasks.
+
+    Every nutrient that appears in an antagonist rule gets one bit; its
+    conflict mask has the bits of everything it must not share a slot with
+    (symmetric: either direction of an "avoid_with" counts, like the
+    original can_place). A slot's occupancy is the OR of its nutrients'
+    bits, so "can this go here" is one AND instead of rebuilding sets for
+    every nutrient already in the slot.
+
+    Slots are chosen per call, so the same compiled rules serve the default
+    morning/midday/evening plan, meal-aligned schedules, 6-dose days, ...
+
+    antagonists:    {nutrient: {"avoid_with": [...]}}  (snapshot.antagonists)
+    boosters:       {target: {"targets": [...], "boosters": [...]}}
+    supplement_key: maps a booster name to the supplement key it is
+                    scheduled under (core.marker_to_supplement)
+    """
+
+    def __init__(
+        self,
+        antagonists: Mapping[str, Mapping[str, Sequence[str]]],
+        boosters: Mapping[str, Mapping[str, Sequence[str]]],
+        supplement_key: Callable[[str], str] = lambda key: key,
+    ):
+        bits: Dict[str, int] = {}
+
+        def bit(nutrient: str) -> int:
+            if nutrient not in bits:
+                bits[nutrient] = 1 << len(bits)
+            return bits[nutrient]
+
+        conflicts: Dict[str, int] = {}
+        for nutrient, rule in antagonists.items():
+            for other in rule.get("avoid_with", ()):
+                conflicts[nutrient] = conflicts.get(nutrient, 0) | bit(other)
+                conflicts[other] = conflicts.get(other, 0) | bit(nutrient)
+
+        self._bits = bits
+        self._conflicts = conflicts
+        # (targets, boosters as supplement keys), in rule order
+        self._booster_rules: Tuple[Tuple[Tuple[str, ...], Tuple[str, ...]], ...] = tuple(
+            (
+                tuple(bundle["targets"]),
+                tuple(supplement_key(b) for b in bundle["boosters"]),
+            )
+            for bundle in boosters.values()
+        )
+
+    def bit(self, nutrient: str) -> int:
+        """Bit of a nutrient (0 if no rule mentions it: it conflicts with nothing)."""
+        return self._bits.get(nutrient, 0)
+
+    def conflict_mask(self, nutrient: str) -> int:
+        return self._conflicts.get(nutrient, 0)
+
+    def plan(
+        self,
+        deficient: Sequence[str],
+        slots: Sequence[str],
+        min_conflict: bool = False,
+    ) -> Dict[str, List[str]]:
+        """
+        Place deficient supplements (in order), then co-dose boosters.
+
+        Each nutrient goes to the first slot without a conflict. If every
+        slot conflicts it goes to the last slot, or with min_conflict=True
+        to the slot with the fewest conflicting nutrients (earliest on ties).
+        Boosters join their target's slot only when that is conflict-free.
+        """
+        if not slots:
+            raise ValueError("need at least one slot")
+        n_slots = len(slots)
+        occupied = [0] * n_slots
+        placed: List[List[str]] = [[] for _ in range(n_slots)]
+
+        def put(i: int, nutrient: str) -> None:
+            placed[i].append(nutrient)
+            occupied[i] |= self._bits.get(nutrient, 0)
+
+        # 1) Primary supplements
+        for nutrient in deficient:
+            mask = self._conflicts.get(nutrient, 0)
+            for i in range(n_slots):
+                if not occupied[i] & mask:
+                    put(i, nutrient)
+                    break
+            else:
+                if min_conflict:
+                    clashes = [bin(occupied[i] & mask).count("1") for i in range(n_slots)]
+                    put(clashes.index(min(clashes)), nutrient)
+                else:
+                    put(n_slots - 1, nutrient)
+
+        # 2) Boosters from the nutrient network, next to their targets
+        if self._booster_rules:
+            wanted = set(deficient)
+            for targets, boosters in self._booster_rules:
+                for t in targets:
+                    if t not in wanted:
+                        continue
+                    i = next((k for k in range(n_slots) if t in placed[k]), None)
+                    if i is None:
+                        continue
+                    for b in boosters:
+                        if b in placed[i]:
+                            continue
+                        if not occupied[i] & self._conflicts.get(b, 0):
+                            put(i, b)
+
+        return {slot: nutrients for slot, nutrients in zip(slots, placed)}
+
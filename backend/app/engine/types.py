@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Mapping, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+
+class NetworkEdge(NamedTuple):
+    """One row of network_relationships.csv, cleaned once at load time."""
+    source: str
+    target: str
+    effect: str          # lower-cased / stripped ("boosts", "inhibits", ...)
+    confidence: str
+    notes: str
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    """
+    Immutable bundle of all reference data the engine needs per request.
+
+    Built once (at startup) from backend/data and passed into the engine
+    functions so a request never touches the disk or parses a CSV.
+
+    - ref / ref_tiers:        cutoffs from micronutrient_cutoffs_structured.csv
+    - edges:                  cleaned rows of network_relationships.csv
+                              (None if the file is missing)
+    - boosters / antagonists: interaction rules derived from the edges
+    - graph:                  frozen networkx DiGraph (None if unavailable)
+    - foods:                  cleaned foods_usda.csv (None if missing);
+                              treat as read-only
+    - multihop_index:         {hop_limit: {target: chains}} precomputed
+                              from the graph (None without a graph)
+    - scheduler:              antagonists / boosters compiled into a
+                              bitmask ConflictScheduler
+    - food_index:             foods compiled into a FoodIndex, or a
+                              density FoodRanker when the table has
+                              per100g_<bundle> columns (None without foods)
+    - version:                content hash of the source files; changes
+                              whenever the reference data does (cache keys)
+    - cutoff_index:           cutoffs of every population group compiled
+                              into a CutoffIndex (age / sex / pregnancy)
+    """
+    ref: Mapping[str, Mapping[str, float]]
+    ref_tiers: Mapping[str, Mapping[str, float]]
+    edges: Optional[Tuple[NetworkEdge, ...]]
+    boosters: Mapping[str, Mapping[str, Tuple[str, ...]]]
+    antagonists: Mapping[str, Mapping[str, Tuple[str, ...]]]
+    graph: Optional[Any]
+    foods: Optional[pd.DataFrame]
+    food_path: Optional[Path] = None
+    multihop_index: Optional[Mapping[int, Mapping[str, Tuple[str, ...]]]] = None
+    scheduler: Optional[Any] = None
+    food_index: Optional[Any] = None
+    version: str = ""
+    cutoff_index: Optional[Any] = None
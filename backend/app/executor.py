@@ -0,0 +1,146 @@
+# backend/app/executor.py
+from __future__ import annotations
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+EXECUTOR_KIND_ENV = "HEMOVITA_EXECUTOR"            # "thread" (default) or "process"
+EXECUTOR_WORKERS_ENV = "HEMOVITA_EXECUTOR_WORKERS"  # default: min(4, CPU count)
+
+
+def _default_workers() -> int:
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+class EngineExecutor:
+    """
+    Bounded pool for CPU-bound engine work (reports, risk profiles).
+
+    Async route handlers `await executor.run(fn, *args)` so the event loop
+    stays free while the engine runs. With kind="process" the work runs in
+    separate interpreters (fn and its arguments/results must be picklable,
+    and each worker keeps its own snapshot / risk cache); with kind="thread"
+    it shares this process.
+
+    Saturation is tracked per pool: how many calls are running, how many are
+    queued behind a busy pool, the peak, and call latency (submit -> done).
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: Optional[int] = None,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
+        kind = (kind or "thread").strip().lower()
+        if kind not in ("thread", "process"):
+            raise ValueError(f"executor kind must be 'thread' or 'process', got {kind!r}")
+        self.kind = kind
+        self.max_workers = max(1, int(max_workers or _default_workers()))
+        self.initializer = initializer
+
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._busy_seconds = 0.0
+        self._max_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, initializer: Optional[Callable[[], None]] = None) -> "EngineExecutor":
+        """Build from HEMOVITA_EXECUTOR / HEMOVITA_EXECUTOR_WORKERS."""
+        workers = os.environ.get(EXECUTOR_WORKERS_ENV)
+        return cls(
+            kind=os.environ.get(EXECUTOR_KIND_ENV, "thread"),
+            max_workers=int(workers) if workers else None,
+            initializer=initializer,
+        )
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                return
+            if self.kind == "process":
+                # spawn: never fork a process that already runs server threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="hemovita-engine",
+                    initializer=self.initializer,
+                )
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    # --- work ---
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run fn(*args, **kwargs) on the pool and await its result."""
+        if self._pool is None:
+            self.start()
+
+        with self._lock:
+            self._submitted += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._pool, functools.partial(fn, *args, **kwargs),
+            )
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._busy_seconds += elapsed
+                self._max_seconds = max(self._max_seconds, elapsed)
+
+    # --- metrics ---
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+            done = self._completed + self._failed
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "started": self._pool is not None,
+                "in_flight": in_flight,
+                "running": min(in_flight, self.max_workers),
+                "queued": max(0, in_flight - self.max_workers),
+                "saturation": in_flight / self.max_workers,
+                "peak_in_flight": self._peak_in_flight,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_latency_ms": (self._busy_seconds / done * 1000.0) if done else 0.0,
+                "max_latency_ms": self._max_seconds * 1000.0,
+            }
@@ -1,27 +1,80 @@
 # backend/app/main.py
 
-from fastapi import FastAPI
+import json
+import multiprocessing
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Tuple, Union
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
 
 from .schema import (
     ReportRequest,
     ReportResponse,
-    FoodItem,
     RiskProfileInput,
 )
 from .engine import (
     PatientInfo,
-    classify_panel,
-    build_supplement_plan,
-    load_food_data,
-    suggest_foods,
-    generate_report,
-    FOOD_CSV_DEFAULT,
-    build_network_notes_for_plan,
+    ReportPipeline,
+    SnapshotReloader,
+    get_reference_snapshot,
+    generate_reports_batch,
+    server_timing_header,
 )
+from . import metrics
 from . import risk  # risk.py lives in app/engine
+from .cohort import CohortRow, iter_cohort_rows
+from .executor import EngineExecutor
+from .response_cache import ResponseCache, content_key
+from .serialization import dumps, encode_report, encode_reports, report_content
+from .warmup import format_phases, warmup
 
-app = FastAPI(title="HemoVita API", version="0.1.0")
+
+def _warm_engine_worker() -> None:
+    """Pool initializer: build the snapshot / risk model before the first job."""
+    warmup()
+    if multiprocessing.parent_process() is not None:
+        # process workers hold their own snapshot: watch the files here too
+        RELOADER.start()
+
+
+# CPU-bound engine work runs here, never on the event loop
+# (HEMOVITA_EXECUTOR=thread|process, HEMOVITA_EXECUTOR_WORKERS=N).
+ENGINE_POOL = EngineExecutor.from_env(initializer=_warm_engine_worker)
+
+# Serialized /api/report responses by request content + data/model version
+# (HEMOVITA_REPORT_CACHE_MB, HEMOVITA_REPORT_CACHE_TTL).
+REPORT_CACHE = ResponseCache.from_env()
+
+
+def _on_snapshot_swap(old, new) -> None:
+    # keys carry the snapshot version, so old entries could never hit again
+    REPORT_CACHE.clear()
+
+
+# Rebuilds the reference snapshot when backend/data changes
+# (HEMOVITA_RELOAD_INTERVAL, 0 = off).
+RELOADER = SnapshotReloader.from_env(on_swap=_on_snapshot_swap)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the immutable reference snapshot (cutoffs, network, foods) and
+    # load the risk model once, so request handlers never read or parse the
+    # files in backend/data.
+    print("[warmup]\n" + format_phases(warmup()))
+    RELOADER.start()
+    ENGINE_POOL.start()
+    yield
+    ENGINE_POOL.shutdown()
+    RELOADER.stop()
+
+
+app = FastAPI(title="HemoVita API", version="0.1.0", lifespan=lifespan)
 
 # CORS so localhost:3000 can talk to localhost:8000
 app.add_middleware(
@@ -33,6 +86,24 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        method = request.method
+        metrics.HTTP_REQUESTS.inc(method=method, path=path, status=str(status))
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=method, path=path)
+        if status >= 500:
+            metrics.HTTP_ERRORS.inc(method=method, path=path)
+
+
 # -------------------------------------------------------------------
 # 1) Standalone risk endpoint (useful for testing/debugging)
 # -------------------------------------------------------------------
@@ -42,17 +113,112 @@ async def micronutrient_risk_route(profile: RiskProfileInput):
     Given age/sex/country/population, return the raw risk model output
     (bandit + fallback baselines).
     """
-    result = risk.get_micronutrient_risk_profile(profile.dict())
+    result = await ENGINE_POOL.run(risk.get_micronutrient_risk_profile, profile.dict())
     return result
 
 
 # -------------------------------------------------------------------
 # 2) Main report endpoint used by the frontend proxy (/api/report)
 # -------------------------------------------------------------------
-@app.post("/api/report", response_model=ReportResponse)
-def api_report(payload: ReportRequest):
+def _report_risk(rp_input: dict) -> dict:
+    """Risk stage of a report: model output -> ReportResponse risk fields."""
+    return risk.report_risk_fields(risk.get_micronutrient_risk_profile(rp_input))
+
+
+def _report_cache_key(body, data_version: str) -> str:
+    """
+    Request content + the reference data and risk model it is answered from.
+    The labs keep their order: the engine's plan depends on it.
+    """
+    return content_key(body, data_version, risk.THETA_FINGERPRINT, ordered=("labs",))
+
+
+def _parse_report_request(body) -> ReportRequest:
+    try:
+        return ReportRequest.model_validate(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
+
+
+# The body is parsed by hand (cache lookup before validation); keep the
+# documented request schema.
+_REPORT_REQUEST_DOC = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/ReportRequest"}}},
+    }
+}
+
+
+@app.post("/api/report", response_model=ReportResponse, openapi_extra=_REPORT_REQUEST_DOC)
+async def api_report(request: Request):
+    # Same errors FastAPI reports for a declared body parameter
+    raw = await request.body()
+    if not raw:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+    try:
+        body = json.loads(raw)
+    except ValueError as e:
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body", getattr(e, "pos", 0)),
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": getattr(e, "msg", str(e))},
+        }])
+
+    # Identical resubmissions (reloads, retries) are answered from the
+    # cache without validating the body or running the engine.
+    key = cached = None
+    data_version = get_reference_snapshot().version
+    start = time.perf_counter()
+    if REPORT_CACHE.enabled:
+        key = _report_cache_key(body, data_version)
+        cached = REPORT_CACHE.get(key)
+    lookup = {"cache_lookup": time.perf_counter() - start}
+    if cached is not None:
+        metrics.observe_stages(lookup)
+        return Response(
+            content=cached,
+            media_type="application/json",
+            headers={"Server-Timing": server_timing_header(lookup), "X-Cache": "hit"},
+        )
+
+    payload = _parse_report_request(body)
+    report, timings, answered_from = await ENGINE_POOL.run(_report_job, payload)
+    timings = {**lookup, **timings}
+
+    # Serialize here (not in FastAPI) so the cost shows up as its own stage;
+    # the engine output is trusted, so there is no response_model pass.
+    start = time.perf_counter()
+    content = encode_report(report)
+    timings["serialize"] = time.perf_counter() - start
+
+    if report["risk_profile"] is None:
+        metrics.RISK_MODEL_FAILURES.inc()
+    elif key is not None and answered_from == data_version:
+        # Reports with a failed risk stage are not cached: the next try may
+        # succeed. Neither are reports built while the data was reloading.
+        REPORT_CACHE.put(key, content)
+
+    metrics.observe_stages(timings)
+    return Response(
+        content=content,
+        media_type="application/json",
+        headers={"Server-Timing": server_timing_header(timings), "X-Cache": "miss"},
+    )
+
+
+def _report_job(payload: ReportRequest) -> Tuple[Dict[str, Any], Dict[str, float], str]:
+    """
+    Engine side of /api/report (runs on ENGINE_POOL). Returns the report
+    laid out as ReportResponse (see serialization.report_content), the
+    stage timings and the version of the reference data it used.
+    """
     # -----------------------
-    # 1) Build patient object
+    # 1) Build patient object + risk-model input
     # -----------------------
     patient = PatientInfo(
         age=payload.patient.age,
@@ -62,130 +228,235 @@ def api_report(payload: ReportRequest):
         notes=payload.patient.notes,
     )
 
+    # 🟢 Prefer explicit population from the UI if provided
+    rp_input = risk.risk_input_for_patient(
+        sex=patient.sex,
+        pregnant=patient.pregnant,
+        country=patient.country,
+        age=patient.age,
+        population=payload.patient.population,
+    )
+
     # -----------------------
-    # 2) Generate narrative report text
+    # 2) Run every engine stage once: labels, supplement plan, foods,
+    #    network notes, narrative text and risk profile.
+    #    Reference data comes from the startup snapshot (no disk I/O).
     # -----------------------
-    report_text = generate_report(
+    snapshot = get_reference_snapshot()
+    pipeline = ReportPipeline(snapshot, risk_fn=_report_risk)
+    result = pipeline.run(
         payload.labs,
         patient,
-        FOOD_CSV_DEFAULT,
+        diet_filter=payload.diet_filter,
+        risk_profile=rp_input,
     )
 
     # -----------------------
-    # 3) Structured extras (labels, supplement plan, foods)
+    # 3) Final response
     # -----------------------
-    labels = classify_panel(payload.labs)
-    supp_plan = build_supplement_plan(labels)
-
-    foods: dict[str, list[FoodItem]] = {}
-    if FOOD_CSV_DEFAULT.exists():
-        food_df = load_food_data(FOOD_CSV_DEFAULT)
-        # wire in diet_filter if you want to use it
-        foods_raw = suggest_foods(
-            labels,
-            food_df,
-            top_n=5,
-            diet_filter=payload.diet_filter,
-        )
-        for key, lst in foods_raw.items():
-            foods[key] = [
-                FoodItem(name=name, serving_g=serv_g, category=cat)
-                for (name, serv_g, cat) in lst
-            ]
+    report = report_content(
+        result.labels,
+        result.supplement_plan,
+        result.foods,
+        result.network_notes,
+        result.report_text,
+        result.risk,
+    )
+    return report, result.timings, snapshot.version
 
-    # -----------------------
-    # 4) Dynamic network notes from core.py (no hardcoding)
-    # -----------------------
-    network_notes = build_network_notes_for_plan(supp_plan)
 
-    # -----------------------
-    # 5) Risk profile (uses risk.get_micronutrient_risk_profile)
-    # -----------------------
+# -------------------------------------------------------------------
+# 3) Batch endpoint for screening cohorts (/api/reports/batch)
+# -------------------------------------------------------------------
+@app.post("/api/reports/batch", response_model=List[ReportResponse])
+async def api_reports_batch(payloads: List[ReportRequest]):
+    """
+    Score many panels in one round trip. Same output per item as
+    /api/report, but the engine shares work across the whole batch.
+    """
+    body = await ENGINE_POOL.run(_batch_response_job, payloads)
+    return Response(content=body, media_type="application/json")
 
-    risk_profile = None
-    micronutrient_risks = None
-    risk_summary_text = None
 
-    try:
-        sex_lower = (patient.sex or "").lower()
-        if sex_lower == "female":
-            default_population = "Pregnant women" if patient.pregnant else "Women"
-            gender = "Female"
-        elif sex_lower == "male":
-            default_population = "Men"
-            gender = "Male"
-        else:
-            default_population = "Adults"
-            gender = "All"
-
-        # 🟢 Prefer explicit population from the UI if provided
-        explicit_population = payload.patient.population
-        population = explicit_population or default_population
-
-        rp_input = {
-            "country": patient.country or "",
-            "population": population,
-            "gender": gender,
-            "age": patient.age,
-        }
-
-        raw = risk.get_micronutrient_risk_profile(rp_input)
-        micronutrient_risks = raw.get("micronutrient_risks", [])
-        summary_text = raw.get("summary_text", "")
-        disclaimer = raw.get("disclaimer", "")
-        meta = raw.get("meta", {})
-
-        if micronutrient_risks:
-            overall_risk = max(m["predicted_risk"] for m in micronutrient_risks)
-        else:
-            overall_risk = 0.0
+def _batch_response_job(payloads: List[ReportRequest]) -> bytes:
+    """/api/reports/batch body, serialized in the worker (bytes pickle cheaply)."""
+    return encode_reports(_batch_job(payloads))
 
-        if overall_risk < 0.33:
-            bucket = "low"
-        elif overall_risk < 0.66:
-            bucket = "moderate"
-        else:
-            bucket = "high"
 
-        high_risk = [
-            m for m in micronutrient_risks
-            if m["predicted_risk"] >= 0.66
-        ]
+def _batch_job(payloads: List[ReportRequest]) -> List[Dict[str, Any]]:
+    """Engine side of /api/reports/batch: one ReportResponse-shaped dict per payload."""
+    snapshot = get_reference_snapshot()
 
-        if disclaimer:
-            risk_summary_text = summary_text + " " + disclaimer
-        else:
-            risk_summary_text = summary_text
+    patients = [
+        PatientInfo(
+            age=p.patient.age,
+            sex=p.patient.sex,
+            pregnant=p.patient.pregnant,
+            country=p.patient.country,
+            notes=p.patient.notes,
+        )
+        for p in payloads
+    ]
+    risk_inputs = [
+        risk.risk_input_for_patient(
+            sex=p.patient.sex,
+            pregnant=p.patient.pregnant,
+            country=p.patient.country,
+            age=p.patient.age,
+            population=p.patient.population,
+        )
+        for p in payloads
+    ]
+
+    results = generate_reports_batch(
+        [p.labs for p in payloads],
+        patients,
+        diet_filters=[p.diet_filter for p in payloads],
+        risk_profiles=risk_inputs,
+        risk_fn=_report_risk,
+        snapshot=snapshot,
+    )
 
-        risk_profile = {
-            "overall_risk": overall_risk,
-            "risk_bucket": bucket,
-            "high_risk_micronutrients": high_risk,
-            "micronutrient_risks": micronutrient_risks,
-            "summary_text": summary_text,
-            "meta": meta,
-        }
+    return [
+        report_content(
+            res.labels,
+            res.supplement_plan,
+            res.foods,
+            res.network_notes,
+            res.report_text,
+            res.risk,
+        )
+        for res in results
+    ]
 
-    except Exception as e:
-        print("Risk model failed:", e)
-        risk_profile = None
-        micronutrient_risks = None
-        risk_summary_text = None
 
+def _cohort_chunk_job(rows: List[CohortRow]) -> bytes:
+    """
+    Score one chunk of cohort rows (runs on ENGINE_POOL) and return it as
+    NDJSON: one {"row": n, ...ReportResponse} or {"row": n, "error": ...}
+    line per input row, in input order.
+    """
+    valid = [(n, req) for n, req in rows if isinstance(req, ReportRequest)]
+    reports = iter(_batch_job([req for _, req in valid])) if valid else iter(())
 
-    # -----------------------
-    # 6) Final response
-    # -----------------------
-    return ReportResponse(
-        labels=labels,
-        supplement_plan=supp_plan,
-        foods=foods,
-        network_notes=network_notes,
-        report_text=report_text,
-        micronutrient_risks=micronutrient_risks,
-        risk_summary_text=risk_summary_text,
-        risk_profile=risk_profile,
-    )
+    lines = []
+    for n, item in rows:
+        if isinstance(item, ReportRequest):
+            line = {"row": n, **next(reports)}
+        else:
+            line = {"row": n, "error": item}
+        lines.append(dumps(line) + b"\n")
+    return b"".join(lines)
+
+
+@app.post("/api/reports/stream")
+async def api_reports_stream(
+    request: Request,
+    chunk_size: int = Query(500, ge=1, le=5000),
+):
+    """
+    Score a cohort CSV (raw text/csv body) and stream NDJSON back.
+
+    Columns: age, sex (required), country, pregnant, population, notes,
+    diet_filter (optional); every other column is a lab marker, blank
+    cells = not measured. The body is parsed as it arrives and scored in
+    chunks of `chunk_size` rows through the batch engine; each chunk's
+    lines are sent as soon as it finishes, so neither the cohort nor the
+    response is ever held in memory as a whole. Invalid rows produce an
+    {"row": n, "error": "..."} line instead of failing the upload.
+    """
+    rows = iter_cohort_rows(request.stream())
+    try:
+        first: Union[CohortRow, None] = await rows.__anext__()
+    except StopAsyncIteration:
+        first = None  # header only
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson():
+        chunk: List[CohortRow] = [first] if first is not None else []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield await ENGINE_POOL.run(_cohort_chunk_job, chunk)
+                chunk = []
+        if chunk:
+            yield await ENGINE_POOL.run(_cohort_chunk_job, chunk)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+def _collect_engine_metrics():
+    """Scrape-time values: cache counters and engine pool saturation."""
+    reports = REPORT_CACHE.stats()
+    yield ("hemovita_report_cache_hits_total", "counter",
+           "/api/report responses served from the response cache.", [({}, reports["hits"])])
+    yield ("hemovita_report_cache_misses_total", "counter",
+           "/api/report requests not in the response cache (incl. expired).", [({}, reports["misses"])])
+    yield ("hemovita_report_cache_evictions_total", "counter",
+           "Response cache entries dropped to stay within the size bound.", [({}, reports["evictions"])])
+    yield ("hemovita_report_cache_entries", "gauge",
+           "Responses currently cached.", [({}, reports["entries"])])
+    yield ("hemovita_report_cache_bytes", "gauge",
+           "Bytes of cached response bodies.", [({}, reports["bytes"])])
+
+    cache = risk.RISK_CACHE.stats()
+    lookups = cache["hits"] + cache["misses"]
+    yield ("hemovita_risk_cache_hits_total", "counter",
+           "Risk-profile cache hits (API process).", [({}, cache["hits"])])
+    yield ("hemovita_risk_cache_misses_total", "counter",
+           "Risk-profile cache misses (API process).", [({}, cache["misses"])])
+    yield ("hemovita_risk_cache_evictions_total", "counter",
+           "Risk-profile cache LRU evictions (API process).", [({}, cache["evictions"])])
+    yield ("hemovita_risk_cache_entries", "gauge",
+           "Risk profiles currently cached (API process).", [({}, cache["size"])])
+    yield ("hemovita_risk_cache_hit_ratio", "gauge",
+           "Risk-profile cache hits / lookups since start (API process).",
+           [({}, cache["hits"] / lookups if lookups else 0.0)])
+
+    reloads = RELOADER.stats()
+    yield ("hemovita_snapshot_reloads_total", "counter",
+           "Reference data reloads published (API process).", [({}, reloads["reloads"])])
+    yield ("hemovita_snapshot_reload_failures_total", "counter",
+           "Reference data rebuilds that failed; the previous snapshot stayed in service.",
+           [({}, reloads["failures"])])
+
+    pool = ENGINE_POOL.stats()
+    labels = {"kind": pool["kind"]}
+    yield ("hemovita_engine_pool_workers", "gauge",
+           "Engine pool size.", [(labels, pool["max_workers"])])
+    yield ("hemovita_engine_pool_in_flight", "gauge",
+           "Engine calls running or queued.", [(labels, pool["in_flight"])])
+    yield ("hemovita_engine_pool_queued", "gauge",
+           "Engine calls waiting for a free worker.", [(labels, pool["queued"])])
+    yield ("hemovita_engine_pool_completed_total", "counter",
+           "Engine calls finished successfully.", [(labels, pool["completed"])])
+    yield ("hemovita_engine_pool_failed_total", "counter",
+           "Engine calls that raised.", [(labels, pool["failed"])])
+
+
+metrics.REGISTRY.register_collector(_collect_engine_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition of the in-process metrics."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/engine/stats")
+async def api_engine_stats():
+    """
+    Engine pool saturation, the reference data reloader, and the
+    response and risk-profile cache counters (the reloader and risk cache
+    figures are this process only; process workers keep their own).
+    """
+    return {
+        "executor": ENGINE_POOL.stats(),
+        "reference_data": RELOADER.stats(),
+        "report_cache": REPORT_CACHE.stats(),
+        "risk_cache": risk.RISK_CACHE.stats(),
+    }
 
 
 # # backend/app/main.py
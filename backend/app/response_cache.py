@@ -0,0 +1,136 @@
+# backend/app/response_cache.py
+"""
+Content-addressed cache of serialized /api/report responses.
+
+A report is a pure function of the request body, the reference data and
+the served risk-model parameters, so the key is
+sha256(canonical JSON body, snapshot version, model fingerprint) and the
+value is the response bytes exactly as sent. A hit skips request
+validation, the engine and serialization. Object key order is ignored,
+except where the caller says it matters (the lab panel).
+
+Entries expire after a TTL and the cache is bounded by the total size of
+the stored bodies (least recently used entries go first).
+
+    HEMOVITA_REPORT_CACHE_MB    size bound in MiB (default 64, 0 = off)
+    HEMOVITA_REPORT_CACHE_TTL   seconds an entry is served (default 300)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Collection, Dict, Optional, Tuple
+
+REPORT_CACHE_MB_ENV = "HEMOVITA_REPORT_CACHE_MB"
+REPORT_CACHE_TTL_ENV = "HEMOVITA_REPORT_CACHE_TTL"
+
+
+def canonical_json(obj: Any, ordered: Collection[str] = ()) -> bytes:
+    """
+    Whitespace independent encoding of a JSON value with sorted object keys,
+    except inside the top-level fields named in `ordered`, whose key order
+    is kept (e.g. the lab panel, which the engine reads in order).
+    """
+    def encode(value: Any, sort_keys: bool) -> str:
+        return json.dumps(value, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False)
+
+    if not ordered or not isinstance(obj, dict):
+        return encode(obj, True).encode("utf-8")
+    fields = (f"{encode(k, True)}:{encode(obj[k], k not in ordered)}" for k in sorted(obj))
+    return ("{" + ",".join(fields) + "}").encode("utf-8")
+
+
+def content_key(obj: Any, *versions: str, ordered: Collection[str] = ()) -> str:
+    """sha256 of the canonical body plus the versions it was computed against."""
+    h = hashlib.sha256(canonical_json(obj, ordered))
+    for v in versions:
+        h.update(b"\0")
+        h.update(str(v).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded, TTL-expiring LRU of response bytes (thread-safe)."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()  # key -> (expires, body)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            max_bytes=float(os.environ.get(REPORT_CACHE_MB_ENV, "64")) * 1024 * 1024,
+            ttl=float(os.environ.get(REPORT_CACHE_TTL_ENV, "300")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, body = entry
+            if expires <= self._clock():
+                self._drop(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, body: bytes) -> None:
+        if not self.enabled or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (self._clock() + self.ttl, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, body = self._data.pop(key)
+        self._bytes -= len(body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
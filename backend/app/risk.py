@@ -1,7 +1,14 @@
 
+import copy
+import functools
+import hashlib
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 import numpy as np
 import pandas as pd
@@ -52,62 +59,101 @@ def _resolve_data_path() -> Path:
     )
 
 
-DATA_PATH = _resolve_data_path()
-print(f"[risk] loading risk data from: {DATA_PATH}")
-df = pd.read_csv(DATA_PATH)
+CATEGORICAL_CONTEXT_COLS = ["Country", "Population", "Gender"]
 
+# Everything below that is derived from the data file or the trained model
+# (df, baselines, cat_maps, the bandit environment and parameters) is built
+# on first use by ensure_loaded(), not at import: importing this module is
+# cheap, and warmup() pays the cost up front for the server.
 
 
-# Rename target and drop rows without primary deficiency probability
-df = df.rename(columns={"P_Deficiency_Primary": "True_Risk"})
-df = df[~df["True_Risk"].isna()].copy()
+def _load_data_frame(path: Path) -> pd.DataFrame:
+    print(f"[risk] loading risk data from: {path}")
+    df = pd.read_csv(path)
 
-# Scale risk from % to 0..1 if needed
-if df["True_Risk"].max() > 1.0:
-    df["True_Risk"] = df["True_Risk"] / 100.0
+    # Rename target and drop rows without primary deficiency probability
+    df = df.rename(columns={"P_Deficiency_Primary": "True_Risk"})
+    df = df[~df["True_Risk"].isna()].copy()
 
-# Ensure Age exists
-if "Age" not in df.columns:
-    df["Age"] = np.nan
-df["Age"] = df["Age"].fillna(15.0)
+    # Scale risk from % to 0..1 if needed
+    if df["True_Risk"].max() > 1.0:
+        df["True_Risk"] = df["True_Risk"] / 100.0
 
-# Keep essential columns
-df = df[["Country", "Population", "Gender", "Micronutrient", "Age", "True_Risk"]].copy()
+    # Ensure Age exists
+    if "Age" not in df.columns:
+        df["Age"] = np.nan
+    df["Age"] = df["Age"].fillna(15.0)
 
-# Strip whitespace in categoricals
-CATEGORICAL_CONTEXT_COLS = ["Country", "Population", "Gender"]
-for col in CATEGORICAL_CONTEXT_COLS + ["Micronutrient"]:
-    df[col] = df[col].astype(str).str.strip()
+    # Keep essential columns
+    df = df[["Country", "Population", "Gender", "Micronutrient", "Age", "True_Risk"]].copy()
+
+    # Strip whitespace in categoricals
+    for col in CATEGORICAL_CONTEXT_COLS + ["Micronutrient"]:
+        df[col] = df[col].astype(str).str.strip()
+    return df
 
 # -----------------------------
 # 1b. BASELINE TABLES (FALLBACKS)
 # -----------------------------
 
-# Population + Gender baseline (ignores Country)
-baseline_pop_gender = (
-    df.groupby(["Population", "Gender", "Micronutrient"], observed=False)["True_Risk"]
-      .mean()
-      .reset_index()
-)
+def _build_baselines(df: pd.DataFrame) -> None:
+    global baseline_pop_gender, baseline_global, BASELINE_INDEX, BASELINE_GLOBAL_RECORDS
 
-# Global baseline per micronutrient
-baseline_global = (
-    df.groupby(["Micronutrient"], observed=False)["True_Risk"]
-      .mean()
-      .reset_index()
-)
+    # Population + Gender baseline (ignores Country)
+    baseline_pop_gender = (
+        df.groupby(["Population", "Gender", "Micronutrient"], observed=False)["True_Risk"]
+          .mean()
+          .reset_index()
+    )
+
+    # Global baseline per micronutrient
+    baseline_global = (
+        df.groupby(["Micronutrient"], observed=False)["True_Risk"]
+          .mean()
+          .reset_index()
+    )
+
+    # Compiled once: (Population, Gender) -> pre-sorted risk records, so the
+    # unknown-country fallback is a dict lookup instead of a DataFrame scan.
+    BASELINE_INDEX = {
+        (str(pop), str(gen)): _risk_records(sub)
+        for (pop, gen), sub in baseline_pop_gender.groupby(["Population", "Gender"], sort=False)
+    }
+    BASELINE_GLOBAL_RECORDS = _risk_records(baseline_global)
+
+
+def _risk_records(sub: pd.DataFrame) -> tuple:
+    """(micronutrient, risk) pairs sorted by risk, highest first (stable)."""
+    records = [
+        (str(m), float(r))
+        for m, r in zip(sub["Micronutrient"], sub["True_Risk"])
+    ]
+    records.sort(key=lambda rec: rec[1], reverse=True)
+    return tuple(records)
 
 
 # -----------------------------
 # 2. ENCODING FOR CONTEXT
 # -----------------------------
 
-# Build manual maps for context columns (NOT micronutrients — those are actions)
-cat_maps: Dict[str, Dict[str, int]] = {}
-for col in CATEGORICAL_CONTEXT_COLS:
-    cats = sorted(df[col].dropna().unique())
-    cat_maps[col] = {val: i for i, val in enumerate(cats)}
-
+def _build_cat_maps(df: pd.DataFrame) -> Dict[str, Dict[str, int]]:
+    """Manual maps for context columns (NOT micronutrients — those are actions)."""
+    maps: Dict[str, Dict[str, int]] = {}
+    for col in CATEGORICAL_CONTEXT_COLS:
+        cats = sorted(df[col].dropna().unique())
+        maps[col] = {val: i for i, val in enumerate(cats)}
+    return maps
+
+def _requires_model(fn):
+    """Load the data / model (once) before running fn."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _loaded:
+            ensure_loaded()
+        return fn(*args, **kwargs)
+    return wrapper
+
+@_requires_model
 def encode_context(country: str, population: str, gender: str, age: float) -> np.ndarray:
     """
     Encode a context (Country, Population, Gender, Age) into a numeric feature vector.
@@ -128,51 +174,73 @@ def encode_context(country: str, population: str, gender: str, age: float) -> np
     codes.append(age_scaled)
     return np.array(codes, dtype=float)
 
+@_requires_model
+def encode_contexts(
+    countries: List[str],
+    populations: List[str],
+    genders: List[str],
+    ages: List[float],
+) -> np.ndarray:
+    """
+    Encode many contexts at once into an (n_profiles, CONTEXT_DIM) matrix
+    (same features as encode_context, one row per profile).
+    """
+    columns = []
+    for col, values in zip(CATEGORICAL_CONTEXT_COLS, (countries, populations, genders)):
+        mapping = cat_maps[col]
+        columns.append([mapping.get(str(v).strip(), -1) for v in values])
+    columns.append(np.asarray(ages, dtype=float) / 100.0)
+    return np.column_stack(columns).astype(float, copy=False)
+
 CONTEXT_DIM = len(CATEGORICAL_CONTEXT_COLS) + 1  # + Age
 
 # -----------------------------
 # 3. BUILD ENVIRONMENT FROM DATA
 # -----------------------------
 
-# We aggregate by (Country, Population, Gender, Age, Micronutrient)
-# to get a "true" risk for each (context, action).
-grouped = (
-    df
-    .groupby(["Country", "Population", "Gender", "Age", "Micronutrient"], observed=False)["True_Risk"]
-    .mean()
-    .reset_index()
-)
-
-# All unique micronutrients = ACTIONS
-MICRONUTRIENTS = sorted(grouped["Micronutrient"].unique())
-N_ACTIONS = len(MICRONUTRIENTS)
-action_index = {m: i for i, m in enumerate(MICRONUTRIENTS)}
-
-# Map (context, micronutrient) -> True_Risk
-risk_lookup: Dict[tuple, float] = {}
-# Map context -> list of available actions for that context
-avail_actions: Dict[tuple, List[str]] = {}
-
-for _, row in grouped.iterrows():
-    ctx_key = (
-        row["Country"],
-        row["Population"],
-        row["Gender"],
-        float(row["Age"]),
+def _build_environment(df: pd.DataFrame) -> None:
+    global grouped, MICRONUTRIENTS, N_ACTIONS, action_index
+    global risk_lookup, avail_actions, CONTEXT_KEYS
+
+    # We aggregate by (Country, Population, Gender, Age, Micronutrient)
+    # to get a "true" risk for each (context, action).
+    grouped = (
+        df
+        .groupby(["Country", "Population", "Gender", "Age", "Micronutrient"], observed=False)["True_Risk"]
+        .mean()
+        .reset_index()
     )
-    m = row["Micronutrient"]
-    r = float(row["True_Risk"])  # already in 0..1
 
-    risk_lookup[(ctx_key, m)] = r
-    if ctx_key not in avail_actions:
-        avail_actions[ctx_key] = []
-    avail_actions[ctx_key].append(m)
+    # All unique micronutrients = ACTIONS
+    MICRONUTRIENTS = sorted(grouped["Micronutrient"].unique())
+    N_ACTIONS = len(MICRONUTRIENTS)
+    action_index = {m: i for i, m in enumerate(MICRONUTRIENTS)}
+
+    # Map (context, micronutrient) -> True_Risk
+    risk_lookup = {}
+    # Map context -> list of available actions for that context
+    avail_actions = {}
+
+    for _, row in grouped.iterrows():
+        ctx_key = (
+            row["Country"],
+            row["Population"],
+            row["Gender"],
+            float(row["Age"]),
+        )
+        m = row["Micronutrient"]
+        r = float(row["True_Risk"])  # already in 0..1
 
-# List of all contexts for sampling
-CONTEXT_KEYS = list(avail_actions.keys())
+        risk_lookup[(ctx_key, m)] = r
+        if ctx_key not in avail_actions:
+            avail_actions[ctx_key] = []
+        avail_actions[ctx_key].append(m)
 
-print(f"[micronutrient_risk_model] #contexts: {len(CONTEXT_KEYS)}, "
-      f"#actions (micronutrients): {N_ACTIONS}")
+    # List of all contexts for sampling
+    CONTEXT_KEYS = list(avail_actions.keys())
+
+    print(f"[micronutrient_risk_model] #contexts: {len(CONTEXT_KEYS)}, "
+          f"#actions (micronutrients): {N_ACTIONS}")
 
 # -----------------------------
 # 4. LINUCB CONTEXTUAL BANDIT
@@ -181,50 +249,89 @@ print(f"[micronutrient_risk_model] #contexts: {len(CONTEXT_KEYS)}, "
 # For each action a, we keep:
 #   A_a (d x d), b_a (d)
 # and learn theta_a = A_a^{-1} b_a
+#
+# All actions are stacked into arrays so a step can score every allowed
+# action with one batched operation. A_inv and theta are kept current with
+# Sherman–Morrison rank-1 updates instead of re-inverting A_a each step:
+#   (A + x x^T)^{-1} = A^{-1} - (A^{-1} x)(x^T A^{-1}) / (1 + x^T A^{-1} x)
 
 alpha = 1.0  # exploration strength
 d = CONTEXT_DIM
 
-A = [np.eye(d) for _ in range(N_ACTIONS)]
-b = [np.zeros(d) for _ in range(N_ACTIONS)]
 
+def _init_params() -> None:
+    """Fresh (untrained) parameters for every action."""
+    global A, b, A_inv, theta
+    A = np.tile(np.eye(d), (N_ACTIONS, 1, 1))      # (N_ACTIONS, d, d)
+    b = np.zeros((N_ACTIONS, d))                    # (N_ACTIONS, d)
+    A_inv = np.tile(np.eye(d), (N_ACTIONS, 1, 1))  # A^{-1}, kept in sync with A
+    theta = np.zeros((N_ACTIONS, d))                # A^{-1} b
+
+
+def _reset_derived_params() -> None:
+    """Recompute A_inv / theta from A and b (after loading a model)."""
+    global A_inv, theta
+    A_inv = np.linalg.inv(A) if len(A) else np.zeros((0, d, d))
+    theta = np.einsum("kij,kj->ki", A_inv, b)
+
+
+def _ucb_scores(x: np.ndarray, allowed_idx: np.ndarray):
+    """
+    UCB score theta_a.x + alpha * sqrt(x^T A_a^{-1} x) for every allowed
+    action at once. Also returns A_a^{-1} x (rows aligned with allowed_idx),
+    which the rank-1 update of the chosen action reuses.
+    """
+    Ainv_x = A_inv[allowed_idx] @ x                     # (k, d)
+    p = theta[allowed_idx] @ x + alpha * np.sqrt(Ainv_x @ x)
+    return p, Ainv_x
+
+
+def _sherman_morrison_step(
+    Ainv_a: np.ndarray,
+    theta_a: np.ndarray,
+    x: np.ndarray,
+    u: np.ndarray,
+    reward: float,
+) -> None:
+    """
+    In-place rank-1 update of one action's A_inv / theta (views into the
+    stacked arrays) after observing (x, reward), with u = A_inv x:
+      A_inv' = A_inv - u u^T / (1 + x.u)
+      theta' = theta + u (reward - x.theta) / (1 + x.u)
+    """
+    denom = 1.0 + float(u @ x)
+    coef = (reward - float(theta_a @ x)) / denom
+    Ainv_a -= u[:, None] * (u / denom)
+    theta_a += coef * u
+
+
+@_requires_model
 def choose_action_linucb(x: np.ndarray, allowed_micronutrients: List[str]) -> str:
     """
     Given context feature vector x and the list of allowed micronutrients
     for that context, pick an action using LinUCB.
+    Ties go to the first allowed micronutrient.
     """
-    x = x.reshape(-1, 1)  # column vector (d x 1)
-    best_p = -1e9
-    best_micronutrient = None
-    for m in allowed_micronutrients:
-        a_idx = action_index[m]
-        A_a = A[a_idx]
-        b_a = b[a_idx]
-        A_inv = np.linalg.inv(A_a)
-        theta_a = A_inv @ b_a  # (d,)
-        # UCB score
-        mean_reward = float(theta_a @ x[:, 0])
-        # exploration term
-        var_term = float(np.sqrt(x.T @ A_inv @ x))
-        p = mean_reward + alpha * var_term
-        if p > best_p:
-            best_p = p
-            best_micronutrient = m
-    return best_micronutrient  # type: ignore[return-value]
+    allowed_idx = np.array([action_index[m] for m in allowed_micronutrients])
+    p, _ = _ucb_scores(np.asarray(x, dtype=float).ravel(), allowed_idx)
+    return MICRONUTRIENTS[int(allowed_idx[int(np.argmax(p))])]
 
+@_requires_model
 def linucb_update(micronutrient: str, x: np.ndarray, reward: float) -> None:
     """
     Online update for LinUCB.
     """
     a_idx = action_index[micronutrient]
-    x = x.reshape(-1, 1)  # (d x 1)
-    A[a_idx] += x @ x.T
-    b[a_idx] += reward * x[:, 0]
+    x = np.asarray(x, dtype=float).ravel()
+    A[a_idx] += np.outer(x, x)
+    b[a_idx] += reward * x
+    _sherman_morrison_step(A_inv[a_idx], theta[a_idx], x, A_inv[a_idx] @ x, reward)
 
 # -----------------------------
 # 5. TRAINING LOOP (TRUE RL STYLE)
 # -----------------------------
 
+@_requires_model
 def train_bandit(num_steps: int = 50000, seed: int = 42):
     """
     True contextual-bandit training:
@@ -232,6 +339,11 @@ def train_bandit(num_steps: int = 50000, seed: int = 42):
       - Bandit chooses an action (micronutrient)
       - Environment returns a reward based on True_Risk
       - Update parameters online
+
+    Each step scores the allowed actions in one stacked operation and
+    updates A_inv / theta with a Sherman–Morrison rank-1 step (no matrix
+    inverses). Contexts are discrete, so A and b are accumulated from
+    per-(action, context) counts once at the end.
     """
     rng = np.random.default_rng(seed)
     rewards_history: List[float] = []
@@ -240,27 +352,61 @@ def train_bandit(num_steps: int = 50000, seed: int = 42):
         print("[micronutrient_risk_model] No contexts found; skipping training.")
         return rewards_history
 
-    for t in range(1, num_steps + 1):
-        # 1) Sample a random context from our data-derived environment
-        ctx_key = CONTEXT_KEYS[rng.integers(0, len(CONTEXT_KEYS))]
-        country, population, gender, age = ctx_key
-        allowed_actions = avail_actions[ctx_key]
+    # Encode every context and its allowed actions / true risks once
+    n_ctx = len(CONTEXT_KEYS)
+    X = np.array([encode_context(*ctx_key) for ctx_key in CONTEXT_KEYS])   # (n_ctx, d)
+    X_rows = list(X)
+    ctx_actions = [
+        np.array([action_index[m] for m in avail_actions[ctx_key]])
+        for ctx_key in CONTEXT_KEYS
+    ]
+    ctx_risk = [
+        [risk_lookup[(ctx_key, m)] for m in avail_actions[ctx_key]]
+        for ctx_key in CONTEXT_KEYS
+    ]
+
+    # Per-action views into the stacked A_inv / theta (updated in place)
+    Ainv_rows = list(A_inv)
+    theta_rows = list(theta)
+
+    # Draw the whole environment randomness up front
+    # (context per step + uniform for the Bernoulli reward)
+    ctx_draws = rng.integers(0, n_ctx, size=num_steps).tolist()
+    reward_draws = rng.random(num_steps).tolist()
 
-        # 2) Encode context
-        x = encode_context(country, population, gender, age)
+    pulls = [[0] * n_ctx for _ in range(N_ACTIONS)]
+    reward_sums = [[0] * n_ctx for _ in range(N_ACTIONS)]
 
-        # 3) Choose action using LinUCB
-        chosen_m = choose_action_linucb(x, allowed_actions)
+    for t in range(1, num_steps + 1):
+        # 1) Sample a random context from our data-derived environment
+        c = ctx_draws[t - 1]
+
+        # 2) Encoded context
+        x = X_rows[c]
+
+        # 3) Choose action using LinUCB (nothing to score with one option)
+        allowed_idx = ctx_actions[c]
+        if len(allowed_idx) == 1:
+            k = 0
+            chosen = int(allowed_idx[0])
+            u = Ainv_rows[chosen] @ x
+        else:
+            p, Ainv_x = _ucb_scores(x, allowed_idx)
+            k = int(p.argmax())
+            chosen = int(allowed_idx[k])
+            u = Ainv_x[k]
 
         # 4) Get underlying deficiency probability
-        true_p = risk_lookup[(ctx_key, chosen_m)]  # in [0, 1]
+        true_p = ctx_risk[c][k]  # in [0, 1]
 
         # 5) Sample a Bernoulli reward (1 = deficient, 0 = not)
-        reward = rng.binomial(1, true_p)
+        reward = 1 if reward_draws[t - 1] < true_p else 0
         rewards_history.append(reward)
 
         # 6) Update bandit parameters
-        linucb_update(chosen_m, x, reward)
+        _sherman_morrison_step(Ainv_rows[chosen], theta_rows[chosen], x, u, reward)
+        pulls[chosen][c] += 1
+        reward_sums[chosen][c] += reward
 
         # Optional: small progress print
         if t % 10000 == 0:
@@ -270,16 +416,360 @@ def train_bandit(num_steps: int = 50000, seed: int = 42):
                 f"| recent avg reward (last 1000): {avg_r:.3f}"
             )
 
+    # A_a += sum_c pulls[a, c] x_c x_c^T ;  b_a += sum_c reward_sums[a, c] x_c
+    A[...] += np.einsum("ac,ci,cj->aij", np.array(pulls, dtype=float), X, X)
+    b[...] += np.array(reward_sums, dtype=float) @ X
+
     print("[micronutrient_risk_model] Training complete.")
     return rewards_history
 
-# Train once at import so the FastAPI app can use the learned parameters
-rewards_history = train_bandit(num_steps=30000)
+# -----------------------------
+# 5b. MODEL ARTIFACT (train once, load everywhere)
+# -----------------------------
+
+MODEL_DIR_ENV = "HEMOVITA_MODEL_DIR"
+MODEL_FORMAT_VERSION = 2  # 2: Sherman–Morrison trainer
+TRAIN_NUM_STEPS = 30000
+TRAIN_SEED = 42
+
+
+def _model_dir() -> Path:
+    """Directory for trained model artifacts (default: backend/data/models)."""
+    env = os.environ.get(MODEL_DIR_ENV)
+    if env:
+        return Path(env)
+    return DATA_PATH.parent / "models"
+
+
+@_requires_model
+def model_fingerprint(num_steps: int = TRAIN_NUM_STEPS, seed: int = TRAIN_SEED) -> str:
+    """
+    Hash of everything the trained parameters depend on: the risk data file
+    and the training settings. A new fingerprint means a retrain.
+    """
+    h = hashlib.sha256()
+    with open(DATA_PATH, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    settings = {
+        "format": MODEL_FORMAT_VERSION,
+        "num_steps": num_steps,
+        "seed": seed,
+        "alpha": alpha,
+        "context_dim": CONTEXT_DIM,
+    }
+    h.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def model_artifact_path(fingerprint: str) -> Path:
+    return _model_dir() / f"linucb_{fingerprint}.npz"
+
+
+@_requires_model
+def save_model(path: Path, fingerprint: str) -> None:
+    """
+    Write A/b, MICRONUTRIENTS and cat_maps to a .npz artifact
+    (written to a temp file first, then atomically renamed).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            fingerprint=np.array(fingerprint),
+            A=A,
+            b=b,
+            micronutrients=np.array(MICRONUTRIENTS, dtype=str),
+            cat_maps=np.array(json.dumps(cat_maps, sort_keys=True)),
+        )
+    os.replace(tmp, path)
+
+
+@_requires_model
+def load_model(path: Path, fingerprint: str) -> bool:
+    """
+    Load a saved artifact into the module state. Returns False if the file
+    is missing, unreadable, or was trained on other data/settings.
+    """
+    global A, b, cat_maps, MICRONUTRIENTS, N_ACTIONS, action_index
+    path = Path(path)
+    if not path.exists():
+        return False
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            if str(npz["fingerprint"]) != fingerprint:
+                return False
+            A_saved = npz["A"]
+            b_saved = npz["b"]
+            micronutrients = [str(m) for m in npz["micronutrients"]]
+            maps = json.loads(str(npz["cat_maps"]))
+    except Exception as e:
+        print(f"[micronutrient_risk_model] could not read {path}: {e}")
+        return False
+
+    A = np.array(A_saved, dtype=float)
+    b = np.array(b_saved, dtype=float)
+    cat_maps = {col: {k: int(v) for k, v in m.items()} for col, m in maps.items()}
+    MICRONUTRIENTS = micronutrients
+    N_ACTIONS = len(MICRONUTRIENTS)
+    action_index = {m: i for i, m in enumerate(MICRONUTRIENTS)}
+    _reset_derived_params()
+    return True
+
+
+@_requires_model
+def load_or_train_model(num_steps: int = TRAIN_NUM_STEPS, seed: int = TRAIN_SEED) -> List[float]:
+    """
+    Load the trained bandit for the current data + settings, training (and
+    saving the artifact) only when no matching artifact exists.
+    Returns the training rewards history (empty when loaded from disk).
+    """
+    fingerprint = model_fingerprint(num_steps, seed)
+    path = model_artifact_path(fingerprint)
+
+    if load_model(path, fingerprint):
+        print(f"[micronutrient_risk_model] loaded trained model: {path}")
+        return []
+
+    history = train_bandit(num_steps=num_steps, seed=seed)
+    try:
+        save_model(path, fingerprint)
+        print(f"[micronutrient_risk_model] saved trained model: {path}")
+    except OSError as e:
+        print(f"[micronutrient_risk_model] could not save model to {path}: {e}")
+    return history
+
+
+# -----------------------------
+# 5c. LAZY INITIALIZATION
+# -----------------------------
+
+# Names that only exist once ensure_loaded() has run; reading them as
+# module attributes (risk.A, risk.cat_maps, ...) triggers the load.
+_LAZY_NAMES = frozenset({
+    "DATA_PATH", "df", "baseline_pop_gender", "baseline_global",
+    "BASELINE_INDEX", "BASELINE_GLOBAL_RECORDS", "cat_maps", "grouped",
+    "MICRONUTRIENTS", "N_ACTIONS", "action_index", "risk_lookup",
+    "avail_actions", "CONTEXT_KEYS", "A", "b", "A_inv", "theta", "THETA",
+    "THETA_FINGERPRINT", "rewards_history",
+})
+
+_load_lock = threading.RLock()
+_loaded = False
+_loading = False
+LOAD_TIMINGS: Dict[str, float] = {}   # phase -> seconds, filled by ensure_loaded
+
+
+def ensure_loaded() -> Dict[str, float]:
+    """
+    Build the data-derived state and load (or train once) the bandit,
+    exactly once per process. Safe to call from many threads; calls made
+    while loading (from the loading code itself) return immediately.
+    Returns the phase timings in seconds (data, environment, model, freeze).
+    """
+    global _loaded, _loading, DATA_PATH, df, cat_maps, rewards_history
+    if _loaded:
+        return LOAD_TIMINGS
+    with _load_lock:
+        if _loaded or _loading:
+            return LOAD_TIMINGS
+        _loading = True
+        try:
+            t0 = time.perf_counter()
+            DATA_PATH = _resolve_data_path()
+            df = _load_data_frame(DATA_PATH)
+            t1 = time.perf_counter()
+            _build_baselines(df)
+            cat_maps = _build_cat_maps(df)
+            _build_environment(df)
+            _init_params()
+            t2 = time.perf_counter()
+            # Load (or train once) so the app can use the learned parameters
+            rewards_history = load_or_train_model()
+            t3 = time.perf_counter()
+            freeze_theta()
+            t4 = time.perf_counter()
+            LOAD_TIMINGS.update({
+                "risk_data": t1 - t0,
+                "risk_environment": t2 - t1,
+                "risk_model": t3 - t2,
+                "risk_freeze": t4 - t3,
+            })
+            _loaded = True
+        finally:
+            _loading = False
+    return LOAD_TIMINGS
+
+
+def __getattr__(name: str):
+    if name in _LAZY_NAMES:
+        ensure_loaded()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# -----------------------------
+# 5c. RISK PROFILE CACHE
+# -----------------------------
+
+RISK_CACHE_SIZE_ENV = "HEMOVITA_RISK_CACHE_SIZE"
+RISK_CACHE_AGE_BUCKET_ENV = "HEMOVITA_RISK_AGE_BUCKET"
+
+
+def _copy_risk_profile(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy a get_micronutrient_risk_profile result: its lists and dicts are
+    rebuilt, scalars are shared. Much cheaper than copy.deepcopy on the
+    hot path; anything of unexpected shape falls back to deepcopy.
+    """
+    try:
+        return {
+            **result,
+            "micronutrient_risks": [dict(r) for r in result["micronutrient_risks"]],
+            "meta": dict(result["meta"]),
+        }
+    except (KeyError, TypeError):
+        return copy.deepcopy(result)
+
+
+class RiskProfileCache:
+    """
+    Size-bounded LRU cache for get_micronutrient_risk_profile.
+
+    The profile only depends on (country, population, gender, age), so the
+    key is that tuple in canonical form: strings are stripped, known
+    categories (training cat_maps + baseline tables) are matched
+    case-insensitively and mapped back to their canonical spelling, and age
+    is rounded to `age_bucket` years. The computation itself runs on the
+    canonical profile, so every profile sharing a key gets the same answer.
+
+    Callers get their own copy of the lists/dicts, so mutating a result never
+    touches the cache.
+    clear() must be called whenever the model parameters change.
+    """
+
+    def __init__(self, maxsize: int = 1024, age_bucket: float = 1.0):
+        self.maxsize = max(0, int(maxsize))
+        self.age_bucket = float(age_bucket)
+        self._data: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._categories: Optional[Dict[str, Dict[str, str]]] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- canonical key ---
+
+    def _category_maps(self) -> Dict[str, Dict[str, str]]:
+        """casefolded -> canonical spelling, per context column."""
+        cats = self._categories
+        if cats is None:
+            ensure_loaded()
+            cats = {}
+            for col in CATEGORICAL_CONTEXT_COLS:
+                names = set(cat_maps.get(col, {}))
+                if col in baseline_pop_gender.columns:
+                    names.update(str(v) for v in baseline_pop_gender[col].unique())
+                cats[col] = {n.strip().casefold(): n for n in names}
+            self._categories = cats
+        return cats
+
+    def _canonical(self, col: str, value: Any, default: str) -> str:
+        text = str(value or "").strip() or default
+        return self._category_maps()[col].get(text.casefold(), text)
+
+    def canonical_profile(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        age = float(profile.get("age", 15.0))
+        if self.age_bucket > 0:
+            age = round(age / self.age_bucket) * self.age_bucket
+        return {
+            "country": self._canonical("Country", profile.get("country"), ""),
+            "population": self._canonical("Population", profile.get("population"), "All"),
+            "gender": self._canonical("Gender", profile.get("gender"), "All"),
+            "age": age,
+        }
+
+    # --- lookup ---
+
+    def get_or_compute(self, profile: Dict[str, Any], compute) -> Dict[str, Any]:
+        canonical = self.canonical_profile(profile)
+        key = (canonical["country"], canonical["population"], canonical["gender"], canonical["age"])
+
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return _copy_risk_profile(hit)
+            self.misses += 1
+
+        result = compute(canonical)
+        if self.maxsize == 0:
+            return result
+
+        with self._lock:
+            self._data[key] = _copy_risk_profile(result)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        """Drop every entry (call after the model is retrained/reloaded)."""
+        with self._lock:
+            self._data.clear()
+            self._categories = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "age_bucket": self.age_bucket,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+RISK_CACHE = RiskProfileCache(
+    maxsize=int(os.environ.get(RISK_CACHE_SIZE_ENV, "1024")),
+    age_bucket=float(os.environ.get(RISK_CACHE_AGE_BUCKET_ENV, "1")),
+)
+
+# -----------------------------
+# 5d. FROZEN PARAMETERS FOR SERVING
+# -----------------------------
+
+# theta_a = A_a^{-1} b_a for every action, stacked into one read-only
+# (N_ACTIONS, d) matrix. Parameters never change after training/loading,
+# so prediction is a single matmul instead of N_ACTIONS inversions.
+
+
+@_requires_model
+def freeze_theta() -> np.ndarray:
+    """
+    Solve theta = A^{-1} b once for all actions and publish it as THETA,
+    with THETA_FINGERPRINT identifying the served parameters (response
+    cache keys).
+    """
+    global THETA, THETA_FINGERPRINT
+    frozen = np.linalg.solve(A, b[:, :, None])[:, :, 0] if len(A) else np.zeros((0, d))
+    frozen.setflags(write=False)
+    THETA = frozen
+    THETA_FINGERPRINT = hashlib.sha256(
+        np.ascontiguousarray(frozen).tobytes() + "\0".join(MICRONUTRIENTS).encode("utf-8")
+    ).hexdigest()[:16]
+    RISK_CACHE.clear()
+    return THETA
 
 # -----------------------------
 # 6. PREDICTION + PUBLIC API
 # -----------------------------
 
+@_requires_model
 def bandit_predict_deficiency_risk(
     country: str,
     population: str,
@@ -294,25 +784,30 @@ def bandit_predict_deficiency_risk(
         { 'micronutrient': str, 'predicted_risk': float }
     """
     x = encode_context(country, population, gender, age)  # (d,)
-    results = []
-
-    for m in MICRONUTRIENTS:
-        a_idx = action_index[m]
-        A_a = A[a_idx]
-        b_a = b[a_idx]
-        A_inv = np.linalg.inv(A_a)
-        theta_a = A_inv @ b_a  # (d,)
-        r_hat = float(theta_a @ x)  # can be outside [0,1]; clamp
-        r_hat = max(0.0, min(1.0, r_hat))
-        results.append({
-            "micronutrient": m,
-            "predicted_risk": r_hat,
-        })
+    r_hat = bandit_predict_batch(x[None, :])[0]            # (N_ACTIONS,)
+
+    results = [
+        {"micronutrient": m, "predicted_risk": r}
+        for m, r in zip(MICRONUTRIENTS, r_hat.tolist())
+    ]
 
     # sort by predicted risk descending
     results.sort(key=lambda r: r["predicted_risk"], reverse=True)
     return results
 
+
+@_requires_model
+def bandit_predict_batch(X: np.ndarray) -> np.ndarray:
+    """
+    Predicted deficiency risk for many profiles in one matmul.
+
+    X: (n_profiles, CONTEXT_DIM) context matrix (see encode_contexts)
+    Returns (n_profiles, N_ACTIONS), columns in MICRONUTRIENTS order,
+    clamped to [0, 1] (raw linear estimates can fall outside).
+    """
+    X = np.asarray(X, dtype=float)
+    return np.clip(X @ THETA.T, 0.0, 1.0)
+
 #FALLBACK LOGIC 
 def _fallback_risks_by_pop_gender(population: str, gender: str) -> List[Dict[str, float]]:
     """
@@ -323,26 +818,12 @@ def _fallback_risks_by_pop_gender(population: str, gender: str) -> List[Dict[str
     pop = str(population).strip()
     gen = str(gender).strip()
 
-    sub = baseline_pop_gender[
-        (baseline_pop_gender["Population"] == pop)
-        & (baseline_pop_gender["Gender"] == gen)
+    records = BASELINE_INDEX.get((pop, gen)) or BASELINE_GLOBAL_RECORDS
+    return [
+        {"micronutrient": m, "predicted_risk": r}
+        for m, r in records
     ]
 
-    if sub.empty:
-        sub = baseline_global.copy()
-    else:
-        sub = sub.copy()
-
-    results: List[Dict[str, float]] = []
-    for _, row in sub.iterrows():
-        results.append({
-            "micronutrient": row["Micronutrient"],
-            "predicted_risk": float(row["True_Risk"]),
-        })
-
-    results.sort(key=lambda r: r["predicted_risk"], reverse=True)
-    return results
-
 def _summarize_risks(risks: List[Dict[str, float]], top_n: int = 3) -> str:
     """
     Simple text summary for UI / report.
@@ -381,11 +862,20 @@ def _fallback_disclaimer(fallback_level: str, population: str, gender: str) -> s
     return ""
 
 
+@_requires_model
 def get_micronutrient_risk_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
     """
     Public API used by FastAPI.
     Expects keys: country, population, gender, age
+
+    Results are served from RISK_CACHE (see RiskProfileCache for how the
+    profile is normalized).
     """
+    return RISK_CACHE.get_or_compute(profile, _compute_risk_profile)
+
+
+def _compute_risk_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Uncached risk profile for one (country, population, gender, age)."""
     country = profile.get("country", "") or ""
     population = profile.get("population", "") or "All"
     gender = profile.get("gender", "") or "All"
@@ -436,6 +926,88 @@ def get_micronutrient_risk_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
         },
     }
 
+
+# -----------------------------
+# 7. REPORT HELPERS (used by /api/report and batch scoring)
+# -----------------------------
+
+def risk_input_for_patient(
+    sex: Optional[str],
+    pregnant: Optional[bool],
+    country: Optional[str],
+    age: float,
+    population: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Map report patient fields to the risk-model profile
+    (country, population, gender, age). An explicit population from the
+    UI wins over the one derived from sex/pregnancy.
+    """
+    sex_lower = (sex or "").lower()
+    if sex_lower == "female":
+        default_population = "Pregnant women" if pregnant else "Women"
+        gender = "Female"
+    elif sex_lower == "male":
+        default_population = "Men"
+        gender = "Male"
+    else:
+        default_population = "Adults"
+        gender = "All"
+
+    return {
+        "country": country or "",
+        "population": population or default_population,
+        "gender": gender,
+        "age": age,
+    }
+
+
+def report_risk_fields(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn get_micronutrient_risk_profile output into the risk fields of
+    ReportResponse: risk_profile, micronutrient_risks, risk_summary_text.
+    """
+    micronutrient_risks = raw.get("micronutrient_risks", [])
+    summary_text = raw.get("summary_text", "")
+    disclaimer = raw.get("disclaimer", "")
+    meta = raw.get("meta", {})
+
+    if micronutrient_risks:
+        overall_risk = max(m["predicted_risk"] for m in micronutrient_risks)
+    else:
+        overall_risk = 0.0
+
+    if overall_risk < 0.33:
+        bucket = "low"
+    elif overall_risk < 0.66:
+        bucket = "moderate"
+    else:
+        bucket = "high"
+
+    high_risk = [
+        m for m in micronutrient_risks
+        if m["predicted_risk"] >= 0.66
+    ]
+
+    if disclaimer:
+        risk_summary_text = summary_text + " " + disclaimer
+    else:
+        risk_summary_text = summary_text
+
+    return {
+        "risk_profile": {
+            "overall_risk": overall_risk,
+            "risk_bucket": bucket,
+            "high_risk_micronutrients": high_risk,
+            "micronutrient_risks": micronutrient_risks,
+            "summary_text": summary_text,
+            "meta": meta,
+        },
+        "micronutrient_risks": micronutrient_risks,
+        "risk_summary_text": risk_summary_text,
+    }
+
+
 if __name__ == "__main__":
     # quick manual test
     demo_profile = {
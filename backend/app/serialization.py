@@ -0,0 +1,126 @@
+# backend/app/serialization.py
+"""
+Fast JSON for engine output.
+
+The engine's results are already well-typed (we build them), so the report
+endpoints skip ReportResponse validation: report_content() lays the
+results out exactly like ReportResponse (same fields, same order, same
+coercions) as plain dicts, and dumps() encodes them with orjson when it
+is installed, else a compact stdlib encoder. Non-finite floats become
+null, as in pydantic's output.
+
+HEMOVITA_VALIDATE_RESPONSES=1 routes the same dicts through
+ReportResponse instead (slower; for debugging schema drift).
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .schema import ReportResponse, RiskMeta
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib fallback below
+    orjson = None
+
+VALIDATE_RESPONSES_ENV = "HEMOVITA_VALIDATE_RESPONSES"
+VALIDATE_RESPONSES = os.environ.get(VALIDATE_RESPONSES_ENV, "0") == "1"
+
+_META_FIELDS = tuple(RiskMeta.model_fields)
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+
+def _finite(obj: Any) -> Any:
+    """Copy of obj with NaN / ±inf replaced by None (stdlib encoder only)."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON, key order preserved, NaN / inf as null."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    try:
+        return _ENCODER.encode(obj).encode("utf-8")
+    except ValueError:   # a non-finite float somewhere
+        return _ENCODER.encode(_finite(obj)).encode("utf-8")
+
+
+def _opt_float(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def _risk_items(items: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"micronutrient": str(m["micronutrient"]), "predicted_risk": float(m["predicted_risk"])}
+        for m in items
+    ]
+
+
+def _risk_profile(raw: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if raw is None:
+        return None
+    meta = raw.get("meta") or {}
+    return {
+        "overall_risk": float(raw["overall_risk"]),
+        "risk_bucket": raw["risk_bucket"],
+        "high_risk_micronutrients": _risk_items(raw["high_risk_micronutrients"]),
+        "micronutrient_risks": _risk_items(raw["micronutrient_risks"]),
+        "summary_text": raw["summary_text"],
+        "meta": {
+            field: _opt_float(meta.get(field)) if field == "age" else meta.get(field)
+            for field in _META_FIELDS
+        },
+    }
+
+
+def report_content(
+    labels: Dict[str, str],
+    supplement_plan: Dict[str, List[str]],
+    foods: Dict[str, Sequence[Tuple[str, float, str]]],
+    network_notes: List[str],
+    report_text: str,
+    risk: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    One report as the dict ReportResponse would dump to. foods holds the
+    engine's (Food, Typical_serve_g, Category) tuples; risk the fields of
+    risk.report_risk_fields (None when the risk stage failed).
+    """
+    risk = risk or {}
+    return {
+        "labels": labels,
+        "supplement_plan": supplement_plan,
+        "foods": {
+            key: [
+                {"name": name, "serving_g": _opt_float(serv_g), "category": cat}
+                for (name, serv_g, cat) in items
+            ]
+            for key, items in foods.items()
+        },
+        "network_notes": network_notes,
+        "report_text": report_text,
+        "risk_profile": _risk_profile(risk.get("risk_profile")),
+        "micronutrient_risks": risk.get("micronutrient_risks"),
+        "risk_summary_text": risk.get("risk_summary_text"),
+    }
+
+
+def encode_report(content: Dict[str, Any]) -> bytes:
+    if VALIDATE_RESPONSES:
+        return ReportResponse.model_validate(content).model_dump_json().encode("utf-8")
+    return dumps(content)
+
+
+def encode_reports(contents: Sequence[Dict[str, Any]]) -> bytes:
+    if VALIDATE_RESPONSES:
+        return b"[" + b",".join(encode_report(c) for c in contents) + b"]"
+    return dumps(list(contents))
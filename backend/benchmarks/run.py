@@ -0,0 +1,467 @@
+# backend/benchmarks/run.py
+"""
+Engine benchmark suite.
+
+    cd backend
+    python -m benchmarks.run                          # all benchmarks
+    python -m benchmarks.run -k classify -k foods     # name filter
+    python -m benchmarks.run --quick                  # smallest sizes only
+    python -m benchmarks.run --compare benchmarks/results/OLD.json
+
+Every benchmark runs at several input sizes (panel counts, graph edge
+counts, food table rows, ...). Results are written as JSON to
+benchmarks/results/ (or --output); --compare exits non-zero when a case
+got slower than --threshold relative to a previous run.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import TypeAdapter
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# The engine and the risk model print progress at import; keep the output clean
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import risk
+    from app.engine import core
+    from app.engine.data_loader import get_reference_snapshot
+    from app.engine.food_index import FoodIndex
+    from app.engine.food_rank import FoodRanker
+    from app.engine.render import REPORT_FORMATS, get_renderer
+    from app.response_cache import ResponseCache
+    from app.schema import ReportResponse
+    from app.serialization import encode_reports
+
+from . import synthetic
+
+_REPORTS_ADAPTER = TypeAdapter(List[ReportResponse])
+
+
+@dataclasses.dataclass
+class Case:
+    """One benchmark at one input size."""
+    name: str
+    size: int
+    setup: Callable[[int], Any]          # size -> state passed to run
+    run: Callable[[Any], Any]            # the timed call
+    ops: Callable[[int], int] = lambda size: size   # work items per run
+    teardown: Optional[Callable[[Any], None]] = None
+
+
+def _time_case(case: Case, repeat: int, min_time: float) -> Dict[str, Any]:
+    state = case.setup(case.size)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            case.run(state)                       # warm-up
+            samples: List[float] = []
+            deadline = time.perf_counter() + min_time
+            while len(samples) < repeat or (time.perf_counter() < deadline and len(samples) < 50):
+                t0 = time.perf_counter()
+                case.run(state)
+                samples.append(time.perf_counter() - t0)
+    finally:
+        if case.teardown is not None:
+            case.teardown(state)
+
+    ops = max(1, case.ops(case.size))
+    best = min(samples)
+    median = statistics.median(samples)
+    return {
+        "name": case.name,
+        "size": case.size,
+        "ops": ops,
+        "runs": len(samples),
+        "best_s": best,
+        "median_s": median,
+        "per_op_us": median / ops * 1e6,
+    }
+
+
+# -------------------------------------------------------------------
+# Benchmark definitions
+# -------------------------------------------------------------------
+
+PANEL_SIZES = (1, 100, 1000)
+EDGE_SIZES = (26, 100, 300)
+FOOD_ROWS = (77, 1000, 10000)
+RANK_ROWS = (77, 7700, 77000)     # up to 1000x the curated table
+TRAIN_STEPS = (1000, 5000, 20000)
+PROFILE_SIZES = (1, 100, 1000)
+REQUEST_SIZES = (1, 20)
+SERIALIZE_SIZES = (1, 50, 500)
+
+
+def _panels_state(size: int):
+    snapshot = get_reference_snapshot()
+    panels = synthetic.make_panels(snapshot, size)
+    labels = [core.classify_panel(p, snapshot) for p in panels]
+    plans = [core.build_supplement_plan(lab, snapshot) for lab in labels]
+    return snapshot, panels, labels, plans
+
+
+def _cohort_state(size: int):
+    snapshot = get_reference_snapshot()
+    return snapshot, synthetic.make_panels(snapshot, size), synthetic.make_patients(size)
+
+
+def _narrative_state(size: int):
+    """Engine results the narrative is rendered from, per synthetic panel."""
+    snapshot, panels, labels, plans = _panels_state(size)
+    patients = synthetic.make_patients(size, seed=4)
+    foods = snapshot.food_index or snapshot.foods
+    return [
+        (
+            labs, patient, lab, plan,
+            core.suggest_foods_for_bundles(core.food_bundles_needed(lab), foods),
+            core.network_chains(core.low_items(lab), snapshot),
+        )
+        for labs, patient, lab, plan in zip(panels, patients, labels, plans)
+    ]
+
+
+def _graph_state(size: int):
+    snapshot = get_reference_snapshot()
+    snap = synthetic.snapshot_with_edges(snapshot, synthetic.make_edges(snapshot, size))
+    panels = synthetic.make_panels(snapshot, 50)
+    labels = [core.classify_panel(p, snap) for p in panels]
+    plans = [core.build_supplement_plan(lab, snap) for lab in labels]
+    targets = sorted(snap.graph.nodes)
+    return snap, labels, plans, targets
+
+
+def _foods_state(size: int):
+    snapshot = get_reference_snapshot()
+    foods = synthetic.make_foods(snapshot, size)
+    labels = [core.classify_panel(p, snapshot) for p in synthetic.make_panels(snapshot, 20)]
+    return foods, labels, FoodIndex(foods)
+
+
+def _rank_state(size: int):
+    snapshot = get_reference_snapshot()
+    foods = synthetic.make_density_foods(snapshot, size)
+    labels = [core.classify_panel(p, snapshot) for p in synthetic.make_panels(snapshot, 20)]
+    return FoodRanker(foods), labels
+
+
+def _bandit_state(size: int):
+    # train_bandit accumulates into the module's A/b: start from a fresh
+    # model each run and put the served one back afterwards.
+    return (risk.A.copy(), risk.b.copy()), size
+
+
+def _bandit_run(state) -> None:
+    _, steps = state
+    risk.A[...] = np.eye(risk.d)
+    risk.b[...] = 0.0
+    risk._reset_derived_params()
+    risk.train_bandit(num_steps=steps, seed=risk.TRAIN_SEED)
+
+
+def _bandit_teardown(state) -> None:
+    (A_saved, b_saved), _ = state
+    risk.A[...] = A_saved
+    risk.b[...] = b_saved
+    risk._reset_derived_params()
+    risk.freeze_theta()
+
+
+def _profiles_state(size: int):
+    patients = synthetic.make_patients(size, seed=1)
+    return [
+        risk.risk_input_for_patient(p.sex, p.pregnant, p.country or "", p.age)
+        for p in patients
+    ]
+
+
+def _client_state(size: int):
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    snapshot = get_reference_snapshot()
+    panels = synthetic.make_panels(snapshot, size, seed=2)
+    patients = synthetic.make_patients(size, seed=2)
+    payloads = [
+        {
+            "labs": labs,
+            "patient": {
+                "age": p.age, "sex": p.sex, "pregnant": p.pregnant,
+                "country": p.country,
+            },
+        }
+        for labs, p in zip(panels, patients)
+    ]
+    client = TestClient(main.app)
+    client.__enter__()   # run the lifespan (snapshot, executor)
+    # the payloads repeat every run: measure the engine, not cache hits
+    cache, main.REPORT_CACHE = main.REPORT_CACHE, ResponseCache(max_bytes=0, ttl=0)
+    return client, payloads, cache
+
+
+def _client_run(state) -> None:
+    client, payloads, _ = state
+    for payload in payloads:
+        r = client.post("/api/report", json=payload)
+        r.raise_for_status()
+
+
+def _client_teardown(state) -> None:
+    from app import main
+
+    main.REPORT_CACHE = state[2]
+    state[0].__exit__(None, None, None)
+
+
+def _reports_state(size: int):
+    """ReportResponse-shaped engine output for `size` synthetic requests."""
+    from app import main
+    from app.schema import ReportRequest
+
+    snapshot = get_reference_snapshot()
+    panels = synthetic.make_panels(snapshot, size, seed=3)
+    patients = synthetic.make_patients(size, seed=3)
+    requests = [
+        ReportRequest.model_validate({
+            "labs": labs,
+            "patient": {"age": p.age, "sex": p.sex, "pregnant": p.pregnant, "country": p.country},
+        })
+        for labs, p in zip(panels, patients)
+    ]
+    return main._batch_job(requests)
+
+
+def _serialize_validated(contents) -> bytes:
+    """The previous path: build ReportResponse models, then FastAPI's
+    response_model pass (validate again, jsonable_encoder, json.dumps)."""
+    from fastapi.encoders import jsonable_encoder
+
+    models = [ReportResponse.model_validate(c) for c in contents]
+    validated = _REPORTS_ADAPTER.validate_python(models)
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+
+def build_cases(quick: bool = False) -> List[Case]:
+    def sizes(values: Sequence[int]) -> Sequence[int]:
+        return values[:1] if quick else values
+
+    cases: List[Case] = []
+    for n in sizes(PANEL_SIZES):
+        cases.append(Case(
+            "classify_panel", n, _panels_state,
+            lambda s: [core.classify_panel(p, s[0]) for p in s[1]],
+        ))
+        cases.append(Case(
+            "classify_panels", n, _panels_state,
+            lambda s: core.classify_panels(s[1], s[0]),
+        ))
+        cases.append(Case(
+            "classify_panel[patient]", n, _cohort_state,
+            lambda s: [core.classify_panel(p, s[0], patient) for p, patient in zip(s[1], s[2])],
+        ))
+        cases.append(Case(
+            "classify_panels[patients]", n, _cohort_state,
+            lambda s: core.classify_panels(s[1], s[0], s[2]),
+        ))
+        cases.append(Case(
+            "build_supplement_plan", n, _panels_state,
+            lambda s: [core.build_supplement_plan(lab, s[0]) for lab in s[2]],
+        ))
+        for fmt in REPORT_FORMATS:
+            cases.append(Case(
+                f"render_report[{fmt}]", n, _narrative_state,
+                lambda s, r=get_renderer(fmt): [r.render(*args) for args in s],
+            ))
+    for n in sizes(EDGE_SIZES):
+        cases.append(Case(
+            "build_network_notes_for_plan[edges]", n, _graph_state,
+            lambda s: [core.build_network_notes_for_plan(plan, s[0]) for plan in s[2]],
+            ops=lambda size: 50,
+        ))
+        cases.append(Case(
+            "multihop_explanations[search,edges]", n, _graph_state,
+            lambda s: core.multihop_explanations(s[0].graph, s[3], max_hops=2),
+            ops=lambda size: 1,
+        ))
+        cases.append(Case(
+            "multihop_explanations[index,edges]", n, _graph_state,
+            lambda s: core.multihop_explanations(
+                s[0].graph, s[3], max_hops=2, index=s[0].multihop_index,
+            ),
+            ops=lambda size: 1,
+        ))
+    for n in sizes(FOOD_ROWS):
+        cases.append(Case(
+            "suggest_foods[rows]", n, _foods_state,
+            lambda s: [core.suggest_foods(lab, s[0]) for lab in s[1]],
+            ops=lambda size: 20,
+        ))
+        cases.append(Case(
+            "suggest_foods[rows,vegan]", n, _foods_state,
+            lambda s: [core.suggest_foods(lab, s[0], diet_filter="vegan") for lab in s[1]],
+            ops=lambda size: 20,
+        ))
+        cases.append(Case(
+            "suggest_foods[index,rows]", n, _foods_state,
+            lambda s: [core.suggest_foods(lab, s[2]) for lab in s[1]],
+            ops=lambda size: 20,
+        ))
+        cases.append(Case(
+            "suggest_foods[index,rows,vegan]", n, _foods_state,
+            lambda s: [core.suggest_foods(lab, s[2], diet_filter="vegan") for lab in s[1]],
+            ops=lambda size: 20,
+        ))
+    for n in sizes(RANK_ROWS):
+        cases.append(Case(
+            "rank_foods[rows,vegan]", n, _rank_state,
+            lambda s: [core.suggest_foods(lab, s[0], diet_filter="vegan") for lab in s[1]],
+            ops=lambda size: 20,
+        ))
+        cases.append(Case(
+            "rank_foods[rows,adhoc_filter]", n, _rank_state,
+            lambda s: [core.suggest_foods(lab, s[0], diet_filter="vegan|vegetarian") for lab in s[1]],
+            ops=lambda size: 20,
+        ))
+    for n in sizes(TRAIN_STEPS):
+        cases.append(Case(
+            "train_bandit[steps]", n, _bandit_state, _bandit_run,
+            teardown=_bandit_teardown,
+        ))
+    for n in sizes(PROFILE_SIZES):
+        cases.append(Case(
+            "bandit_predict_deficiency_risk", n, _profiles_state,
+            lambda s: [
+                risk.bandit_predict_deficiency_risk(p["country"], p["population"], p["gender"], p["age"])
+                for p in s
+            ],
+        ))
+        cases.append(Case(
+            "bandit_predict_batch", n, _profiles_state,
+            lambda s: risk.bandit_predict_batch(risk.encode_contexts(
+                [p["country"] for p in s], [p["population"] for p in s],
+                [p["gender"] for p in s], [p["age"] for p in s],
+            )),
+        ))
+    for n in sizes(REQUEST_SIZES):
+        cases.append(Case(
+            "api_report[requests]", n, _client_state, _client_run,
+            teardown=_client_teardown,
+        ))
+    for n in sizes(SERIALIZE_SIZES):
+        cases.append(Case(
+            "serialize_reports[validated]", n, _reports_state, _serialize_validated,
+        ))
+        cases.append(Case(
+            "serialize_reports[fast]", n, _reports_state, encode_reports,
+        ))
+    return cases
+
+
+# -------------------------------------------------------------------
+# Output / comparison
+# -------------------------------------------------------------------
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR, capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _meta() -> Dict[str, Any]:
+    import pandas as pd
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def compare(current: List[Dict[str, Any]], baseline_path: Path, threshold: float) -> List[str]:
+    """Cases whose median per-op time grew by more than `threshold` (0.2 = 20%)."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    old = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current:
+        prev = old.get((r["name"], r["size"]))
+        if prev is None or prev["per_op_us"] <= 0:
+            continue
+        ratio = r["per_op_us"] / prev["per_op_us"]
+        if ratio > 1.0 + threshold:
+            regressions.append(
+                f"{r['name']} size={r['size']}: "
+                f"{prev['per_op_us']:.1f} -> {r['per_op_us']:.1f} us/op (x{ratio:.2f})"
+            )
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="filters", action="append", default=[],
+                        help="only run cases whose name contains this (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="smallest size of each case only")
+    parser.add_argument("--repeat", type=int, default=5, help="minimum timed runs per case")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="keep repeating (up to 50 runs) for at least this many seconds")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="results JSON path")
+    parser.add_argument("--compare", type=Path, default=None, help="previous results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown vs --compare before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    cases = [
+        c for c in build_cases(quick=args.quick)
+        if not args.filters or any(f in c.name for f in args.filters)
+    ]
+
+    results = []
+    for case in cases:
+        res = _time_case(case, args.repeat, args.min_time)
+        results.append(res)
+        print(f"{res['name']:<40} size={res['size']:<6} "
+              f"median={res['median_s'] * 1e3:9.3f} ms  per_op={res['per_op_us']:10.2f} us")
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"bench-{stamp}.json"
+    output.write_text(json.dumps({"meta": _meta(), "results": results}, indent=2))
+    print(f"\nresults -> {output}")
+
+    if args.compare is not None:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.compare}:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"\nno regressions vs {args.compare} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# backend/benchmarks/synthetic.py
+"""
+Synthetic, seeded inputs for the benchmarks: lab panels, larger nutrient
+networks and larger food tables, all derived from the real reference data
+so every engine code path stays reachable.
+"""
+from __future__ import annotations
+
+import dataclasses
+import random
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.engine.core import (
+    PatientInfo,
+    build_graph_from_edges,
+    build_interaction_rules_from_network,
+    build_multihop_index,
+    build_scheduler,
+)
+from app.engine.data_loader import _edges_from_frame, _freeze
+from app.engine.food_rank import DENSITY_PREFIX
+from app.engine.types import ReferenceSnapshot
+
+
+def make_panels(snapshot: ReferenceSnapshot, n: int, seed: int = 0) -> List[Dict[str, float]]:
+    """
+    n lab panels over the reference markers. Each marker is drawn around its
+    cutoff (roughly half low / half normal or high) and ~30% of markers are
+    left out, like real partial panels.
+    """
+    rng = random.Random(seed)
+    markers = sorted(snapshot.ref)
+    panels = []
+    for _ in range(n):
+        labs = {}
+        for m in markers:
+            if rng.random() < 0.3:
+                continue
+            bounds = snapshot.ref[m]
+            center = bounds.get("low", bounds.get("high", 10.0))
+            labs[m] = round(center * rng.uniform(0.5, 1.6), 2)
+        panels.append(labs)
+    return panels
+
+
+def make_patients(n: int, seed: int = 0) -> List[PatientInfo]:
+    rng = random.Random(seed)
+    return [
+        PatientInfo(
+            age=rng.randint(1, 85),
+            sex=rng.choice(["female", "male"]),
+            pregnant=rng.choice([None, False, True]),
+            country=rng.choice(["Pakistan", "India", "Lao", "Nowhere", None]),
+        )
+        for _ in range(n)
+    ]
+
+
+def make_edges(snapshot: ReferenceSnapshot, n_edges: int, seed: int = 0) -> pd.DataFrame:
+    """
+    The real network edges plus synthetic ones until there are n_edges.
+    Synthetic edges link real nodes to new intermediate nodes, so
+    multi-hop chains into the real targets keep growing with the graph.
+    """
+    rng = random.Random(seed)
+    real = [e._asdict() for e in (snapshot.edges or ())]
+    nodes = sorted({e["source"] for e in real} | {e["target"] for e in real})
+    effects = ["boosts", "inhibits", "regulates"]
+
+    rows = list(real[:n_edges])
+    seen = {(r["source"], r["target"]) for r in rows}
+    i = 0
+    while len(rows) < n_edges:
+        i += 1
+        pool = nodes + [f"syn_{k}" for k in range(max(1, i // 3))]
+        src, tgt = rng.choice(pool), rng.choice(pool)
+        if src == tgt or (src, tgt) in seen:
+            continue
+        seen.add((src, tgt))
+        rows.append({
+            "source": src,
+            "target": tgt,
+            "effect": rng.choice(effects),
+            "confidence": "Synthetic",
+            "notes": "",
+        })
+    return pd.DataFrame(rows, columns=["source", "target", "effect", "confidence", "notes"])
+
+
+def snapshot_with_edges(snapshot: ReferenceSnapshot, edges_df: pd.DataFrame) -> ReferenceSnapshot:
+    """Copy of `snapshot` with the network (and everything derived from it) replaced."""
+    graph = build_graph_from_edges(edges_df)
+    boosters, antagonists = build_interaction_rules_from_network(edges_df)
+    return dataclasses.replace(
+        snapshot,
+        edges=_edges_from_frame(edges_df),
+        graph=graph,
+        boosters=_freeze(boosters),
+        antagonists=_freeze(antagonists),
+        multihop_index=_freeze(build_multihop_index(graph)),
+        scheduler=build_scheduler(antagonists, boosters),
+    )
+
+
+def make_foods(snapshot: ReferenceSnapshot, n_rows: int) -> pd.DataFrame:
+    """The curated food table repeated (with unique names) up to n_rows."""
+    base = snapshot.foods
+    reps = -(-n_rows // len(base))
+    frames = []
+    for r in range(reps):
+        part = base.copy()
+        if r:
+            part["Food"] = part["Food"] + f" #{r}"
+        frames.append(part)
+    return pd.concat(frames, ignore_index=True).head(n_rows)
+
+
+def make_density_foods(snapshot: ReferenceSnapshot, n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    make_foods plus a per100g_<bundle> column for every bundle: each food
+    is rich in its own bundle and has smaller amounts of ~40% of the others
+    (FoodData Central-like sparsity).
+    """
+    rng = np.random.default_rng(seed)
+    foods = make_foods(snapshot, n_rows)
+    for bundle in sorted(foods["Bundle"].unique()):
+        own = (foods["Bundle"] == bundle).to_numpy()
+        amounts = rng.lognormal(0.0, 1.0, len(foods))
+        amounts[~own] *= 0.2
+        amounts[~own & (rng.random(len(foods)) < 0.6)] = 0.0
+        foods[DENSITY_PREFIX + bundle] = amounts.round(3)
+    return foods
@@ -0,0 +1,9 @@
+import pytest
+
+from app.engine.data_loader import get_reference_snapshot
+
+
+@pytest.fixture(scope="session")
+def snapshot():
+    """The reference snapshot built from backend/data."""
+    return get_reference_snapshot()
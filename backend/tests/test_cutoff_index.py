@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.engine.core import PatientInfo, classify_value
+from app.engine.cutoff_index import CutoffIndex, CutoffStratum, demographic_group
+
+
+@pytest.fixture(scope="module")
+def index(snapshot):
+    return snapshot.cutoff_index
+
+
+def low(index, marker, age=None, sex=None, pregnant=None):
+    return index.lookup(marker, age, sex, pregnant)[0]
+
+
+@pytest.mark.parametrize(
+    "age, sex, pregnant, expected",
+    [
+        (3, None, None, 11.0),          # children 6-59 months
+        (3, "male", None, 11.0),
+        (28, "female", True, 11.0),     # pregnant women
+        (28, None, True, 11.0),         # pregnant, sex not given
+        (28, "unknown", True, 11.0),
+        (28, "female", False, 12.0),    # non-pregnant women
+        (28, "female", None, 12.0),
+        (28, "male", None, 13.0),       # men 15+
+        (15, "male", None, 13.0),       # lower bound is inclusive
+        (None, "male", None, 13.0),     # unknown age: adult strata
+        (None, "female", True, 11.0),
+        (None, None, None, 12.0),       # nothing known: REF value
+        (28, None, None, 12.0),         # unknown sex: REF value
+        (8, "male", None, 12.0),        # no stratum covers 5-15: REF value
+    ],
+)
+def test_hemoglobin_strata(index, age, sex, pregnant, expected):
+    assert low(index, "Hemoglobin", age, sex, pregnant) == expected
+
+
+def test_zinc_strata(index):
+    assert low(index, "zinc", 6) == 65.0
+    assert low(index, "zinc", 30, "female") == 70.0
+    assert low(index, "zinc", 30, "male") == 74.0
+
+
+def test_no_demographics_gives_ref(index, snapshot):
+    for marker, rng in snapshot.ref.items():
+        assert index.lookup(marker) == (rng.get("low"), rng.get("high"))
+
+
+def test_unknown_marker(index):
+    assert index.lookup("not_a_marker", 30, "male") is None
+
+
+def test_pregnant_without_sex_is_female():
+    assert demographic_group(None, True) == demographic_group("female", True)
+    assert demographic_group("F", None) == demographic_group("female", False)
+    assert demographic_group("male", True) != demographic_group(None, True)
+
+
+def test_labels_follow_patient(snapshot):
+    man = PatientInfo(age=40, sex="male")
+    pregnant = PatientInfo(age=28, sex="female", pregnant=True)
+    assert classify_value("Hemoglobin", 12.5, snapshot) == "normal"
+    assert classify_value("Hemoglobin", 12.5, snapshot, man) == "low"
+    assert classify_value("Hemoglobin", 11.5, snapshot) == "low"
+    assert classify_value("Hemoglobin", 11.5, snapshot, pregnant) == "normal"
+
+
+def test_lookup_matches_cutoff_matrix(index, snapshot):
+    markers = list(snapshot.ref) + ["not_a_marker"]
+    patients = [
+        PatientInfo(age=age, sex=sex, pregnant=pregnant)
+        for age in (None, 0.2, 0.5, 3, 5, 9.9, 10, 14, 15, 17.5, 18, 40, 90)
+        for sex in (None, "female", "male", "other")
+        for pregnant in (None, False, True)
+    ]
+    lo, hi = index.cutoff_matrix(markers, patients)
+    assert lo.shape == hi.shape == (len(patients), len(markers))
+    for i, p in enumerate(patients):
+        for j, marker in enumerate(markers):
+            expected = index.lookup(marker, p.age, p.sex, p.pregnant) or (None, None)
+            got = tuple(None if math.isnan(v) else float(v) for v in (lo[i, j], hi[i, j]))
+            assert got == expected, (p, marker)
+
+
+def test_most_specific_stratum_wins():
+    strata = {
+        "m": [
+            CutoffStratum("everyone", "all", "na", -math.inf, math.inf, 1.0, None),
+            CutoffStratum("women", "female", "na", 18.0, math.inf, 2.0, None),
+            CutoffStratum("pregnant", "female", "pregnant", 18.0, math.inf, 3.0, None),
+        ]
+    }
+    index = CutoffIndex(strata, {"m": {"low": 0.5}})
+    assert index.lookup("m", 30) == (1.0, None)
+    assert index.lookup("m", 30, "female") == (2.0, None)
+    assert index.lookup("m", 30, "female", True) == (3.0, None)
+    assert index.lookup("m", 30, None, True) == (3.0, None)
+    assert index.lookup("m", 10, "female", True) == (1.0, None)
+    lo, _ = index.cutoff_matrix(["m"], [PatientInfo(age=30, pregnant=True)])
+    assert np.array_equal(lo, [[3.0]])
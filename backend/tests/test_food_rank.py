@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engine.food_index import FoodIndex
+from app.engine.food_rank import FoodRanker, serving_scores
+from app.engine.food_store import FoodStore, categorical, write_food_store
+
+
+def names(records):
+    return [r[0] for r in records]
+
+
+def test_curated_table_matches_food_index(snapshot):
+    ranker, index = FoodRanker(snapshot.foods), FoodIndex(snapshot.foods)
+    assert not ranker.by_density
+    tags = {w.strip() for t in snapshot.foods["Diet_tag"].astype(str) for w in t.split("/")}
+    for bundle in index.bundles():
+        for diet in [None, "vegan", "veg", "^omni", *sorted(tags)]:
+            for k in (1, 3, 10, 50):
+                assert ranker.top(bundle, k, diet) == index.top(bundle, k, diet), (bundle, diet, k)
+
+
+@pytest.fixture(scope="module")
+def density_foods():
+    rng = np.random.default_rng(0)
+    n = 400
+    iron = rng.choice([0.0, np.nan, 0.5, 1.0, 2.0, 4.0], size=n)
+    return pd.DataFrame({
+        "Food": [f"food {i % 300}" for i in range(n)],              # some names repeat
+        "Category": rng.choice(["Grains", "Legumes", "Meat"], size=n),
+        "Typical_serve_g": rng.choice([np.nan, 0.0, 50.0, 100.0, 200.0], size=n),
+        "Diet_tag": rng.choice(["vegan", "vegetarian", "omnivore"], size=n),
+        "per100g_iron": iron,
+        "per100g_zinc": rng.choice([np.nan, 1.0, 3.0], size=n),
+    })
+
+
+def brute_force(df, bundle, k, diet=None):
+    grams = df["Typical_serve_g"].where(df["Typical_serve_g"] > 0, 100.0).fillna(100.0)
+    score = df["per100g_" + bundle] * grams / 100.0
+    keep = score > 0
+    if diet:
+        keep &= df["Diet_tag"].str.contains(diet, case=False, regex=True)
+    rows = df[keep].assign(score=score[keep], row=np.flatnonzero(keep))
+    rows = rows.sort_values(["score", "row"], ascending=[False, True]).drop_duplicates("Food")
+    return rows["Food"].tolist()[:k]
+
+
+@pytest.mark.parametrize("bundle", ["iron", "zinc"])
+@pytest.mark.parametrize("diet", [None, "vegan", "veg", "^omni|vegan"])
+@pytest.mark.parametrize("k", [1, 5, 32, 100])
+def test_density_ranking(density_foods, bundle, diet, k):
+    ranker = FoodRanker(density_foods)
+    assert ranker.by_density
+    assert names(ranker.top(bundle, k, diet)) == brute_force(density_foods, bundle, k, diet)
+
+
+def test_unknown_serving_counts_as_100g():
+    df = pd.DataFrame({
+        "Food": ["a", "b", "c"],
+        "Typical_serve_g": [np.nan, 300.0, 0.0],
+        "per100g_iron": [2.0, 1.0, 2.5],
+    })
+    top = FoodRanker(df).top("iron", 3)
+    assert names(top) == ["b", "c", "a"]
+    assert math.isnan(top[2][1])
+
+
+@pytest.mark.parametrize("precomputed", [True, False])
+def test_store_ranking_matches_frame(density_foods, tmp_path, precomputed):
+    df = density_foods
+    columns = {
+        "Food": df["Food"].tolist(),
+        "Category": categorical(df["Category"]),
+        "Typical_serve_g": df["Typical_serve_g"].to_numpy(dtype=float),
+        "Diet_tag": categorical(df["Diet_tag"]),
+        "per100g_iron": df["per100g_iron"].to_numpy(dtype=np.float32),
+        "per100g_zinc": df["per100g_zinc"].to_numpy(dtype=np.float32),
+    }
+    if precomputed:   # as written by fdc_ingest
+        for bundle in ("iron", "zinc"):
+            per100g = columns["per100g_" + bundle]
+            columns["per_serving_" + bundle] = serving_scores(columns["Typical_serve_g"], per100g).astype(np.float32)
+    store = FoodStore.open(write_food_store(tmp_path / "store", columns))
+    ranker = FoodRanker.from_store(store)
+    assert ranker.bundles() == ["iron", "zinc"]
+    frame = FoodRanker(df)
+    for bundle in ("iron", "zinc"):
+        for diet in (None, "vegan", "omni"):
+            assert names(ranker.top(bundle, 40, diet)) == names(frame.top(bundle, 40, diet))
@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.response_cache import canonical_json, content_key
+
+
+def test_key_order_ignored_outside_ordered_fields():
+    a = {"labs": {"Hemoglobin": 10}, "patient": {"age": 30, "sex": "female"}}
+    b = {"patient": {"sex": "female", "age": 30}, "labs": {"Hemoglobin": 10}}
+    assert canonical_json(a, ("labs",)) == canonical_json(b, ("labs",))
+    assert content_key(a, "v1", ordered=("labs",)) == content_key(b, "v1", ordered=("labs",))
+
+
+def test_reordered_labs_get_their_own_key():
+    a = {"labs": {"Hemoglobin": 10, "vitamin_D": 12}}
+    b = {"labs": {"vitamin_D": 12, "Hemoglobin": 10}}
+    assert canonical_json(a) == canonical_json(b)
+    assert content_key(a, "v1", ordered=("labs",)) != content_key(b, "v1", ordered=("labs",))
+
+
+def test_reordered_panel_is_not_served_from_cache():
+    patient = {"age": 30, "sex": "female"}
+    first = {"labs": {"Hemoglobin": 10, "vitamin_D": 12}, "patient": patient}
+    second = {"labs": {"vitamin_D": 12, "Hemoglobin": 10}, "patient": patient}
+    with TestClient(app) as client:
+        client.post("/api/report", json=first)
+        fresh = client.post("/api/report", json=second)
+        assert fresh.headers["x-cache"] == "miss"
+        again = client.post("/api/report", json={**second, "patient": {"sex": "female", "age": 30}})
+        assert again.headers["x-cache"] == "hit"
+        assert again.json() == fresh.json()
@@ -0,0 +1,112 @@
+import random
+from typing import Dict, List, Sequence
+
+import pytest
+
+from app.engine.core import SLOTS, build_supplement_plan, marker_to_supplement
+from app.engine.scheduler import ConflictScheduler
+
+
+def greedy_plan(deficient: Sequence[str], antagonists, boosters, slots=SLOTS) -> Dict[str, List[str]]:
+    """The set-based placement build_supplement_plan used before ConflictScheduler."""
+    plan: Dict[str, List[str]] = {slot: [] for slot in slots}
+
+    def can_place(nutrient: str, slot: str) -> bool:
+        for already in plan[slot]:
+            avoid_for_new = set(antagonists.get(nutrient, {}).get("avoid_with", []))
+            avoid_for_already = set(antagonists.get(already, {}).get("avoid_with", []))
+            if already in avoid_for_new or nutrient in avoid_for_already:
+                return False
+        return True
+
+    for nutrient in deficient:
+        for slot in slots:
+            if can_place(nutrient, slot):
+                plan[slot].append(nutrient)
+                break
+        else:
+            plan[slots[-1]].append(nutrient)
+
+    for bundle in boosters.values():
+        for t in [t for t in bundle["targets"] if t in deficient]:
+            target_slot = next((s for s, items in plan.items() if t in items), None)
+            if not target_slot:
+                continue
+            for b in bundle["boosters"]:
+                supp_b = marker_to_supplement(b)
+                if supp_b in plan[target_slot]:
+                    continue
+                if can_place(supp_b, target_slot):
+                    plan[target_slot].append(supp_b)
+    return plan
+
+
+def nutrients_of(snapshot) -> List[str]:
+    names = set(snapshot.antagonists)
+    for rule in snapshot.antagonists.values():
+        names.update(rule.get("avoid_with", ()))
+    for bundle in snapshot.boosters.values():
+        names.update(bundle["targets"])
+    names.update(marker_to_supplement(m) for m in snapshot.ref)
+    return sorted(names)
+
+
+def test_matches_greedy_plan_for_default_slots(snapshot):
+    scheduler = snapshot.scheduler
+    names = nutrients_of(snapshot)
+    rng = random.Random(0)
+    for _ in range(2000):
+        deficient = rng.sample(names, rng.randint(0, len(names)))
+        expected = greedy_plan(deficient, snapshot.antagonists, snapshot.boosters)
+        assert scheduler.plan(deficient, SLOTS) == expected, deficient
+
+
+def test_matches_greedy_plan_on_dense_synthetic_rules():
+    rng = random.Random(1)
+    names = [f"n{i}" for i in range(12)]
+    for _ in range(200):
+        antagonists = {
+            n: {"avoid_with": rng.sample([m for m in names if m != n], rng.randint(0, 4))}
+            for n in rng.sample(names, 8)
+        }
+        boosters = {
+            f"b{i}": {"targets": rng.sample(names, 2), "boosters": rng.sample(names, 3)}
+            for i in range(4)
+        }
+        scheduler = ConflictScheduler(antagonists, boosters, supplement_key=marker_to_supplement)
+        deficient = rng.sample(names, rng.randint(1, len(names)))
+        assert scheduler.plan(deficient, SLOTS) == greedy_plan(deficient, antagonists, boosters)
+
+
+def test_conflicts_are_symmetric():
+    scheduler = ConflictScheduler({"iron": {"avoid_with": ["calcium"]}}, {})
+    assert scheduler.plan(["calcium", "iron"], ["a", "b"]) == {"a": ["calcium"], "b": ["iron"]}
+
+
+def test_unplaceable_goes_last_or_to_fewest_conflicts():
+    # a, b in s1; c, d, e avoid a so they share s2; x clashes with b, c, d, e
+    antagonists = {
+        "c": {"avoid_with": ["a"]},
+        "d": {"avoid_with": ["a"]},
+        "e": {"avoid_with": ["a"]},
+        "x": {"avoid_with": ["b", "c", "d", "e"]},
+    }
+    scheduler = ConflictScheduler(antagonists, {})
+    deficient = ["a", "b", "c", "d", "e", "x"]
+    assert scheduler.plan(deficient, ["s1", "s2"]) == {"s1": ["a", "b"], "s2": ["c", "d", "e", "x"]}
+    assert scheduler.plan(deficient, ["s1", "s2"], min_conflict=True) == {"s1": ["a", "b", "x"], "s2": ["c", "d", "e"]}
+    assert scheduler.plan(deficient, ["s1", "s2", "s3"], min_conflict=True)["s3"] == ["x"]
+
+
+def test_no_slots():
+    with pytest.raises(ValueError):
+        ConflictScheduler({}, {}).plan(["iron"], [])
+
+
+def test_custom_slots(snapshot):
+    labels = {"Hemoglobin": "low", "vitamin_D": "low", "zinc": "low"}
+    default = build_supplement_plan(labels, snapshot)
+    meals = build_supplement_plan(labels, snapshot, slots=("breakfast", "lunch", "dinner", "bedtime"))
+    assert list(meals) == ["breakfast", "lunch", "dinner", "bedtime"]
+    assert sorted(n for items in meals.values() for n in items) == sorted(n for items in default.values() for n in items)
+    assert list(default.values()) == list(meals.values())[:3]